@@ -0,0 +1 @@
+"""Бенчмарк ленты: генератор данных, заглушка LLM и нагрузочный драйвер."""
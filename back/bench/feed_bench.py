@@ -0,0 +1,170 @@
+"""
+Нагрузочный драйвер ленты.
+
+Для каждого размера каталога заполняет базу генератором, регистрирует
+зрителей, прогоняет /feed/mentors и /feed/users с холодным и прогретым
+кешем и печатает p50/p95/p99, число вызовов апстрима и долю попаданий в Redis.
+
+    python -m bench.feed_bench --base-url http://localhost:8000 \\
+        --stub-url http://localhost:9000 --sizes 100,1000,10000
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.generate_data import TOPICS, UNIVERSITIES, generate
+from src.services.redis_service import redis_service
+
+FEEDS = {
+    "mentors": {"feed": "/feed/mentors", "auth": "/auth/users"},
+    "users": {"feed": "/feed/users", "auth": "/auth/mentors"},
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def redis_keyspace() -> Dict[str, int]:
+    info = await redis_service.redis_client.info("stats")
+    return {"hits": int(info["keyspace_hits"]), "misses": int(info["keyspace_misses"])}
+
+
+async def flush_rankings() -> None:
+    """Удаляет сохраненные ранжирования, чтобы следующий проход был холодным"""
+    async for key in redis_service.redis_client.scan_iter(match="feed:ranking:*", count=1000):
+        await redis_service.redis_client.delete(key)
+
+
+async def stub_stats(client: httpx.AsyncClient, stub_url: Optional[str]) -> Dict[str, int]:
+    if not stub_url:
+        return {"calls": 0, "failures": 0}
+    response = await client.get(f"{stub_url}/stats")
+    return response.json()
+
+
+async def create_viewer(client: httpx.AsyncClient, kind: str, index: int, rng: random.Random) -> str:
+    """Регистрирует зрителя ленты с описанием профиля и возвращает токен"""
+    auth = FEEDS[kind]["auth"]
+    response = await client.post(f"{auth}/signup", json={"name": f"viewer{kind[0]}{index}{rng.randint(0, 10 ** 6)}"})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+
+    profile = {"description": f"Хочу заниматься: {', '.join(rng.sample(TOPICS, 4))}."}
+    if kind == "mentors":
+        profile["target_universities"] = rng.sample(UNIVERSITIES, 2)
+    else:
+        profile["university"] = rng.choice(UNIVERSITIES)
+    response = await client.patch(f"{auth}/me", json=profile, headers={"Authorization": f"Bearer {token}"})
+    response.raise_for_status()
+    return token
+
+
+async def run_phase(
+    client: httpx.AsyncClient,
+    kind: str,
+    tokens: List[str],
+    pages: int,
+    size: int,
+    concurrency: int,
+) -> List[float]:
+    """Каждый зритель листает pages страниц; возвращает задержки запросов в миллисекундах"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def fetch(token: str, page: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(
+                FEEDS[kind]["feed"],
+                params={"page": page, "size": size},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+
+    await asyncio.gather(*[fetch(token, page) for token in tokens for page in range(1, pages + 1)])
+    return latencies
+
+
+async def bench_size(args: argparse.Namespace, catalog_size: int) -> List[Dict]:
+    await generate(catalog_size, catalog_size, args.seed, truncate=True)
+    rng = random.Random(args.seed)
+    rows = []
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client, \
+            httpx.AsyncClient(timeout=args.timeout) as stub_client:
+        for kind in FEEDS:
+            tokens = [await create_viewer(client, kind, i, rng) for i in range(args.viewers)]
+            await flush_rankings()
+
+            for phase in ("cold", "warm"):
+                stub_before = await stub_stats(stub_client, args.stub_url)
+                redis_before = await redis_keyspace()
+                latencies = await run_phase(client, kind, tokens, args.pages, args.size, args.concurrency)
+                stub_after = await stub_stats(stub_client, args.stub_url)
+                redis_after = await redis_keyspace()
+
+                hits = redis_after["hits"] - redis_before["hits"]
+                misses = redis_after["misses"] - redis_before["misses"]
+                rows.append({
+                    "catalog": catalog_size,
+                    "feed": kind,
+                    "phase": phase,
+                    "requests": len(latencies),
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "upstream": stub_after["calls"] - stub_before["calls"],
+                    "upstream_failures": stub_after["failures"] - stub_before["failures"],
+                    "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                })
+    return rows
+
+
+def print_report(rows: List[Dict]) -> None:
+    header = f"{'catalog':>8} {'feed':>8} {'phase':>5} {'reqs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'upstream':>8} {'fail':>5} {'hit':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['catalog']:>8} {row['feed']:>8} {row['phase']:>5} {row['requests']:>5} "
+            f"{row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f} "
+            f"{row['upstream']:>8} {row['upstream_failures']:>5} {row['hit_ratio']:>6.1%}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    rows = []
+    for catalog_size in args.sizes:
+        rows.extend(await bench_size(args, catalog_size))
+    print_report(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--stub-url", default=None, help="Адрес llm_stub для подсчета вызовов апстрима")
+    parser.add_argument("--sizes", type=lambda v: [int(s) for s in v.split(",")], default=[100, 1000])
+    parser.add_argument("--viewers", type=int, default=10, help="Зрителей каждой ленты")
+    parser.add_argument("--pages", type=int, default=3, help="Страниц на зрителя за проход")
+    parser.add_argument("--size", type=int, default=10, help="Размер страницы")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Генератор тестовых данных для бенчмарка ленты.
+
+Создает N пользователей и M менторов с детерминированными (по seed)
+описаниями, университетами и типами поступления.
+
+    python -m bench.generate_data --users 1000 --mentors 1000 --seed 42 --truncate
+"""
+
+import argparse
+import asyncio
+import random
+from typing import List
+
+from sqlalchemy import insert, text
+
+from src.data.base import main_engine
+from src.data.models import SCHEMA_NAME, AdmissionType, DayOfWeek, Mentor, User
+from src.security.auth import get_password_hash
+from src.services.redis_service import redis_service
+
+UNIVERSITIES = ["МГУ", "МФТИ", "ВШЭ", "СПбГУ", "МГТУ", "ИТМО", "МИФИ", "УрФУ"]
+TOPICS = [
+    "математика", "физика", "информатика", "программирование", "химия",
+    "биология", "история", "литература", "экономика", "олимпиады",
+    "алгоритмы", "python", "машинное обучение", "английский", "обществознание",
+    "геометрия", "механика", "робототехника", "право", "лингвистика",
+]
+PASSWORD = "bench-password"
+BATCH_SIZE = 1000
+
+
+def make_description(rng: random.Random) -> str:
+    """Описание профиля из случайных тем, 10..300 символов"""
+    topics = rng.sample(TOPICS, rng.randint(3, 7))
+    return f"Интересуюсь: {', '.join(topics)}."[:300]
+
+
+def make_users(rng: random.Random, count: int, password_hash: str) -> List[dict]:
+    admission_types = list(AdmissionType)
+    return [
+        {
+            "name": f"bench_user_{i}",
+            "login": f"bench_user_{i}",
+            "password_hash": password_hash,
+            "description": make_description(rng),
+            "target_universities": rng.sample(UNIVERSITIES, rng.randint(1, 3)),
+            "admission_type": rng.choice(admission_types),
+            "is_active": True,
+        }
+        for i in range(count)
+    ]
+
+
+def make_mentors(rng: random.Random, count: int, password_hash: str) -> List[dict]:
+    admission_types = list(AdmissionType)
+    days = list(DayOfWeek)
+    return [
+        {
+            "name": f"bench_mentor_{i}",
+            "login": f"bench_mentor_{i}",
+            "password_hash": password_hash,
+            "title": rng.choice(TOPICS),
+            "description": make_description(rng),
+            "university": rng.choice(UNIVERSITIES),
+            "admission_type": rng.choice(admission_types),
+            "free_days": rng.sample(days, rng.randint(1, 3)),
+            "is_active": True,
+        }
+        for i in range(count)
+    ]
+
+
+async def generate(users: int, mentors: int, seed: int, truncate: bool) -> None:
+    """
+    Заполняет базу тестовыми пользователями и менторами.
+
+    Args:
+        users: Количество пользователей
+        mentors: Количество менторов
+        seed: Зерно генератора случайных чисел
+        truncate: Очистить таблицы перед генерацией
+    """
+    rng = random.Random(seed)
+    password_hash = get_password_hash(PASSWORD)
+
+    async with main_engine.begin() as connection:
+        if truncate:
+            await connection.execute(text(
+                f"TRUNCATE {SCHEMA_NAME}.requests, {SCHEMA_NAME}.users, {SCHEMA_NAME}.mentors RESTART IDENTITY"
+            ))
+        user_rows = make_users(rng, users, password_hash)
+        for i in range(0, len(user_rows), BATCH_SIZE):
+            await connection.execute(insert(User), user_rows[i:i + BATCH_SIZE])
+        mentor_rows = make_mentors(rng, mentors, password_hash)
+        for i in range(0, len(mentor_rows), BATCH_SIZE):
+            await connection.execute(insert(Mentor), mentor_rows[i:i + BATCH_SIZE])
+
+    # Данные менялись в обход репозиториев, поэтому версии каталога поднимаем вручную
+    await redis_service.bump_catalog_version("users")
+    await redis_service.bump_catalog_version("mentors")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--mentors", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед генерацией")
+    args = parser.parse_args()
+    asyncio.run(generate(args.users, args.mentors, args.seed, args.truncate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Локальная заглушка эндпоинта chat/completions сервиса ранжирования.
+
+Отвечает JSON-массивом id из промпта в перемешанном порядке с настраиваемой
+задержкой, разбросом и долей ошибок. Считает вызовы на /stats.
+
+    python -m bench.llm_stub --port 9000 --latency 1.5 --jitter 0.5 --failure-rate 0.05
+
+Бэкенд направляется на заглушку так:
+    RANKING_BACKEND=llm RANKING_API_URL=http://localhost:9000/api/chat/completions RANKING_HTTP2=false
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+ID_RE = re.compile(r"^ID: (\d+),", re.MULTILINE)
+
+app = FastAPI()
+app.state.latency = 1.0
+app.state.jitter = 0.0
+app.state.failure_rate = 0.0
+app.state.rng = random.Random(0)
+app.state.stats = {"calls": 0, "failures": 0, "candidates": 0}
+
+
+@app.post("/api/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    state = app.state
+    state.stats["calls"] += 1
+
+    delay = max(0.0, state.latency + state.rng.uniform(-state.jitter, state.jitter))
+    await asyncio.sleep(delay)
+
+    if state.rng.random() < state.failure_rate:
+        state.stats["failures"] += 1
+        raise HTTPException(status_code=503, detail="Stub failure")
+
+    prompt = body["messages"][-1]["content"]
+    ids = [int(item_id) for item_id in ID_RE.findall(prompt)]
+    state.stats["candidates"] += len(ids)
+    state.rng.shuffle(ids)
+    content = f"```json\n{json.dumps(ids)}\n```"
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return app.state.stats
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    app.state.stats = {"calls": 0, "failures": 0, "candidates": 0}
+    return app.state.stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=1.0, help="Средняя задержка ответа, секунды")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Разброс задержки, секунды")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    app.state.jitter = args.jitter
+    app.state.failure_rate = args.failure_rate
+    app.state.rng = random.Random(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
 import os
+import tempfile
 
 
 # JWT
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "your-secret-key-for-development")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', '30'))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '10000'))  # Сколько профилей авторизованных пользователей держать в памяти
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', '30'))  # Время жизни профиля в кеше в секундах
+
+# Пароли
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))  # Стоимость bcrypt; хеши с другой стоимостью пересчитываются при входе
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))  # Потоки для bcrypt, не больше числа свободных ядер
+
+# Ограничение частоты входа и регистрации (token bucket: емкость и пополнение в секунду)
+AUTH_RATE_LIMIT_IP_CAPACITY = float(os.environ.get('AUTH_RATE_LIMIT_IP_CAPACITY', '20'))
+AUTH_RATE_LIMIT_IP_RATE = float(os.environ.get('AUTH_RATE_LIMIT_IP_RATE', '0.5'))
+AUTH_RATE_LIMIT_LOGIN_CAPACITY = float(os.environ.get('AUTH_RATE_LIMIT_LOGIN_CAPACITY', '5'))
+AUTH_RATE_LIMIT_LOGIN_RATE = float(os.environ.get('AUTH_RATE_LIMIT_LOGIN_RATE', '0.1'))
+TRUSTED_PROXIES = [p.strip() for p in os.environ.get('TRUSTED_PROXIES', '').split(',') if p.strip()]  # Адреса, подсети или имена хостов прокси, которым доверяем X-Real-IP
+TRUSTED_PROXIES_RESOLVE_INTERVAL = float(os.environ.get('TRUSTED_PROXIES_RESOLVE_INTERVAL', '60'))  # Как часто заново резолвить имена прокси в фоне, в секундах
 
 # Postgres
 POSTGRES_USER = os.environ.get('POSTGRES_USER', 'postgres')
@@ -17,6 +33,44 @@ CONNECTION_STRING = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{
 # GEMINI API
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', 'sk-9c33e1ecb15640c8b060fe63eeaea71c')
 
+# Ranking
+RANKING_BACKEND = os.environ.get('RANKING_BACKEND', 'llm')  # local | llm
+RANKING_VECTOR_DIM = int(os.environ.get('RANKING_VECTOR_DIM', str(2 ** 18)))
+RANKING_VECTOR_NGRAM = int(os.environ.get('RANKING_VECTOR_NGRAM', '3'))
+RANKING_VECTOR_CACHE_SIZE = int(os.environ.get('RANKING_VECTOR_CACHE_SIZE', '50000'))
+RANKING_API_URL = os.environ.get('RANKING_API_URL', 'https://chat.batsura.ru/api/chat/completions')
+RANKING_MODEL = os.environ.get('RANKING_MODEL', 'qodo/gemini-2.0-flash')
+RANKING_HTTP2 = os.environ.get('RANKING_HTTP2', 'true').lower() == 'true'
+RANKING_CONNECT_TIMEOUT = float(os.environ.get('RANKING_CONNECT_TIMEOUT', '3'))
+RANKING_READ_TIMEOUT = float(os.environ.get('RANKING_READ_TIMEOUT', '20'))
+RANKING_MAX_CONNECTIONS = int(os.environ.get('RANKING_MAX_CONNECTIONS', '20'))
+RANKING_MAX_KEEPALIVE = int(os.environ.get('RANKING_MAX_KEEPALIVE', '10'))
+RANKING_CHUNK_SIZE = int(os.environ.get('RANKING_CHUNK_SIZE', '50'))  # Кандидатов в одном промпте
+RANKING_MAX_CONCURRENCY = int(os.environ.get('RANKING_MAX_CONCURRENCY', '4'))  # Одновременных запросов к модели
+RANKING_BREAKER_THRESHOLD = int(os.environ.get('RANKING_BREAKER_THRESHOLD', '5'))  # Ошибок подряд до размыкания
+RANKING_BREAKER_RESET = float(os.environ.get('RANKING_BREAKER_RESET', '30'))  # Секунд до пробного запроса
+RANKING_LOCK_TIMEOUT = float(os.environ.get('RANKING_LOCK_TIMEOUT', '60'))  # Время жизни блокировки ранжирования в Redis
+RANKING_LOCK_WAIT = float(os.environ.get('RANKING_LOCK_WAIT', '30'))  # Сколько воркер ждет ранжирование другого воркера
+
+# Снимок каталога для ленты
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'catalog_snapshots'))
+CATALOG_SNAPSHOT_MAX_AGE = float(os.environ.get('CATALOG_SNAPSHOT_MAX_AGE', '300'))  # Максимальный возраст снимка в секундах
+CATALOG_SNAPSHOT_DEBOUNCE = float(os.environ.get('CATALOG_SNAPSHOT_DEBOUNCE', '5'))  # Секунд ожидания после изменения каталога перед перестроением
+CATALOG_SNAPSHOT_LOCK_TIMEOUT = float(os.environ.get('CATALOG_SNAPSHOT_LOCK_TIMEOUT', '120'))  # Время жизни блокировки перестроения в Redis
+CATALOG_SNAPSHOT_LOCK_WAIT = float(os.environ.get('CATALOG_SNAPSHOT_LOCK_WAIT', '1'))  # Сколько воркер ждет блокировку, прежде чем оставить перестроение другому
+
+# Заявки
+REQUEST_BULK_MAX_SIZE = int(os.environ.get('REQUEST_BULK_MAX_SIZE', '100'))  # Заявок в одной пакетной операции
+REQUEST_EVENTS_KEEPALIVE = float(os.environ.get('REQUEST_EVENTS_KEEPALIVE', '15'))  # Секунд между keepalive в потоке событий
+REQUEST_EVENTS_QUEUE_SIZE = int(os.environ.get('REQUEST_EVENTS_QUEUE_SIZE', '100'))  # Событий в очереди одного клиента
+REQUEST_EVENTS_AUTH_CHECK_INTERVAL = float(os.environ.get('REQUEST_EVENTS_AUTH_CHECK_INTERVAL', '15'))  # Как часто открытый поток событий перепроверяет токен, в секундах
+REQUEST_EVENTS_TICKET_TTL = int(os.environ.get('REQUEST_EVENTS_TICKET_TTL', '30'))  # Время жизни одноразового билета для EventSource, в секундах
+REQUEST_COUNTS_RECONCILE_INTERVAL = float(os.environ.get('REQUEST_COUNTS_RECONCILE_INTERVAL', '300'))  # Секунд между сверками счетчиков заявок с базой
+
+# Бизнес-метрики
+BUSINESS_METRICS_REFRESH_INTERVAL = float(os.environ.get('BUSINESS_METRICS_REFRESH_INTERVAL', '60'))  # Секунд между пересчетами бизнес-метрик
+
 # Redis
 REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
 REDIS_PORT = os.environ.get('REDIS_PORT', '6379')
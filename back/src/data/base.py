@@ -7,12 +7,16 @@ from sqlalchemy.schema import CreateSchema
 from sqlalchemy import text
 
 from src.config import CONNECTION_STRING
+from src.data.migrations import run_migrations
 from src.data.models import SCHEMA_NAME, Base
+from src.utils.request_metrics import instrument_engine
 
 main_engine = create_async_engine(
     CONNECTION_STRING,
     echo=False,
 )
+# Количество и время SQL-запросов за HTTP-запрос для /metrics
+instrument_engine(main_engine.sync_engine)
 DBSession = sessionmaker(
     binds={
         Base: main_engine,
@@ -43,6 +47,8 @@ async def create_schema():
         await drop_all_tables()  # Временно раскомментировано для пересоздания схемы
         await connection.execute(CreateSchema(SCHEMA_NAME, if_not_exists=True))
         await connection.run_sync(Base.metadata.create_all)
+        # Индексы и прочее, чего нет в моделях, создаются миграциями
+        await run_migrations(connection)
         await connection.commit()
 
 
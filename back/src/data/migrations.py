@@ -0,0 +1,112 @@
+"""
+Миграции схемы, которые нельзя выразить через create_all.
+
+Каждая миграция применяется один раз и записывается в schema_migrations.
+Новые миграции добавляются в конец списка MIGRATIONS.
+"""
+
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.data.models import SCHEMA_NAME
+
+MIGRATIONS: List[Tuple[str, List[str]]] = [
+    (
+        "0001_feed_filter_indexes",
+        [
+            # Фильтр ленты пользователей: target_universities @> ARRAY[:university]
+            f"CREATE INDEX IF NOT EXISTS ix_users_target_universities_gin "
+            f"ON {SCHEMA_NAME}.users USING gin (target_universities)",
+            # Фильтр ленты менторов: university IN (...) AND admission_type = ...
+            f"CREATE INDEX IF NOT EXISTS ix_mentors_university_admission_type "
+            f"ON {SCHEMA_NAME}.mentors (university, admission_type)",
+            # Лента показывает только активные профили и листается по id
+            f"CREATE INDEX IF NOT EXISTS ix_mentors_active_id "
+            f"ON {SCHEMA_NAME}.mentors (id) WHERE is_active",
+            f"CREATE INDEX IF NOT EXISTS ix_users_active_id "
+            f"ON {SCHEMA_NAME}.users (id) WHERE is_active",
+        ],
+    ),
+    (
+        "0002_login_prefix_indexes",
+        [
+            # Подбор свободного логина: login LIKE 'ivan%' (уникальный индекс по login не подходит для LIKE)
+            f"CREATE INDEX IF NOT EXISTS ix_users_login_pattern "
+            f"ON {SCHEMA_NAME}.users (login varchar_pattern_ops)",
+            f"CREATE INDEX IF NOT EXISTS ix_mentors_login_pattern "
+            f"ON {SCHEMA_NAME}.mentors (login varchar_pattern_ops)",
+        ],
+    ),
+    (
+        "0003_profile_version",
+        [
+            # Версия профиля для оптимистичной блокировки при обновлении
+            f"ALTER TABLE {SCHEMA_NAME}.users ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+            f"ALTER TABLE {SCHEMA_NAME}.mentors ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+        ],
+    ),
+    (
+        "0004_request_inbox_indexes",
+        [
+            # Входящие и исходящие заявки: фильтр по статусу и страницы по (created_at, id)
+            f"CREATE INDEX IF NOT EXISTS ix_requests_receiver_inbox "
+            f"ON {SCHEMA_NAME}.requests (receiver_type, receiver_id, status, created_at, id)",
+            f"CREATE INDEX IF NOT EXISTS ix_requests_sender_inbox "
+            f"ON {SCHEMA_NAME}.requests (sender_type, sender_id, status, created_at, id)",
+        ],
+    ),
+    (
+        "0005_request_unique_pair",
+        [
+            # Дубликаты могли появиться при одновременной отправке; оставляем самую раннюю заявку
+            f"DELETE FROM {SCHEMA_NAME}.requests a USING {SCHEMA_NAME}.requests b "
+            f"WHERE a.sender_type = b.sender_type AND a.sender_id = b.sender_id "
+            f"AND a.receiver_type = b.receiver_type AND a.receiver_id = b.receiver_id "
+            f"AND a.id > b.id",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ux_requests_sender_receiver "
+            f"ON {SCHEMA_NAME}.requests (sender_type, sender_id, receiver_type, receiver_id)",
+        ],
+    ),
+    (
+        "0006_request_inbox_unfiltered_indexes",
+        [
+            # Страницы без фильтра по статусу: в индексах 0004 status стоит перед
+            # created_at, и порядок (created_at, id) по ним не получить без сортировки
+            f"CREATE INDEX IF NOT EXISTS ix_requests_receiver_recent "
+            f"ON {SCHEMA_NAME}.requests (receiver_type, receiver_id, created_at, id)",
+            f"CREATE INDEX IF NOT EXISTS ix_requests_sender_recent "
+            f"ON {SCHEMA_NAME}.requests (sender_type, sender_id, created_at, id)",
+        ],
+    ),
+    (
+        "0007_token_version",
+        [
+            # Версия учетных данных в токенах: смена пароля и деактивация отзывают выданные токены
+            f"ALTER TABLE {SCHEMA_NAME}.users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 1",
+            f"ALTER TABLE {SCHEMA_NAME}.mentors ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 1",
+        ],
+    ),
+]
+
+
+async def run_migrations(connection: AsyncConnection) -> None:
+    """Применяет еще не примененные миграции в порядке списка"""
+    await connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_NAME}.schema_migrations ("
+        f"version VARCHAR PRIMARY KEY, "
+        f"applied_at TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+    result = await connection.execute(text(f"SELECT version FROM {SCHEMA_NAME}.schema_migrations"))
+    applied = {row[0] for row in result}
+
+    for version, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        for statement in statements:
+            await connection.execute(text(statement))
+        await connection.execute(
+            text(f"INSERT INTO {SCHEMA_NAME}.schema_migrations (version) VALUES (:version)"),
+            {"version": version},
+        )
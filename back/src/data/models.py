@@ -3,17 +3,17 @@ from enum import Enum as PyEnum
 from typing import cast
 
 from sqlalchemy import (
-    ARRAY,
     Boolean,
     Column,
     DateTime,
     Enum,
+    Index,
     Integer,
     MetaData,
     String,
     ForeignKey,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import declarative_base
 
@@ -65,6 +65,10 @@ class User(Base):
     )
     description = cast(str, Column(String, nullable=True))
     admission_type = cast(str, Column(Enum(AdmissionType), nullable=True))
+    # Растет при каждом изменении профиля, для оптимистичной блокировки
+    version = cast(int, Column(Integer, nullable=False, default=1, server_default="1"))
+    # Растет при смене пароля и деактивации; токены с другой версией недействительны
+    token_version = cast(int, Column(Integer, nullable=False, default=1, server_default="1"))
     
 
 
@@ -92,6 +96,10 @@ class Mentor(AsyncAttrs, Base):
     title = cast(str, Column(String(100), nullable=True))
     description = cast(str, Column(String(500), nullable=True))
     admission_type = cast(str, Column(Enum(AdmissionType), nullable=True))
+    # Растет при каждом изменении профиля, для оптимистичной блокировки
+    version = cast(int, Column(Integer, nullable=False, default=1, server_default="1"))
+    # Растет при смене пароля и деактивации; токены с другой версией недействительны
+    token_version = cast(int, Column(Integer, nullable=False, default=1, server_default="1"))
 
     def __repr__(self):
         return f"<Mentor(id={self.id}, email={self.email})>"
@@ -111,6 +119,17 @@ class Request(Base):
     """Request model for request management."""
 
     __tablename__ = "requests"
+    __table_args__ = (
+        # Одна заявка на пару отправитель-получатель; на нем же ON CONFLICT при отправке
+        Index(
+            "ux_requests_sender_receiver",
+            "sender_type",
+            "sender_id",
+            "receiver_type",
+            "receiver_id",
+            unique=True,
+        ),
+    )
 
     id = cast(int, Column(Integer, primary_key=True, index=True))
     sender_id = cast(int, Column(
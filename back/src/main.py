@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -8,9 +10,38 @@ from src.routers.feed_router import router as feed
 from src.routers.avatar_router import router as avatar
 from src.routers.metrics_router import router as metrics
 from src.routers.request_router import router as request_router
+from src.services.business_metrics import business_metrics
+from src.services.catalog_snapshot import catalog_snapshots
+from src.services.interest_rating import interest_service
+from src.services.rate_limiter import trusted_proxies
+from src.services.request_counters import request_counters
+from src.services.request_events import request_events
 from src.setup import setup
+from src.utils.request_metrics import PrometheusMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Общий пул соединений к сервису ранжирования живет все время работы приложения
+    await interest_service.startup()
+    # Подписка на события заявок для потоков /requests/events этого воркера
+    await request_events.startup()
+    # Периодическая сверка счетчиков заявок с базой
+    await request_counters.startup()
+    # Бизнес-метрики для /metrics считаются в фоне, а не на каждый опрос Prometheus
+    await business_metrics.startup()
+    # Адреса прокси из TRUSTED_PROXIES, заданных именем хоста, обновляются в фоне
+    await trusted_proxies.startup()
+    yield
+    await trusted_proxies.shutdown()
+    await business_metrics.shutdown()
+    await catalog_snapshots.shutdown()
+    await request_counters.shutdown()
+    await request_events.shutdown()
+    await interest_service.shutdown()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS
 app.add_middleware(
@@ -19,7 +50,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы списков заявок
+    expose_headers=["X-Next-Cursor"],
 )
+# Последним добавленный middleware внешний: время считается вместе с CORS
+app.add_middleware(PrometheusMiddleware)
 
 # Монтируем папку для статических файлов (аватарок)
 app.mount("/static", StaticFiles(directory="static"), name="static")
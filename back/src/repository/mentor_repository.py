@@ -1,4 +1,5 @@
-from sqlalchemy import select, update, func
+import re
+from sqlalchemy import Integer, case, cast, func, or_, select, update
 from sqlalchemy.orm import selectinload
 from src.data.base import session_scope
 from src.data.models import Mentor
@@ -7,6 +8,11 @@ import uuid
 from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.schemas.schemas import MentorUpdateSchema
+from src.config import Roles
+from src.security.principal_cache import principal_cache
+from src.services.redis_service import redis_service
+
+CATALOG_KIND = "mentors"
 
 
 async def get_mentor_by_email(email: str) -> Mentor:
@@ -27,16 +33,46 @@ async def get_mentor_by_login(login: str) -> Mentor:
         return result.scalars().first()
 
 
+async def get_max_login_suffix(base_login: str) -> Optional[int]:
+    """
+    Наибольший числовой суффикс среди логинов менторов вида base_login, base_login1, base_login2, ...
+
+    Один запрос по префиксу, который обслуживает индекс с varchar_pattern_ops.
+
+    Args:
+        base_login: Логин без суффикса
+
+    Returns:
+        None, если логин свободен; 0, если занят только base_login; иначе наибольший суффикс
+    """
+    suffix = func.substr(Mentor.login, len(base_login) + 1)
+    # Шаблон собирается целиком на стороне приложения, чтобы планировщик видел постоянный префикс
+    prefix = re.sub(r"([/%_])", r"/\1", base_login) + "%"
+    async with session_scope() as session:
+        result = await session.execute(
+            select(
+                func.max(case((Mentor.login == base_login, 0), else_=cast(suffix, Integer)))
+            ).where(
+                Mentor.login.like(prefix, escape="/"),
+                or_(Mentor.login == base_login, suffix.regexp_match("^[0-9]{1,9}$")),
+            )
+        )
+        return result.scalar()
+
+
 async def create_mentor(mentor: Mentor) -> Mentor:
     async with session_scope() as session:
+        # INSERT ... RETURNING: созданная строка приходит в том же запросе
         stmt = insert(Mentor).values(
             name=mentor.name,
             login=mentor.login,
             password_hash=mentor.password_hash,
-        )
-        await session.execute(stmt)
+        ).returning(Mentor)
+        result = await session.execute(stmt)
+        created = result.scalars().one()
         await session.commit()
-    return await get_mentor_by_login(mentor.login)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
+    return created
 
 
 async def update_mentor_avatar(db: AsyncSession, mentor_id: int, avatar_uuid: Optional[uuid.UUID]) -> None:
@@ -48,39 +84,82 @@ async def update_mentor_avatar(db: AsyncSession, mentor_id: int, avatar_uuid: Op
         mentor_id: ID ментора
         avatar_uuid: UUID аватарки или None для удаления
     """
-    stmt = update(Mentor).where(Mentor.id == mentor_id).values(avatar_uuid=avatar_uuid)
+    stmt = update(Mentor).where(Mentor.id == mentor_id).values(avatar_uuid=avatar_uuid, version=Mentor.version + 1)
     await db.execute(stmt)
     await db.commit()
+    principal_cache.invalidate(Roles.MENTOR, mentor_id)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
 
 
-async def update_mentor_profile(mentor_id: int, update_data: Dict[str, Any]) -> Mentor:
+async def update_mentor_password_hash(mentor_id: int, password_hash: str) -> None:
     """
-    Обновляет профиль ментора
+    Обновляет только хеш пароля (пересчет хеша при входе).
+
+    updated_at не меняется: это не изменение профиля, версия каталога и ленты остаются прежними.
+
+    Args:
+        mentor_id: ID ментора
+        password_hash: Новый хеш пароля
+    """
+    async with session_scope() as session:
+        stmt = (
+            update(Mentor)
+            .where(Mentor.id == mentor_id)
+            .values(password_hash=password_hash, updated_at=Mentor.updated_at)
+        )
+        await session.execute(stmt)
+        await session.commit()
+    principal_cache.invalidate(Roles.MENTOR, mentor_id)
+
+
+async def update_mentor_profile(
+    mentor_id: int, update_data: Dict[str, Any], expected_version: Optional[int] = None
+) -> Mentor:
+    """
+    Обновляет профиль ментора одним запросом UPDATE ... RETURNING
     
     Args:
         mentor_id: ID ментора
         update_data: Словарь с обновляемыми полями
+        expected_version: Ожидаемая версия профиля; если задана и не совпала, профиль не обновляется
         
     Returns:
-        Обновленный объект ментора
+        Обновленный объект ментора или None, если профиль не найден или версия не совпала
     """
+    conditions = [Mentor.id == mentor_id]
+    if expected_version is not None:
+        conditions.append(Mentor.version == expected_version)
+
+    values = dict(update_data, version=Mentor.version + 1)
+    # Смена пароля и деактивация делают недействительными все выданные токены
+    revokes_tokens = "password_hash" in update_data or "is_active" in update_data
+    if revokes_tokens:
+        values["token_version"] = Mentor.token_version + 1
+
     async with session_scope() as session:
-        # Сначала получаем ментора, чтобы убедиться, что он существует
-        mentor_query = select(Mentor).where(Mentor.id == mentor_id)
-        result = await session.execute(mentor_query)
-        mentor = result.scalars().first()
-        
-        if not mentor:
-            return None
-        
-        # Обновляем профиль
-        stmt = update(Mentor).where(Mentor.id == mentor_id).values(**update_data)
-        await session.execute(stmt)
+        stmt = (
+            update(Mentor)
+            .where(*conditions)
+            .values(**values)
+            .returning(Mentor)
+        )
+        result = await session.execute(stmt)
+        updated = result.scalars().first()
+        if updated is None:
+            return None # type: ignore
         await session.commit()
-        
-        # Получаем и возвращаем обновленного ментора
-        result = await session.execute(mentor_query)
-        return result.scalars().first()
+
+    principal_cache.invalidate(Roles.MENTOR, mentor_id)
+    if revokes_tokens:
+        await redis_service.revoke_token_version(Roles.MENTOR, mentor_id, updated.token_version - 1)
+    # Токены деактивированного аккаунта перестают действовать сразу, а не по истечении срока
+    if "is_active" in update_data:
+        if update_data["is_active"]:
+            await redis_service.restore_account(Roles.MENTOR, mentor_id)
+        else:
+            await redis_service.revoke_account(Roles.MENTOR, mentor_id)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
+    return updated
 
 
 async def get_mentor_by_id(mentor_id: int) -> Mentor:
@@ -93,47 +172,114 @@ async def get_mentor_by_id(mentor_id: int) -> Mentor:
         return result.scalars().first()
 
 
-async def get_mentors(page: int = 1, size: int = 10) -> tuple[list[Mentor], int]:
-    """Получить список менторов с пагинацией."""
+async def get_mentors_by_ids(mentor_ids: list[int]) -> list[Mentor]:
+    """Получить менторов по списку ID одним запросом с сохранением порядка списка."""
+    if not mentor_ids:
+        return []
     async with session_scope() as session:
-        # Базовый запрос
-        query = select(Mentor)
-        
-        # Считаем общее количество
-        count_result = await session.execute(select(func.count(Mentor.id)))
-        total = count_result.scalar() or 0
-        
-        # Применяем пагинацию
-        skip = (page - 1) * size
-        query = query.offset(skip).limit(size)
-        
-        result = await session.execute(query)
-        mentors = result.scalars().all()
-        
-        return mentors, total
+        result = await session.execute(
+            select(Mentor).where(Mentor.id.in_(mentor_ids))
+        )
+        mentors = {mentor.id: mentor for mentor in result.scalars().all()}
+        return [mentors[mentor_id] for mentor_id in mentor_ids if mentor_id in mentors]
+
+
+async def get_mentors(
+    page: int = 1, size: int = 10, after_id: Optional[int] = None
+) -> tuple[list[Mentor], int]:
+    """
+    Получить список менторов с пагинацией.
+
+    Если передан after_id, используется keyset-пагинация по id
+    вместо OFFSET: читается не больше size строк.
+    """
+    mentors, total, _ = await get_filtered_mentors(page=page, size=size, after_id=after_id)
+    return mentors, total
+
+
+async def count_mentors() -> int:
+    """Количество менторов без загрузки строк."""
+    async with session_scope() as session:
+        return await session.scalar(select(func.count(Mentor.id))) or 0
 
 
 async def update_mentor(mentor_id: int, update_data: MentorUpdateSchema) -> Mentor:
     """Обновить профиль ментора."""
+    update_values = {}
+
+    # Фильтруем None значения
+    for key, value in update_data.dict(exclude_none=True).items():
+        # Обрабатываем пароль отдельно, если потребуется хеширование; версия - условие, а не поле
+        if key not in ('password', 'version'):
+            update_values[key] = value
+
+    if not update_values:
+        return await get_mentor_by_id(mentor_id)
+
+    return await update_mentor_profile(mentor_id, update_values, update_data.version)
+
+
+def _mentor_filter_conditions(
+    target_universities: list[str] = None,
+    admission_type: str = None,
+) -> list:
+    """Условия фильтрации менторов по профилю пользователя (только активные профили)"""
+    # is_active = true совпадает с условием частичного индекса ix_mentors_active_id
+    conditions = [Mentor.is_active == True]  # noqa: E712
+    if target_universities and len(target_universities) > 0:
+        conditions.append(Mentor.university.in_(target_universities))
+    if admission_type:
+        conditions.append(Mentor.admission_type == admission_type)
+    return conditions
+
+
+async def get_mentor_candidates(
+    target_universities: list[str] = None,
+    admission_type: str = None,
+) -> list[Dict[str, Any]]:
+    """
+    Получить всех подходящих менторов для ранжирования (только id и описание).
+
+    Args:
+        target_universities: Список университетов для фильтрации
+        admission_type: Тип поступления для фильтрации
+
+    Returns:
+        Список словарей с ключами id и description, упорядоченный по id
+    """
+    conditions = _mentor_filter_conditions(target_universities, admission_type)
     async with session_scope() as session:
-        update_values = {}
-        
-        # Фильтруем None значения
-        for key, value in update_data.dict(exclude_none=True).items():
-            # Обрабатываем пароль отдельно, если потребуется хеширование
-            if key != 'password':
-                update_values[key] = value
-        
-        if update_values:
-            stmt = update(Mentor).where(Mentor.id == mentor_id).values(**update_values)
-            await session.execute(stmt)
-        
-        # Возвращаем обновленные данные
         result = await session.execute(
-            select(Mentor)
-            .where(Mentor.id == mentor_id)
+            select(Mentor.id, Mentor.description).where(*conditions).order_by(Mentor.id)
         )
-        return result.scalars().first()
+        return [
+            {"id": mentor_id, "description": description or ""}
+            for mentor_id, description in result.all()
+        ]
+
+
+async def get_mentor_snapshot_rows() -> list[Dict[str, Any]]:
+    """
+    Получить всех менторов для снимка каталога (только поля ленты и фильтров).
+
+    Returns:
+        Список словарей, упорядоченный по id
+    """
+    async with session_scope() as session:
+        result = await session.execute(
+            select(
+                Mentor.id,
+                Mentor.name,
+                Mentor.login,
+                Mentor.title,
+                Mentor.description,
+                Mentor.university,
+                Mentor.admission_type,
+                Mentor.avatar_uuid,
+                Mentor.is_active,
+            ).order_by(Mentor.id)
+        )
+        return [dict(row) for row in result.mappings().all()]
 
 
 async def get_filtered_mentors(
@@ -141,7 +287,9 @@ async def get_filtered_mentors(
     admission_type: str = None,
     page: int = 1,
     size: int = 10,
-) -> tuple[list[Mentor], int]:
+    after_id: Optional[int] = None,
+    total: Optional[int] = None,
+) -> tuple[list[Mentor], int, bool]:
     """
     Получить список менторов с фильтрацией по целевым университетам,
     типу поступления и опционально по тегу
@@ -151,32 +299,33 @@ async def get_filtered_mentors(
         admission_type: Тип поступления для фильтрации
         page: Номер страницы для пагинации
         size: Размер страницы для пагинации
+        after_id: Курсор keyset-пагинации (id последнего ментора предыдущей страницы)
+        total: Общее количество из курсора; если задано, COUNT не выполняется
         
     Returns:
-        Кортеж из списка менторов и общего количества менторов
+        Кортеж из списка менторов, общего количества менторов
+        и признака, что после страницы есть еще менторы
     """
     async with session_scope() as session:
         # Базовый запрос и условия фильтрации
-        conditions = []
-        if target_universities and len(target_universities) > 0:
-            conditions.append(Mentor.university.in_(target_universities))
-        if admission_type:
-            conditions.append(Mentor.admission_type == admission_type)
+        conditions = _mentor_filter_conditions(target_universities, admission_type)
             
         # Создаем запрос с фильтрами
-        query = select(Mentor)
-        if conditions:
-            query = query.where(*conditions)
+        query = select(Mentor).where(*conditions).order_by(Mentor.id)
             
         # Считаем общее количество с учетом фильтров
-        count_result = await session.execute(select(func.count(Mentor.id)).where(*conditions) if conditions else select(func.count(Mentor.id)))
-        total = count_result.scalar() or 0
+        if total is None:
+            count_result = await session.execute(select(func.count(Mentor.id)).where(*conditions))
+            total = count_result.scalar() or 0
         
-        # Применяем пагинацию
-        skip = (page - 1) * size
-        query = query.offset(skip).limit(size)
+        # Применяем пагинацию; одна лишняя строка показывает, есть ли следующая страница
+        if after_id is not None:
+            query = query.where(Mentor.id > after_id).limit(size + 1)
+        else:
+            skip = (page - 1) * size
+            query = query.offset(skip).limit(size + 1)
         
         result = await session.execute(query)
         mentors = result.scalars().all()
         
-        return mentors, total
+        return mentors[:size], total, len(mentors) > size
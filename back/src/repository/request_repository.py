@@ -1,3 +1,71 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, String, cast, column, func, select, values
+
+from src.data.base import session_scope
+from src.data.models import EntityType, Request, RequestStatus
+
+
+async def count_request_badges(
+    entities: List[Tuple[EntityType, int, Optional[datetime]]],
+) -> Dict[Tuple[EntityType, int], Tuple[int, int, int]]:
+    """
+    Считает счетчики заявок для нескольких участников одним запросом.
+
+    Каждый счетчик - коррелированный COUNT по индексам входящих и исходящих заявок.
+
+    Args:
+        entities: Тройки (тип, id, момент последнего просмотра исходящих или None)
+
+    Returns:
+        По ключу (тип, id): (ожидающие входящие, ожидающие исходящие,
+        исходящие, подтвержденные после просмотра)
+    """
+    if not entities:
+        return {}
+
+    # Тип передается строкой и приводится к enum в сравнении: тип параметров VALUES Postgres выводит как text
+    entity_type_enum = Request.__table__.c.sender_type.type
+    rows = values(
+        column("entity_type", String),
+        column("entity_id", Integer),
+        column("seen_at", DateTime),
+        name="entities",
+    ).data([(entity_type.name, entity_id, seen_at) for entity_type, entity_id, seen_at in entities])
+    entity_type = cast(rows.c.entity_type, entity_type_enum)
+
+    def count(*conditions):
+        return select(func.count()).where(*conditions).scalar_subquery()
+
+    query = select(
+        rows.c.entity_type,
+        rows.c.entity_id,
+        count(
+            Request.receiver_type == entity_type, # type: ignore
+            Request.receiver_id == rows.c.entity_id, # type: ignore
+            Request.status == RequestStatus.PENDING, # type: ignore
+        ),
+        count(
+            Request.sender_type == entity_type, # type: ignore
+            Request.sender_id == rows.c.entity_id, # type: ignore
+            Request.status == RequestStatus.PENDING, # type: ignore
+        ),
+        count(
+            Request.sender_type == entity_type, # type: ignore
+            Request.sender_id == rows.c.entity_id, # type: ignore
+            Request.status == RequestStatus.ACCEPTED, # type: ignore
+            Request.updated_at > rows.c.seen_at, # type: ignore
+        ),
+    )
+    async with session_scope() as session:
+        result = await session.execute(query)
+        return {
+            (EntityType[type_name], entity_id): (pending_received, pending_sent, accepted_unseen)
+            for type_name, entity_id, pending_received, pending_sent, accepted_unseen in result.all()
+        }
+
+
 # from src.database import get_db
 
 # async def get_requests_stats():
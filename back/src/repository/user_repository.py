@@ -1,10 +1,16 @@
-from sqlalchemy import select, update, func
+import re
+from sqlalchemy import Integer, case, cast, func, or_, select, update
 from src.data.base import session_scope
 from src.data.models import User
 from sqlalchemy import insert
 import uuid
 from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from src.config import Roles
+from src.security.principal_cache import principal_cache
+from src.services.redis_service import redis_service
+
+CATALOG_KIND = "users"
 
 
 async def get_user_by_email(email: str) -> User:
@@ -25,16 +31,46 @@ async def get_user_by_login(login: str) -> User:
         return result.scalars().first()
 
 
+async def get_max_login_suffix(base_login: str) -> Optional[int]:
+    """
+    Наибольший числовой суффикс среди логинов пользователей вида base_login, base_login1, base_login2, ...
+
+    Один запрос по префиксу, который обслуживает индекс с varchar_pattern_ops.
+
+    Args:
+        base_login: Логин без суффикса
+
+    Returns:
+        None, если логин свободен; 0, если занят только base_login; иначе наибольший суффикс
+    """
+    suffix = func.substr(User.login, len(base_login) + 1)
+    # Шаблон собирается целиком на стороне приложения, чтобы планировщик видел постоянный префикс
+    prefix = re.sub(r"([/%_])", r"/\1", base_login) + "%"
+    async with session_scope() as session:
+        result = await session.execute(
+            select(
+                func.max(case((User.login == base_login, 0), else_=cast(suffix, Integer)))
+            ).where(
+                User.login.like(prefix, escape="/"),
+                or_(User.login == base_login, suffix.regexp_match("^[0-9]{1,9}$")),
+            )
+        )
+        return result.scalar()
+
+
 async def create_user(user_data: User) -> User:
     async with session_scope() as session:
+        # INSERT ... RETURNING: созданная строка приходит в том же запросе
         stmt = insert(User).values(
             name=user_data.name,
             login=user_data.login,
             password_hash=user_data.password_hash,
-        )
-        await session.execute(stmt)
+        ).returning(User)
+        result = await session.execute(stmt)
+        created = result.scalars().one()
         await session.commit()
-        return await get_user_by_login(user_data.login)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
+    return created
 
 
 async def update_user_avatar(db: AsyncSession, user_id: int, avatar_uuid: Optional[uuid.UUID]) -> None:
@@ -46,59 +82,186 @@ async def update_user_avatar(db: AsyncSession, user_id: int, avatar_uuid: Option
         user_id: ID пользователя
         avatar_uuid: UUID аватарки или None для удаления
     """
-    stmt = update(User).where(User.id == user_id).values(avatar_uuid=avatar_uuid) # type: ignore
+    stmt = update(User).where(User.id == user_id).values(avatar_uuid=avatar_uuid, version=User.version + 1) # type: ignore
     await db.execute(stmt)
     await db.commit()
+    principal_cache.invalidate(Roles.USER, user_id)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
 
 
-async def update_user_profile(user_id: int, update_data: Dict[str, Any]) -> User:
+async def update_user_password_hash(user_id: int, password_hash: str) -> None:
     """
-    Обновляет профиль пользователя
+    Обновляет только хеш пароля (пересчет хеша при входе).
+
+    updated_at не меняется: это не изменение профиля, версия каталога и ленты остаются прежними.
+
+    Args:
+        user_id: ID пользователя
+        password_hash: Новый хеш пароля
+    """
+    async with session_scope() as session:
+        stmt = (
+            update(User)
+            .where(User.id == user_id) # type: ignore
+            .values(password_hash=password_hash, updated_at=User.updated_at)
+        )
+        await session.execute(stmt)
+        await session.commit()
+    principal_cache.invalidate(Roles.USER, user_id)
+
+
+async def update_user_profile(
+    user_id: int, update_data: Dict[str, Any], expected_version: Optional[int] = None
+) -> User:
+    """
+    Обновляет профиль пользователя одним запросом UPDATE ... RETURNING
     
     Args:
         user_id: ID пользователя
         update_data: Словарь с обновляемыми полями
+        expected_version: Ожидаемая версия профиля; если задана и не совпала, профиль не обновляется
         
     Returns:
-        Обновленный объект пользователя
+        Обновленный объект пользователя или None, если профиль не найден или версия не совпала
     """
+    conditions = [User.id == user_id]
+    if expected_version is not None:
+        conditions.append(User.version == expected_version)
+
+    values = dict(update_data, version=User.version + 1)
+    # Смена пароля и деактивация делают недействительными все выданные токены
+    revokes_tokens = "password_hash" in update_data or "is_active" in update_data
+    if revokes_tokens:
+        values["token_version"] = User.token_version + 1
+
     async with session_scope() as session:
-        # Сначала получаем пользователя, чтобы убедиться, что он существует
-        user_query = select(User).where(User.id == user_id) # type: ignore
-        result = await session.execute(user_query)
-        user = result.scalars().first()
-        
-        if not user:
+        stmt = (
+            update(User)
+            .where(*conditions) # type: ignore
+            .values(**values)
+            .returning(User)
+        )
+        result = await session.execute(stmt)
+        updated = result.scalars().first()
+        if updated is None:
             return None # type: ignore
-        
-        # Обновляем профиль
-        stmt = update(User).where(User.id == user_id).values(**update_data) # type: ignore
-        await session.execute(stmt)
         await session.commit()
-        
-        # Получаем и возвращаем обновленного пользователя
-        result = await session.execute(user_query)
+
+    principal_cache.invalidate(Roles.USER, user_id)
+    if revokes_tokens:
+        await redis_service.revoke_token_version(Roles.USER, user_id, updated.token_version - 1)
+    # Токены деактивированного аккаунта перестают действовать сразу, а не по истечении срока
+    if "is_active" in update_data:
+        if update_data["is_active"]:
+            await redis_service.restore_account(Roles.USER, user_id)
+        else:
+            await redis_service.revoke_account(Roles.USER, user_id)
+    await redis_service.bump_catalog_version(CATALOG_KIND)
+    return updated
+
+
+async def get_user_by_id(user_id: int) -> User:
+    """Получить пользователя по ID."""
+    async with session_scope() as session:
+        result = await session.execute(
+            select(User)
+            .where(User.id == user_id) # type: ignore
+        )
         return result.scalars().first()
 
 
-async def get_users(page: int = 1, size: int = 10) -> Tuple[List[User], int]:
-    """Получить список пользователей с пагинацией."""
+async def get_users_by_ids(user_ids: List[int]) -> List[User]:
+    """Получить пользователей по списку ID одним запросом с сохранением порядка списка."""
+    if not user_ids:
+        return []
     async with session_scope() as session:
-        # Базовый запрос
-        query = select(User)
-        
-        # Считаем общее количество
-        count_result = await session.execute(select(func.count(User.id))) # type: ignore
-        total = count_result.scalar() or 0
-        
-        # Применяем пагинацию
-        skip = (page - 1) * size
-        query = query.offset(skip).limit(size)
-        
-        result = await session.execute(query)
-        users = list(result.scalars().all())
-        
-        return users, total
+        result = await session.execute(
+            select(User).where(User.id.in_(user_ids)) # type: ignore
+        )
+        users = {user.id: user for user in result.scalars().all()}
+        return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+async def get_users(
+    page: int = 1, size: int = 10, after_id: Optional[int] = None
+) -> Tuple[List[User], int]:
+    """
+    Получить список пользователей с пагинацией.
+
+    Если передан after_id, используется keyset-пагинация по id
+    вместо OFFSET: читается не больше size строк.
+    """
+    users, total, _ = await get_filtered_users(page=page, size=size, after_id=after_id)
+    return users, total
+
+
+async def count_users() -> int:
+    """Количество пользователей без загрузки строк."""
+    async with session_scope() as session:
+        return await session.scalar(select(func.count(User.id))) or 0
+
+
+def _user_filter_conditions(
+    university: Optional[str] = None,
+    admission_type: Optional[str] = None,
+) -> list:
+    """Условия фильтрации пользователей по профилю ментора (только активные профили)"""
+    # is_active = true совпадает с условием частичного индекса ix_users_active_id
+    conditions = [User.is_active == True]  # noqa: E712
+    if university:
+        # @> обслуживается GIN-индексом ix_users_target_universities_gin, в отличие от ANY()
+        conditions.append(User.target_universities.contains([university]))  # type: ignore
+    if admission_type:
+        conditions.append(User.admission_type == admission_type)  # type: ignore
+    return conditions
+
+
+async def get_user_candidates(
+    university: Optional[str] = None,
+    admission_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Получить всех подходящих пользователей для ранжирования (только id и описание).
+
+    Args:
+        university: Университет для фильтрации
+        admission_type: Тип поступления для фильтрации
+
+    Returns:
+        Список словарей с ключами id и description, упорядоченный по id
+    """
+    conditions = _user_filter_conditions(university, admission_type)
+    async with session_scope() as session:
+        result = await session.execute(
+            select(User.id, User.description).where(*conditions).order_by(User.id) # type: ignore
+        )
+        return [
+            {"id": user_id, "description": description or ""}
+            for user_id, description in result.all()
+        ]
+
+
+async def get_user_snapshot_rows() -> List[Dict[str, Any]]:
+    """
+    Получить всех пользователей для снимка каталога (только поля ленты и фильтров).
+
+    Returns:
+        Список словарей, упорядоченный по id
+    """
+    async with session_scope() as session:
+        result = await session.execute(
+            select(
+                User.id,
+                User.name,
+                User.login,
+                User.description,
+                User.target_universities,
+                User.admission_type,
+                User.avatar_uuid,
+                User.is_active,
+            ).order_by(User.id) # type: ignore
+        )
+        return [dict(row) for row in result.mappings().all()]
 
 
 async def get_filtered_users(
@@ -106,7 +269,9 @@ async def get_filtered_users(
     admission_type: Optional[str] = None,
     page: int = 1,
     size: int = 10,
-) -> Tuple[List[User], int]:
+    after_id: Optional[int] = None,
+    total: Optional[int] = None,
+) -> Tuple[List[User], int, bool]:
     """
     Получить список пользователей с фильтрацией по университету
     и типу поступления
@@ -116,32 +281,33 @@ async def get_filtered_users(
         admission_type: Тип поступления для фильтрации
         page: Номер страницы для пагинации
         size: Размер страницы для пагинации
+        after_id: Курсор keyset-пагинации (id последнего пользователя предыдущей страницы)
+        total: Общее количество из курсора; если задано, COUNT не выполняется
         
     Returns:
-        Кортеж из списка пользователей и общего количества пользователей
+        Кортеж из списка пользователей, общего количества пользователей
+        и признака, что после страницы есть еще пользователи
     """
     async with session_scope() as session:
         # Базовый запрос и условия фильтрации
-        conditions = []
-        if university:
-            conditions.append(User.target_universities.any(university))  # type: ignore
-        if admission_type:
-            conditions.append(User.admission_type == admission_type)  # type: ignore
+        conditions = _user_filter_conditions(university, admission_type)
             
         # Создаем запрос с фильтрами
-        query = select(User)
-        if conditions:
-            query = query.where(*conditions)
+        query = select(User).where(*conditions).order_by(User.id) # type: ignore
             
         # Считаем общее количество с учетом фильтров
-        count_result = await session.execute(select(func.count(User.id)).where(*conditions) if conditions else select(func.count(User.id))) # type: ignore
-        total = count_result.scalar() or 0
+        if total is None:
+            count_result = await session.execute(select(func.count(User.id)).where(*conditions)) # type: ignore
+            total = count_result.scalar() or 0
         
-        # Применяем пагинацию
-        skip = (page - 1) * size
-        query = query.offset(skip).limit(size)
+        # Применяем пагинацию; одна лишняя строка показывает, есть ли следующая страница
+        if after_id is not None:
+            query = query.where(User.id > after_id).limit(size + 1) # type: ignore
+        else:
+            skip = (page - 1) * size
+            query = query.offset(skip).limit(size + 1)
         
         result = await session.execute(query)
         users = list(result.scalars().all())
         
-        return users, total
+        return users[:size], total, len(users) > size
@@ -1,26 +1,39 @@
 from math import ceil
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from urllib.parse import urljoin
 
-from fastapi import APIRouter, Depends, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 
+from src.config import RANKING_LOCK_TIMEOUT, RANKING_LOCK_WAIT
 from src.data.models import Mentor, User
-from src.repository.mentor_repository import get_filtered_mentors, get_mentors
-from src.repository.user_repository import get_filtered_users, get_users
+from src.repository.mentor_repository import (
+    get_filtered_mentors,
+    get_mentor_candidates,
+    get_mentors_by_ids,
+)
+from src.repository.user_repository import (
+    get_filtered_users,
+    get_user_candidates,
+    get_users_by_ids,
+)
 from src.schemas.schemas import FeedResponse, MentorFeedResponse, UserFeedResponse
 from src.security.auth import (
     get_optional_current_mentor,
     get_optional_current_user,
 )
-from src.services.interest_rating import InterestRatingService
+from src.services.catalog_snapshot import catalog_snapshots
+from src.services.interest_rating import interest_service
 from src.services.redis_service import RedisService, get_redis_service
+from src.services.single_flight import SingleFlight
+from src.utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(
     tags=["feed"],
     responses={404: {"description": "Not found"}},
 )
 
-interest_service = InterestRatingService()
+# Одновременные ранжирования с одинаковым ключом выполняются один раз
+ranking_flight = SingleFlight()
 
 
 def prepare_mentor_data(mentor: Mentor, base_url: str) -> Dict:
@@ -59,6 +72,88 @@ def prepare_user_data(user: User, base_url: str) -> Dict:
     }
 
 
+def read_cursor(cursor: Optional[str], field: str, required: bool = True) -> Optional[int]:
+    """
+    Достает позицию из курсора ленты; ранжированная лента ищет по рангу, обычная по id.
+
+    Отрицательные значения отклоняются: в ZRANGE и срезах списка они
+    означали бы отсчет с конца. Необязательное поле (required=False)
+    может отсутствовать в курсорах старого формата.
+    """
+    if cursor is None:
+        return None
+    try:
+        position = decode_cursor(cursor)
+        if not required and field not in position:
+            return None
+        value = int(position[field])
+    except (ValueError, KeyError, TypeError):
+        value = -1
+    if value < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return value
+
+
+def merge_ranking(ranked_ids: List[Any], candidate_ids: List[int]) -> List[int]:
+    """
+    Приводит ответ ранжировщика к полному списку id кандидатов.
+
+    Неизвестные и повторяющиеся id отбрасываются, кандидаты,
+    которых нет в ответе, добавляются в конец в исходном порядке.
+    """
+    known = set(candidate_ids)
+    result = []
+    seen = set()
+    for item_id in ranked_ids:
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            continue
+        if item_id in known and item_id not in seen:
+            seen.add(item_id)
+            result.append(item_id)
+    result.extend(item_id for item_id in candidate_ids if item_id not in seen)
+    return result
+
+
+async def build_ranking(
+    redis_service: RedisService,
+    ranking_key: str,
+    load_candidates: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    rank: Callable[[List[Dict[str, Any]]], Awaitable[List[Any]]],
+) -> List[int]:
+    """
+    Строит ранжирование ленты и сохраняет его в Redis.
+
+    Одновременные запросы с одинаковым ключом внутри процесса ждут один вызов,
+    а блокировка в Redis не дает нескольким воркерам ранжировать одно и то же.
+
+    Args:
+        redis_service: Сервис Redis
+        ranking_key: Ключ ранжирования
+        load_candidates: Загрузка кандидатов (id и description)
+        rank: Ранжирование кандидатов
+
+    Returns:
+        Полный список id кандидатов в порядке ранжирования
+    """
+    async def build() -> List[int]:
+        async with redis_service.lock(ranking_key, RANKING_LOCK_TIMEOUT, RANKING_LOCK_WAIT):
+            # Пока ждали блокировку, ранжирование мог построить другой воркер
+            existing = await redis_service.get_ranking(ranking_key)
+            if existing is not None:
+                return existing
+
+            candidates = await load_candidates()
+            ranked_ids = merge_ranking(await rank(candidates), [c["id"] for c in candidates])
+            await redis_service.set_ranking(ranking_key, ranked_ids)
+            return ranked_ids
+
+    return await ranking_flight.do(ranking_key, build)
+
+
 @router.get("/mentors", response_model=FeedResponse)
 async def get_mentors_feed(
     request: Request,
@@ -67,12 +162,14 @@ async def get_mentors_feed(
     filtered: bool = Query(True, description="Whether to filter by profile parameters"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor; overrides page"),
 ):
     """
     Fetch feed of mentors with pagination.
     If filtered=true, returns mentors that match the current user's profile.
     If filtered=false, returns all mentors.
     Mentors are sorted by interest relevance if user is authenticated.
+    Pass next_cursor of the previous response as cursor for keyset pagination.
     """
     if page < 1:
         page = 1
@@ -81,95 +178,96 @@ async def get_mentors_feed(
     elif size > 100:
         size = 100
 
-    items = []
-    total = 0
+    base_url = str(request.base_url)
 
-    # Получаем список менторов
+    # Параметры фильтрации по профилю пользователя
+    target_universities = []
+    admission_type_value = ""
     if filtered and current_user:
-        target_universities = current_user.target_universities if current_user else []
-        admission_type_value = ""
-
-        if current_user and current_user.admission_type:
+        target_universities = current_user.target_universities or []
+        if current_user.admission_type:
             admission_type_value = str(current_user.admission_type)
 
-        mentors, total = await get_filtered_mentors(
-            target_universities=target_universities,
-            admission_type=admission_type_value,
-            page=1,
-            size=1000,
-        )
-    else:
-        mentors, total = await get_mentors(page=1, size=1000)
-
-    # Подготавливаем данные менторов
-    mentor_list = []
-    mentor_data_list = []
-    base_url = str(request.base_url)
-
-    for mentor in mentors:
-        mentor_data = prepare_mentor_data(mentor, base_url)
-        mentor_data_list.append(mentor_data)
-        mentor_list.append(MentorFeedResponse(**mentor_data))
+    # Снимок каталога в общей памяти; без него читаем из Postgres
+    catalog_version = await redis_service.get_catalog_version("mentors")
+    snapshot = await catalog_snapshots.get("mentors", catalog_version)
 
-    # Проверяем кеш, если есть авторизованный пользователь
     if current_user and current_user.description:
-        cache_key = redis_service.generate_feed_cache_key(
-            current_user.description,
-            mentor_data_list,
-            filtered,
-            page,
-            size,
-        )
-        cached_response = await redis_service.get_cache(cache_key)
-        if cached_response:
-            return FeedResponse(**cached_response)
-
-    if current_user and current_user.description:
-        mentors_for_ranking = [
-            {"id": m.id, "description": m.description or ""} for m in mentor_list
-        ]
+        # Одно ранжирование в sorted set обслуживает все страницы и размеры страниц
+        rank_offset = read_cursor(cursor, "rank")
+        start_idx = rank_offset if rank_offset is not None else (page - 1) * size
+        end_idx = start_idx + size
 
-        ranked_mentor_ids = await interest_service.get_ranked_mentors(
-            mentors=mentors_for_ranking, user_description=current_user.description
+        ranking_key = redis_service.generate_feed_ranking_key(
+            "mentors",
+            current_user.id,
+            # version растет при каждом обновлении профиля, в том числе описания и фильтров
+            current_user.version,
+            catalog_version,
+            filtered,
         )
-
-        mentor_dict = {m.id: m for m in mentor_list}
-
-        sorted_mentors = []
-        for mentor_id in ranked_mentor_ids:
-            if mentor_id in mentor_dict:
-                sorted_mentors.append(mentor_dict[mentor_id])
-
-        remaining_mentors = [m for m in mentor_list if m.id not in ranked_mentor_ids]
-        sorted_mentors.extend(remaining_mentors)
-
-        start_idx = (page - 1) * size
-        end_idx = start_idx + size
-        items = sorted_mentors[start_idx:end_idx]
+        ranking_page = await redis_service.get_ranking_page(ranking_key, start_idx, end_idx - 1)
+
+        async def load_candidates() -> List[Dict[str, Any]]:
+            # Ранжирование сохраняется под текущей версией каталога, поэтому отставший снимок не подходит
+            if snapshot is not None and snapshot.version >= catalog_version:
+                return snapshot.candidates(snapshot.filter_mentors(target_universities, admission_type_value))
+            return await get_mentor_candidates(
+                target_universities=target_universities,
+                admission_type=admission_type_value,
+            )
+
+        if ranking_page is not None:
+            page_ids, total = ranking_page
+        else:
+            ranked_mentor_ids = await build_ranking(
+                redis_service,
+                ranking_key,
+                load_candidates,
+                lambda mentors_for_ranking: interest_service.get_ranked_mentors(
+                    mentors=mentors_for_ranking, user_description=current_user.description
+                ),
+            )
+
+            page_ids, total = ranked_mentor_ids[start_idx:end_idx], len(ranked_mentor_ids)
+
+        mentors = snapshot.records(snapshot.rows_for_ids(page_ids)) if snapshot is not None else []
+        # Снимок может отставать от каталога: страницу с профилями, которых в нем нет, читаем из Postgres
+        if len(mentors) < len(page_ids):
+            mentors = await get_mentors_by_ids(page_ids)
+        next_cursor = encode_cursor({"rank": end_idx}) if end_idx < total else None
     else:
-        start_idx = (page - 1) * size
-        end_idx = start_idx + size
-        items = mentor_list[start_idx:end_idx]
-
+        # Без ранжирования читаем только одну страницу
+        after_id = read_cursor(cursor, "id")
+        # Общее количество считается на первой странице и дальше передается в курсоре
+        cursor_total = read_cursor(cursor, "total", required=False)
+        if snapshot is not None:
+            mentors, total, has_more = snapshot.page(
+                snapshot.filter_mentors(target_universities, admission_type_value), page, size, after_id
+            )
+        else:
+            mentors, total, has_more = await get_filtered_mentors(
+                target_universities=target_universities,
+                admission_type=admission_type_value,
+                page=page,
+                size=size,
+                after_id=after_id,
+                total=cursor_total,
+            )
+        next_cursor = encode_cursor({"id": mentors[-1].id, "total": total}) if has_more else None
+
+    items = [MentorFeedResponse(**prepare_mentor_data(m, base_url)) for m in mentors]
     total_pages = ceil(total / size) if total > 0 else 1
 
-    response = FeedResponse(
-        items=items, total=total, page=page, size=size, pages=total_pages
+    return FeedResponse(
+        items=items,
+        total=total,
+        page=page,
+        size=size,
+        pages=total_pages,
+        next_cursor=next_cursor,
     )
 
-    # Сохраняем результат в кеш, если есть авторизованный пользователь
-    if current_user and current_user.description:
-        cache_key = redis_service.generate_feed_cache_key(
-            current_user.description,
-            mentor_data_list,
-            filtered,
-            page,
-            size,
-        )
-        await redis_service.set_cache(cache_key, response.dict())
-
-    return response
-
 
 @router.get("/users", response_model=FeedResponse)
 async def get_users_feed(
@@ -179,11 +277,13 @@ async def get_users_feed(
     filtered: bool = Query(True, description="Whether to filter by profile parameters"),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor; overrides page"),
 ):
     """
     Fetch feed of users with pagination.
     If filtered=true, returns users that match the current mentor's profile.
     If filtered=false, returns all users.
+    Pass next_cursor of the previous response as cursor for keyset pagination.
     """
     if page < 1:
         page = 1
@@ -192,91 +292,92 @@ async def get_users_feed(
     elif size > 100:
         size = 100
 
-    items = []
-    total = 0
+    base_url = str(request.base_url)
 
-    # Получаем список пользователей
+    # Параметры фильтрации по профилю ментора
+    university = None
+    admission_type_value = ""
     if filtered and current_mentor:
         university = current_mentor.university
-        admission_type_value = ""
-
-        if current_mentor and current_mentor.admission_type:
+        if current_mentor.admission_type:
             admission_type_value = str(current_mentor.admission_type)
 
-        users, total = await get_filtered_users(
-            university=university,
-            admission_type=admission_type_value,
-            page=1,
-            size=1000,
-        )
-    else:
-        users, total = await get_users(page=1, size=1000)
+    # Снимок каталога в общей памяти; без него читаем из Postgres
+    catalog_version = await redis_service.get_catalog_version("users")
+    snapshot = await catalog_snapshots.get("users", catalog_version)
 
-    # Подготавливаем данные пользователей
-    user_list = []
-    user_data_list = []
-    base_url = str(request.base_url)
-
-    for user in users:
-        user_data = prepare_user_data(user, base_url)
-        user_data_list.append(user_data)
-        user_list.append(UserFeedResponse(**user_data))
-
-    # Проверяем кеш, если есть авторизованный ментор
     if current_mentor and current_mentor.description:
-        cache_key = redis_service.generate_feed_cache_key(
-            current_mentor.description,
-            user_data_list,
-            filtered,
-            page,
-            size,
-        )
-        cached_response = await redis_service.get_cache(cache_key)
-        if cached_response:
-            return FeedResponse(**cached_response)
-
-    if current_mentor and current_mentor.description:
-        users_for_ranking = [
-            {"id": u.id, "description": u.description or ""} for u in user_list
-        ]
+        # Одно ранжирование в sorted set обслуживает все страницы и размеры страниц
+        rank_offset = read_cursor(cursor, "rank")
+        start_idx = rank_offset if rank_offset is not None else (page - 1) * size
+        end_idx = start_idx + size
 
-        ranked_user_ids = await interest_service.get_ranked_users(
-            users=users_for_ranking, mentor_description=current_mentor.description
+        ranking_key = redis_service.generate_feed_ranking_key(
+            "users",
+            current_mentor.id,
+            # version растет при каждом обновлении профиля, в том числе описания и фильтров
+            current_mentor.version,
+            catalog_version,
+            filtered,
         )
-
-        user_dict = {u.id: u for u in user_list}
-
-        sorted_users = []
-        for user_id in ranked_user_ids:
-            if user_id in user_dict:
-                sorted_users.append(user_dict[user_id])
-
-        remaining_users = [u for u in user_list if u.id not in ranked_user_ids]
-        sorted_users.extend(remaining_users)
-
-        start_idx = (page - 1) * size
-        end_idx = start_idx + size
-        items = sorted_users[start_idx:end_idx]
+        ranking_page = await redis_service.get_ranking_page(ranking_key, start_idx, end_idx - 1)
+
+        async def load_candidates() -> List[Dict[str, Any]]:
+            # Ранжирование сохраняется под текущей версией каталога, поэтому отставший снимок не подходит
+            if snapshot is not None and snapshot.version >= catalog_version:
+                return snapshot.candidates(snapshot.filter_users(university, admission_type_value))
+            return await get_user_candidates(
+                university=university,
+                admission_type=admission_type_value,
+            )
+
+        if ranking_page is not None:
+            page_ids, total = ranking_page
+        else:
+            ranked_user_ids = await build_ranking(
+                redis_service,
+                ranking_key,
+                load_candidates,
+                lambda users_for_ranking: interest_service.get_ranked_users(
+                    users=users_for_ranking, mentor_description=current_mentor.description
+                ),
+            )
+
+            page_ids, total = ranked_user_ids[start_idx:end_idx], len(ranked_user_ids)
+
+        users = snapshot.records(snapshot.rows_for_ids(page_ids)) if snapshot is not None else []
+        # Снимок может отставать от каталога: страницу с профилями, которых в нем нет, читаем из Postgres
+        if len(users) < len(page_ids):
+            users = await get_users_by_ids(page_ids)
+        next_cursor = encode_cursor({"rank": end_idx}) if end_idx < total else None
     else:
-        start_idx = (page - 1) * size
-        end_idx = start_idx + size
-        items = user_list[start_idx:end_idx]
-
+        # Без ранжирования читаем только одну страницу
+        after_id = read_cursor(cursor, "id")
+        # Общее количество считается на первой странице и дальше передается в курсоре
+        cursor_total = read_cursor(cursor, "total", required=False)
+        if snapshot is not None:
+            users, total, has_more = snapshot.page(
+                snapshot.filter_users(university, admission_type_value), page, size, after_id
+            )
+        else:
+            users, total, has_more = await get_filtered_users(
+                university=university,
+                admission_type=admission_type_value,
+                page=page,
+                size=size,
+                after_id=after_id,
+                total=cursor_total,
+            )
+        next_cursor = encode_cursor({"id": users[-1].id, "total": total}) if has_more else None
+
+    items = [UserFeedResponse(**prepare_user_data(u, base_url)) for u in users]
     total_pages = ceil(total / size) if total > 0 else 1
 
-    response = FeedResponse(
-        items=items, total=total, page=page, size=size, pages=total_pages
+    return FeedResponse(
+        items=items,
+        total=total,
+        page=page,
+        size=size,
+        pages=total_pages,
+        next_cursor=next_cursor,
     )
-
-    # Сохраняем результат в кеш, если есть авторизованный ментор
-    if current_mentor and current_mentor.description:
-        cache_key = redis_service.generate_feed_cache_key(
-            current_mentor.description,
-            user_data_list,
-            filtered,
-            page,
-            size,
-        )
-        await redis_service.set_cache(cache_key, response.dict())
-
-    return response
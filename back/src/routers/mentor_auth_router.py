@@ -7,6 +7,7 @@ from fastapi import (
     Depends,
     HTTPException,
     Request,
+    Response,
     status,
 )
 
@@ -17,14 +18,17 @@ from src.schemas.schemas import (
     MentorLoginSchema,
     MentorResponse,
     MentorUpdateSchema,
+    RefreshTokenSchema,
     Token,
 )
-from src.security.auth import get_current_mentor
+from src.config import Roles
+from src.security.auth import get_current_mentor, oauth2_scheme, refresh_tokens, revoke_tokens
 from src.services.mentor_auth_service import (
     authenticate_mentor,
     register_mentor,
     update_mentor_profile_service,
 )
+from src.services.rate_limiter import enforce_auth_rate_limit
 
 router = APIRouter(tags=["authentication"])
 
@@ -32,7 +36,8 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: MentorCreationSchema):
+async def signup(request: Request, user_data: MentorCreationSchema):
+    await enforce_auth_rate_limit(request, "mentors:signup")
     result = await register_mentor(user_data)
     if not result:
         raise HTTPException(
@@ -43,9 +48,24 @@ async def signup(user_data: MentorCreationSchema):
 
 
 @router.post("/signin", response_model=Token)
-async def signin(user_data: MentorLoginSchema):
-    _, access_token = await authenticate_mentor(user_data.login, user_data.password)
-    return {"access_token": access_token, "token_type": "bearer"}
+async def signin(request: Request, user_data: MentorLoginSchema):
+    # Ограничение проверяется до bcrypt, иначе перебор паролей занимает CPU
+    await enforce_auth_rate_limit(request, "mentors:signin", user_data.login)
+    _, tokens = await authenticate_mentor(user_data.login, user_data.password)
+    return tokens
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshTokenSchema):
+    """Обмен refresh-токена на новую пару токенов без повторного ввода пароля"""
+    return await refresh_tokens(Roles.MENTOR, data.refresh_token)
+
+
+@router.post("/signout", status_code=status.HTTP_204_NO_CONTENT)
+async def signout(data: RefreshTokenSchema, token: str = Depends(oauth2_scheme)):
+    """Отзыв текущего access-токена и refresh-токена"""
+    await revoke_tokens(token, data.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/me", response_model=MentorResponse)
@@ -122,4 +142,5 @@ async def update_mentor_profile(
         updated_at=updated_mentor.updated_at,
         free_days=updated_mentor.free_days,
         admission_type=updated_mentor.admission_type,
+        version=updated_mentor.version,
     )
@@ -1,34 +1,57 @@
-from typing import List, Optional, Union
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer, any_, cast, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import REQUEST_EVENTS_AUTH_CHECK_INTERVAL, REQUEST_EVENTS_KEEPALIVE, REQUEST_EVENTS_TICKET_TTL
 from src.data.base import session_scope
 from src.data.models import EntityType, Mentor, Request, RequestStatus, User
 from src.schemas.request_schemas import (
+    BulkDecisionItem,
+    BulkDecisionResponse,
+    BulkRequestCreate,
+    BulkRequestIds,
+    BulkRequestOutcome,
+    BulkSendItem,
+    BulkSendResponse,
     ContactInfo,
     RequestApproveResponse,
+    RequestCounts,
     RequestCreate,
+    RequestEventsTicket,
     RequestRejectResponse,
     RequestResponse,
     RequestResponseWithReceiver,
     RequestResponseWithSender,
 )
+from src.repository.mentor_repository import get_mentors_by_ids
+from src.repository.user_repository import get_users_by_ids
 from src.schemas.schemas import MentorFeedResponse, UserFeedResponse
-from src.security.auth import get_optional_current_mentor, get_optional_current_user
+from src.security.auth import TokenPrincipal, get_optional_token_principal, oauth2_scheme_optional
+from src.services.request_counters import request_counters
+from src.services.request_events import (
+    REQUEST_CREATED,
+    REQUEST_STATUS_CHANGED,
+    request_event,
+    request_events,
+)
 from src.utils.constants import AVATAR_URL
+from src.utils.pagination import decode_cursor, encode_cursor
 
 
 async def get_current_user_or_mentor(
-    user: User = Depends(get_optional_current_user),
-    mentor: Mentor = Depends(get_optional_current_mentor)
-) -> Union[User, Mentor]:
-    """Получить текущего пользователя или ментора."""
-    if user:
-        return user
-    if mentor:
-        return mentor
+    principal: Optional[TokenPrincipal] = Depends(get_optional_token_principal),
+) -> TokenPrincipal:
+    """Получить текущего пользователя или ментора по claims токена, без запроса в базу."""
+    if principal:
+        return principal
     raise HTTPException(
         status_code=401,
         detail="Требуется аутентификация"
@@ -41,10 +64,235 @@ router = APIRouter(
 )
 
 
+def to_feed_response(entity: Union[User, Mentor]) -> Union[UserFeedResponse, MentorFeedResponse]:
+    """Карточка пользователя или ментора для списка заявок"""
+    if isinstance(entity, User):
+        response = UserFeedResponse.model_validate(entity)
+    else:
+        response = MentorFeedResponse.model_validate(entity)
+    # Добавляем URL аватара, если есть UUID
+    if entity.avatar_uuid and not response.avatar_url:
+        response.avatar_url = f"{AVATAR_URL}/{entity.avatar_uuid}"
+    return response
+
+
+def as_local_naive(value: datetime) -> datetime:
+    """
+    Момент времени в формате колонок created_at и updated_at.
+
+    Колонки - TIMESTAMP без зоны, в них пишется datetime.now(), то есть
+    локальное время сервера. Время с зоной (например, ...Z) переводится
+    в локальное, иначе asyncpg не сравнит его с колонкой без зоны.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+async def load_requests_page(
+    conditions: list,
+    status: Optional[RequestStatus],
+    updated_since: Optional[datetime],
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[List[Request], Optional[str]]:
+    """
+    Страница заявок от новых к старым с keyset-пагинацией по (created_at, id).
+
+    Args:
+        conditions: Условия на владельца списка (отправитель или получатель)
+        status: Фильтр по статусу
+        updated_since: Только заявки, измененные после этого момента
+        cursor: Курсор из X-Next-Cursor предыдущей страницы
+        limit: Размер страницы
+
+    Returns:
+        Кортеж (заявки, курсор следующей страницы или None)
+    """
+    conditions = list(conditions)
+    if status is not None:
+        conditions.append(Request.status == status)
+    if updated_since is not None:
+        conditions.append(Request.updated_at > as_local_naive(updated_since))
+    if cursor is not None:
+        try:
+            position = decode_cursor(cursor)
+            created_at = as_local_naive(datetime.fromisoformat(position["created_at"]))
+            request_id = int(position["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        conditions.append(tuple_(Request.created_at, Request.id) < tuple_(created_at, request_id))
+
+    async with session_scope() as session:
+        # Одна лишняя строка показывает, есть ли следующая страница
+        result = await session.execute(
+            select(Request)
+            .where(*conditions)
+            .order_by(Request.created_at.desc(), Request.id.desc())
+            .limit(limit + 1)
+        )
+        requests = list(result.scalars().all())
+
+    next_cursor = None
+    if len(requests) > limit:
+        requests = requests[:limit]
+        last = requests[-1]
+        next_cursor = encode_cursor({"created_at": last.created_at.isoformat(), "id": last.id})
+    return requests, next_cursor
+
+
+async def load_counterparties(
+    refs: List[Tuple[EntityType, int]],
+) -> Dict[Tuple[EntityType, int], Union[UserFeedResponse, MentorFeedResponse]]:
+    """
+    Загружает участников заявок: один запрос на пользователей и один на менторов.
+
+    Args:
+        refs: Пары (тип, id)
+
+    Returns:
+        Карточки по ключу (тип, id); несуществующие профили отсутствуют
+    """
+    user_ids = sorted({entity_id for entity_type, entity_id in refs if entity_type == EntityType.USER})
+    mentor_ids = sorted({entity_id for entity_type, entity_id in refs if entity_type == EntityType.MENTOR})
+
+    users, mentors = await asyncio.gather(get_users_by_ids(user_ids), get_mentors_by_ids(mentor_ids))
+
+    result: Dict[Tuple[EntityType, int], Union[UserFeedResponse, MentorFeedResponse]] = {}
+    for user in users:
+        result[(EntityType.USER, user.id)] = to_feed_response(user)
+    for mentor in mentors:
+        result[(EntityType.MENTOR, mentor.id)] = to_feed_response(mentor)
+    return result
+
+
+def check_sender_allowed(sender: TokenPrincipal, receiver_type: EntityType, receiver_ids: List[int]) -> None:
+    """
+    Проверяет, что отправитель может писать получателям этого типа.
+
+    Raises:
+        HTTPException: 400 при заявке самому себе или получателю того же типа
+    """
+    if sender.entity_type == receiver_type and sender.id in receiver_ids:
+        raise HTTPException(
+            status_code=400,
+            detail="Нельзя отправить заявку самому себе"
+        )
+    if sender.entity_type == receiver_type:
+        raise HTTPException(
+            status_code=400,
+            detail="Пользователь может отправлять заявки только менторам, а ментор только пользователям"
+        )
+
+
+def insert_requests_statement(
+    sender: TokenPrincipal,
+    receiver_type: EntityType,
+    receiver_ids: List[int],
+    message: Optional[str],
+):
+    """
+    INSERT ... SELECT заявок существующим получателям из списка.
+
+    Строки берутся из таблицы получателя, поэтому несуществующим получателям
+    ничего не вставляется. Повторная заявка той же паре упирается в
+    ux_requests_sender_receiver и тоже пропускается. Возвращает вставленные строки.
+    """
+    receiver_model = User if receiver_type == EntityType.USER else Mentor
+    columns = Request.__table__.c
+    now = datetime.now()
+
+    # Явные CAST: иначе Postgres считает параметры в списке SELECT текстом, а enum из текста не присваивается
+    receiver_rows = select(
+        cast(sender.id, columns.sender_id.type),
+        cast(sender.entity_type, columns.sender_type.type),
+        receiver_model.id,
+        cast(receiver_type, columns.receiver_type.type),
+        cast(message, columns.message.type),
+        cast(RequestStatus.PENDING, columns.status.type),
+        cast(now, columns.created_at.type),
+        cast(now, columns.updated_at.type),
+    ).where(receiver_model.id == any_(literal(receiver_ids, ARRAY(Integer)))) # type: ignore
+    return (
+        pg_insert(Request)
+        .from_select(
+            [
+                "sender_id",
+                "sender_type",
+                "receiver_id",
+                "receiver_type",
+                "message",
+                "status",
+                "created_at",
+                "updated_at",
+            ],
+            receiver_rows,
+        )
+        .on_conflict_do_nothing(
+            index_elements=["sender_type", "sender_id", "receiver_type", "receiver_id"]
+        )
+        .returning(*columns)
+    )
+
+
+async def decide_requests(
+    receiver: TokenPrincipal, request_ids: List[int], new_status: RequestStatus
+) -> Dict[int, ContactInfo]:
+    """
+    Переводит ожидающие заявки получателя в новый статус одним UPDATE ... RETURNING.
+
+    При подтверждении UPDATE соединяется с таблицей отправителей и сразу
+    возвращает их контакты; заявки от удаленных отправителей не меняются.
+
+    Args:
+        receiver: Получатель заявок
+        request_ids: ID заявок
+        new_status: ACCEPTED или REJECTED
+
+    Returns:
+        Контакты отправителя по ID измененной заявки (для отклонения - пустые)
+    """
+    conditions = [
+        Request.id == any_(literal(request_ids, ARRAY(Integer))), # type: ignore
+        Request.receiver_id == receiver.id, # type: ignore
+        Request.receiver_type == receiver.entity_type, # type: ignore
+        Request.status == RequestStatus.PENDING, # type: ignore
+    ]
+    if new_status == RequestStatus.ACCEPTED:
+        sender_model = Mentor if receiver.entity_type == EntityType.USER else User
+        sender_type = EntityType.MENTOR if receiver.entity_type == EntityType.USER else EntityType.USER
+        conditions += [
+            Request.sender_type == sender_type, # type: ignore
+            Request.sender_id == sender_model.id, # type: ignore
+        ]
+        contacts = (sender_model.email.label("email"), sender_model.telegram_link.label("telegram_link"))
+    else:
+        contacts = (literal(None).label("email"), literal(None).label("telegram_link"))
+
+    stmt = (
+        update(Request)
+        .where(*conditions)
+        .values(status=new_status)
+        .returning(*Request.__table__.c, *contacts)
+        .execution_options(synchronize_session=False)
+    )
+    async with session_scope() as session:
+        result = await session.execute(stmt)
+        rows = result.mappings().all()
+        await session.commit()
+
+    await request_counters.record_decided(rows, new_status)
+    await request_events.publish([request_event(REQUEST_STATUS_CHANGED, row) for row in rows])
+    return {
+        row["id"]: ContactInfo(email=row["email"], telegram_link=row["telegram_link"])
+        for row in rows
+    }
+
+
 @router.post("/send", response_model=RequestResponse)
 async def send_request(
     request_data: RequestCreate,
-    current_user: Union[User, Mentor] = Depends(get_current_user_or_mentor),
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
 ):
     """
     Отправить заявку на менторство.
@@ -54,212 +302,331 @@ async def send_request(
     - Нельзя отправить заявку самому себе
     - Нельзя отправить заявку, если уже есть активная заявка к этому получателю
     """
-    # Определяем тип отправителя
-    sender_type = EntityType.USER if isinstance(current_user, User) else EntityType.MENTOR
+    check_sender_allowed(current_user, request_data.receiver_type, [request_data.receiver_id])
 
-    # Проверяем, что отправитель не отправляет заявку самому себе
-    if current_user.id == request_data.receiver_id and sender_type == request_data.receiver_type:
-        raise HTTPException(
-            status_code=400,
-            detail="Нельзя отправить заявку самому себе"
+    stmt = insert_requests_statement(
+        current_user, request_data.receiver_type, [request_data.receiver_id], request_data.message
+    )
+    async with session_scope() as session:
+        result = await session.execute(stmt)
+        new_request = result.mappings().first()
+        if new_request is not None:
+            await session.commit()
+            await request_counters.record_created([new_request])
+            await request_events.publish([request_event(REQUEST_CREATED, new_request)])
+            return dict(new_request)
+
+        # Ничего не вставлено - выясняем причину, это нужно только для текста ошибки
+        receiver_model = User if request_data.receiver_type == EntityType.USER else Mentor
+        receiver_exists = await session.scalar(
+            select(receiver_model.id).where(receiver_model.id == request_data.receiver_id) # type: ignore
         )
 
-    # Проверяем, что пользователь отправляет заявку ментору и наоборот
-    if sender_type == request_data.receiver_type:
+    if not receiver_exists:
         raise HTTPException(
-            status_code=400,
-            detail="Пользователь может отправлять заявки только менторам, а ментор только пользователям"
+            status_code=404,
+            detail="Получатель не найден"
         )
+    raise HTTPException(
+        status_code=400,
+        detail="У вас уже есть активная заявка к этому получателю"
+    )
 
-    # Проверяем существование получателя
-    async with session_scope() as session:
-        if request_data.receiver_type == EntityType.USER:
-            query = select(User).where(User.id == request_data.receiver_id) # type: ignore
-        else:
-            query = select(Mentor).where(Mentor.id == request_data.receiver_id) # type: ignore
-        
-        result = await session.execute(query)
-        receiver = result.scalar_one_or_none()
-        
-        if not receiver:
-            raise HTTPException(
-                status_code=404,
-                detail="Получатель не найден"
-            )
-
-        # Проверяем, не существует ли уже активная заявка
-        existing_request = await session.execute(
-            select(Request).where(
-                and_(
-                    Request.sender_id == current_user.id, # type: ignore
-                    Request.sender_type == sender_type, # type: ignore
-                    Request.receiver_id == request_data.receiver_id, # type: ignore
-                    Request.receiver_type == request_data.receiver_type, # type: ignore
-                    # Request.status == RequestStatus.PENDING # type: ignore
-                )
-            )
-        ) # type: ignore
-        if existing_request.scalar_one_or_none():
-            raise HTTPException(
-                status_code=400,
-                detail="У вас уже есть активная заявка к этому получателю"
-            )
-
-        # Создаем новую заявку
-        new_request = Request(
-            sender_id=current_user.id,
-            sender_type=sender_type,
-            receiver_id=request_data.receiver_id,
-            receiver_type=request_data.receiver_type,
-            message=request_data.message,
-            status=RequestStatus.PENDING
-        )
 
-        session.add(new_request)
+@router.post("/send/bulk", response_model=BulkSendResponse)
+async def send_requests_bulk(
+    request_data: BulkRequestCreate,
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+):
+    """
+    Отправить одну и ту же заявку нескольким получателям одного типа.
+
+    Все заявки вставляются одним запросом. Для каждого получателя возвращается
+    результат: created, duplicate (заявка уже есть) или not_found.
+    """
+    receiver_ids = list(dict.fromkeys(request_data.receiver_ids))
+    check_sender_allowed(current_user, request_data.receiver_type, receiver_ids)
+
+    stmt = insert_requests_statement(
+        current_user, request_data.receiver_type, receiver_ids, request_data.message
+    )
+    async with session_scope() as session:
+        result = await session.execute(stmt)
+        created = {row["receiver_id"]: dict(row) for row in result.mappings().all()}
         await session.commit()
-        await session.refresh(new_request)
-        return new_request
+        await request_counters.record_created(list(created.values()))
+        await request_events.publish([request_event(REQUEST_CREATED, row) for row in created.values()])
+
+        skipped = [receiver_id for receiver_id in receiver_ids if receiver_id not in created]
+        existing = set()
+        if skipped:
+            receiver_model = User if request_data.receiver_type == EntityType.USER else Mentor
+            existing = set(await session.scalars(
+                select(receiver_model.id).where(receiver_model.id.in_(skipped)) # type: ignore
+            ))
+
+    results = []
+    for receiver_id in receiver_ids:
+        if receiver_id in created:
+            results.append(BulkSendItem(
+                receiver_id=receiver_id,
+                outcome=BulkRequestOutcome.CREATED,
+                request=RequestResponse.model_validate(created[receiver_id]),
+            ))
+        elif receiver_id in existing:
+            results.append(BulkSendItem(receiver_id=receiver_id, outcome=BulkRequestOutcome.DUPLICATE))
+        else:
+            results.append(BulkSendItem(receiver_id=receiver_id, outcome=BulkRequestOutcome.NOT_FOUND))
+    return BulkSendResponse(results=results)
 
 
 @router.get("/sent", response_model=List[RequestResponseWithReceiver])
 async def get_sent_requests(
-    current_user: Union[User, Mentor] = Depends(get_current_user_or_mentor),
+    response: Response,
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+    status: Optional[RequestStatus] = Query(None, description="Filter by request status"),
+    updated_since: Optional[datetime] = Query(None, description="Only requests changed after this moment"),
+    limit: int = Query(50, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
 ):
     """
-    Получить список отправленных заявок.
+    Получить список отправленных заявок, от новых к старым.
     
     - Для пользователей: список заявок, отправленных менторам
     - Для менторов: список заявок, отправленных пользователям
+    - Курсор следующей страницы возвращается в заголовке X-Next-Cursor
+    - Просмотр первой страницы сбрасывает счетчик accepted_unseen
     """
     # Определяем тип отправителя
-    sender_type = EntityType.USER if isinstance(current_user, User) else EntityType.MENTOR
+    sender_type = current_user.entity_type
+
+    if cursor is None:
+        await request_counters.mark_accepted_seen(sender_type, current_user.id)
+
+    requests, next_cursor = await load_requests_page(
+        [
+            Request.sender_type == sender_type, # type: ignore
+            Request.sender_id == current_user.id, # type: ignore
+        ],
+        status,
+        updated_since,
+        cursor,
+        limit,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Получателей загружаем одним запросом на каждый тип
+    receivers = await load_counterparties(
+        [(request.receiver_type, request.receiver_id) for request in requests]
+    )
+
+    requests_with_receivers = []
+    for request in requests:
+        # Создаем объект ответа с информацией о получателе
+        request_response = RequestResponseWithReceiver.model_validate(request)
+        request_response.receiver = receivers.get((request.receiver_type, request.receiver_id))
+        requests_with_receivers.append(request_response)
+
+    return requests_with_receivers
 
-    async with session_scope() as session:
-        query = select(Request).where(
-            and_(
-                Request.sender_id == current_user.id, # type: ignore
-                Request.sender_type == sender_type # type: ignore
-            )
-        )
-        result = await session.execute(query)
-        requests = result.scalars().all()
-        
-        requests_with_receivers = []
-        
-        for request in requests:
-            # Получаем информацию об получателе
-            receiver = None
-            if request.receiver_type == EntityType.USER:
-                # Если получатель - пользователь, получаем информацию о нем
-                user_query = select(User).where(User.id == request.receiver_id) # type: ignore
-                user_result = await session.execute(user_query)
-                user = user_result.scalars().first()
-                if user:
-                    receiver = UserFeedResponse.model_validate(user)
-                    # Добавляем URL аватара, если есть UUID
-                    if user.avatar_uuid and not receiver.avatar_url: # type: ignore
-                        receiver.avatar_url = f"{AVATAR_URL}/{user.avatar_uuid}"
-            else:
-                # Если получатель - ментор, получаем информацию о нем
-                mentor_query = select(Mentor).where(Mentor.id == request.receiver_id) # type: ignore
-                mentor_result = await session.execute(mentor_query)
-                mentor = mentor_result.scalars().first()
-                if mentor:
-                    receiver = MentorFeedResponse.model_validate(mentor)
-                    # Добавляем URL аватара, если есть UUID
-                    if mentor.avatar_uuid and not receiver.avatar_url:
-                        receiver.avatar_url = f"{AVATAR_URL}/{mentor.avatar_uuid}"
-            
-            # Создаем объект ответа с информацией об отправителе
-            request_response = RequestResponseWithReceiver.model_validate(request)
-            request_response.receiver = receiver
-            requests_with_receivers.append(request_response)
-        
-        return requests_with_receivers
-        
 
 @router.get("/got", response_model=List[RequestResponseWithSender])
 async def get_received_requests(
-    current_user: Union[User, Mentor] = Depends(get_current_user_or_mentor),
+    response: Response,
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+    status: Optional[RequestStatus] = Query(None, description="Filter by request status"),
+    updated_since: Optional[datetime] = Query(None, description="Only requests changed after this moment"),
+    limit: int = Query(50, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
 ):
     """
-    Получить список полученных заявок.
+    Получить список полученных заявок, от новых к старым.
     
     - Для пользователей: список заявок, полученных от менторов
     - Для менторов: список заявок, полученных от пользователей
+    - Курсор следующей страницы возвращается в заголовке X-Next-Cursor
     """
     # Определяем тип получателя
-    receiver_type = EntityType.USER if isinstance(current_user, User) else EntityType.MENTOR
+    receiver_type = current_user.entity_type
 
-    async with session_scope() as session:
-        query = select(Request).where(
-            and_(
-                Request.receiver_id == current_user.id, # type: ignore
-                Request.receiver_type == receiver_type # type: ignore
-            )
-        )
-        result = await session.execute(query)
-        requests = result.scalars().all()
-        
-        # Создаем список для хранения ответов с информацией об отправителях
-        requests_with_senders = []
-        
-        for request in requests:
-            # Получаем информацию об отправителе
-            sender = None
-            if request.sender_type == EntityType.USER:
-                # Если отправитель - пользователь, получаем информацию о нем
-                user_query = select(User).where(User.id == request.sender_id) # type: ignore
-                user_result = await session.execute(user_query)
-                user = user_result.scalars().first()
-                if user:
-                    sender = UserFeedResponse.model_validate(user)
-                    # Добавляем URL аватара, если есть UUID
-                    if user.avatar_uuid and not sender.avatar_url: # type: ignore
-                        sender.avatar_url = f"{AVATAR_URL}/{user.avatar_uuid}"
-            else:
-                # Если отправитель - ментор, получаем информацию о нем
-                mentor_query = select(Mentor).where(Mentor.id == request.sender_id) # type: ignore
-                mentor_result = await session.execute(mentor_query)
-                mentor = mentor_result.scalars().first()
-                if mentor:
-                    sender = MentorFeedResponse.model_validate(mentor)
-                    # Добавляем URL аватара, если есть UUID
-                    if mentor.avatar_uuid and not sender.avatar_url:
-                        sender.avatar_url = f"{AVATAR_URL}/{mentor.avatar_uuid}"
-            
-            # Создаем объект ответа с информацией об отправителе
-            request_response = RequestResponseWithSender.model_validate(request)
-            
-            # Добавляем telegram_link к sender, если статус ACCEPTED
-            if request.status == RequestStatus.ACCEPTED:
-                # Получаем отправителя с полной информацией
-                if request.sender_type == EntityType.USER:
-                    # Если отправитель - пользователь
-                    user_query = select(User).where(User.id == request.sender_id) # type: ignore
-                    user_result = await session.execute(user_query)
-                    user = user_result.scalar_one_or_none()
-                    if user and user.telegram_link and sender:
-                        sender.telegram_link = user.telegram_link
-                else:
-                    # Если отправитель - ментор
-                    mentor_query = select(Mentor).where(Mentor.id == request.sender_id) # type: ignore
-                    mentor_result = await session.execute(mentor_query)
-                    mentor = mentor_result.scalar_one_or_none()
-                    if mentor and mentor.telegram_link and sender:
-                        sender.telegram_link = mentor.telegram_link
-            
-            request_response.sender = sender
-                
-            requests_with_senders.append(request_response)
-        
-        return requests_with_senders
+    requests, next_cursor = await load_requests_page(
+        [
+            Request.receiver_type == receiver_type, # type: ignore
+            Request.receiver_id == current_user.id, # type: ignore
+        ],
+        status,
+        updated_since,
+        cursor,
+        limit,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    # Отправителей загружаем одним запросом на каждый тип; telegram_link
+    # для принятых заявок уже есть в загруженном профиле
+    senders = await load_counterparties(
+        [(request.sender_type, request.sender_id) for request in requests]
+    )
+
+    # Создаем список для хранения ответов с информацией об отправителях
+    requests_with_senders = []
+    for request in requests:
+        request_response = RequestResponseWithSender.model_validate(request)
+        request_response.sender = senders.get((request.sender_type, request.sender_id))
+        requests_with_senders.append(request_response)
+
+    return requests_with_senders
+
+
+@router.get("/counts", response_model=RequestCounts)
+async def get_request_counts(
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+):
+    """
+    Счетчики заявок для бейджей без загрузки списков.
+
+    - pending_received - входящие заявки в ожидании
+    - pending_sent - исходящие заявки в ожидании
+    - accepted_unseen - исходящие заявки, подтвержденные после последнего просмотра /requests/sent
+    """
+    return await request_counters.get(current_user.entity_type, current_user.id)
+
+
+@router.post("/events/ticket", response_model=RequestEventsTicket)
+async def issue_request_events_ticket(
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+):
+    """
+    Одноразовый билет для подключения к /requests/events из браузера.
+
+    EventSource не передает заголовок Authorization, поэтому браузер сначала
+    получает билет этим запросом с токеном, а затем открывает
+    /requests/events?ticket=<билет>. Билет действует REQUEST_EVENTS_TICKET_TTL
+    секунд и только для одного подключения.
+    """
+    ticket = await request_events.issue_ticket(token)
+    if ticket is None:
+        raise HTTPException(status_code=503, detail="Сервис событий недоступен")
+    return RequestEventsTicket(ticket=ticket, expires_in=REQUEST_EVENTS_TICKET_TTL)
+
+
+@router.get("/events")
+async def request_events_stream(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    ticket: Optional[str] = Query(None, description="One-time ticket from POST /requests/events/ticket"),
+):
+    """
+    Поток событий заявок текущего пользователя или ментора (Server-Sent Events).
+
+    - request.created - новая входящая или исходящая заявка
+    - request.status_changed - заявку подтвердили или отклонили
+    - session.expired - токен истек или отозван, поток закрывается
+
+    Авторизация - заголовок Authorization или, для браузерного EventSource,
+    одноразовый билет из POST /requests/events/ticket в параметре ticket.
+    Раз в REQUEST_EVENTS_AUTH_CHECK_INTERVAL секунд токен проверяется заново
+    (срок действия, отзыв, смена пароля); после session.expired клиент
+    получает новый токен и новый билет. Переподключение EventSource с
+    использованным билетом получит 401.
+
+    В событии только поля заявки; карточки участников клиент дозагружает
+    через /requests/got и /requests/sent с updated_since. Раз в
+    REQUEST_EVENTS_KEEPALIVE секунд приходит комментарий keepalive.
+    """
+    if not token and ticket:
+        token = await request_events.redeem_ticket(ticket)
+    current_user = await get_optional_token_principal(token)
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="Требуется аутентификация")
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        async with request_events.subscribe(current_user.entity_type, current_user.id) as queue:
+            # Пауза перед переподключением EventSource после обрыва
+            yield "retry: 3000\n\n"
+            check_at = loop.time() + REQUEST_EVENTS_AUTH_CHECK_INTERVAL
+            while True:
+                timeout = min(REQUEST_EVENTS_KEEPALIVE, max(0.0, check_at - loop.time()))
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    data = None
+
+                if loop.time() >= check_at:
+                    # Токен мог истечь или быть отозван, пока поток открыт
+                    if await get_optional_token_principal(token) is None:
+                        yield "event: session.expired\ndata: {}\n\n"
+                        return
+                    check_at = loop.time() + REQUEST_EVENTS_AUTH_CHECK_INTERVAL
+
+                if data is None:
+                    yield ": keepalive\n\n"
+                    continue
+                event_type = json.loads(data)["type"]
+                yield f"event: {event_type}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx отдает события сразу, не накапливая ответ
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def decide_requests_bulk(
+    current_user: TokenPrincipal, request_ids: List[int], new_status: RequestStatus
+) -> BulkDecisionResponse:
+    """Результаты пакетного подтверждения или отклонения в порядке запроса"""
+    request_ids = list(dict.fromkeys(request_ids))
+    contacts = await decide_requests(current_user, request_ids, new_status)
+
+    outcome = BulkRequestOutcome.APPROVED if new_status == RequestStatus.ACCEPTED else BulkRequestOutcome.REJECTED
+    results = []
+    for request_id in request_ids:
+        if request_id not in contacts:
+            results.append(BulkDecisionItem(request_id=request_id, outcome=BulkRequestOutcome.NOT_FOUND))
+        elif new_status == RequestStatus.ACCEPTED:
+            results.append(BulkDecisionItem(
+                request_id=request_id, outcome=outcome, contact_info=contacts[request_id]
+            ))
+        else:
+            results.append(BulkDecisionItem(request_id=request_id, outcome=outcome))
+    return BulkDecisionResponse(results=results)
+
+
+@router.post("/approve/bulk", response_model=BulkDecisionResponse)
+async def approve_requests_bulk(
+    request_data: BulkRequestIds,
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+):
+    """
+    Подтвердить несколько полученных заявок одним запросом.
+
+    Для каждой заявки возвращается approved с контактами отправителя
+    или not_found, если заявка не найдена или уже обработана.
+    """
+    return await decide_requests_bulk(current_user, request_data.request_ids, RequestStatus.ACCEPTED)
+
+
+@router.post("/reject/bulk", response_model=BulkDecisionResponse)
+async def reject_requests_bulk(
+    request_data: BulkRequestIds,
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
+):
+    """
+    Отклонить несколько полученных заявок одним запросом.
+
+    Для каждой заявки возвращается rejected или not_found.
+    """
+    return await decide_requests_bulk(current_user, request_data.request_ids, RequestStatus.REJECTED)
 
 
 @router.post("/approve/{request_id}", response_model=RequestApproveResponse)
 async def approve_request(
     request_id: int,
-    current_user: Union[User, Mentor] = Depends(get_current_user_or_mentor),
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
 ):
     """
     Подтвердить полученную заявку.
@@ -271,67 +638,23 @@ async def approve_request(
     Returns:
         RequestApproveResponse: Сообщение об успешном подтверждении и контактная информация отправителя
     """
-    # Определяем тип получателя
-    receiver_type = EntityType.USER if isinstance(current_user, User) else EntityType.MENTOR
-
-    async with session_scope() as session:
-        # Получаем заявку
-        query = select(Request).where(
-            and_(
-                Request.id == request_id, # type: ignore
-                Request.receiver_id == current_user.id, # type: ignore
-                Request.receiver_type == receiver_type, # type: ignore
-                Request.status == RequestStatus.PENDING # type: ignore
-            )
-        )
-        result = await session.execute(query)
-        request = result.scalar_one_or_none()
-
-        if not request:
-            raise HTTPException(
-                status_code=404,
-                detail="Заявка не найдена или уже обработана"
-            )
-
-        # Получаем данные отправителя
-        if request.sender_type == EntityType.USER:
-            sender_query = select(User).where(User.id == request.sender_id) # type: ignore
-        else:
-            sender_query = select(Mentor).where(Mentor.id == request.sender_id) # type: ignore
-        
-        sender_result = await session.execute(sender_query)
-        sender = sender_result.scalar_one_or_none()
-
-        if not sender:
-            raise HTTPException(
-                status_code=404,
-                detail="Отправитель не найден"
-            )
-
-        # Обновляем статус заявки
-        request.status = RequestStatus.ACCEPTED
-        await session.commit()
-        
-        # Создаем объект ContactInfo с учетом возможных None значений
-        contact_info_data = {}
-        if hasattr(sender, 'email') and sender.email is not None:
-            contact_info_data['email'] = sender.email
-        if hasattr(sender, 'telegram_link') and sender.telegram_link is not None:
-            contact_info_data['telegram_link'] = sender.telegram_link
-            
-        contact_info = ContactInfo(**contact_info_data)
-        
-        # Возвращаем ответ в соответствии со схемой RequestApproveResponse
-        return RequestApproveResponse(
-            message="Заявка успешно подтверждена",
-            contact_info=contact_info
+    contacts = await decide_requests(current_user, [request_id], RequestStatus.ACCEPTED)
+    if request_id not in contacts:
+        raise HTTPException(
+            status_code=404,
+            detail="Заявка не найдена или уже обработана"
         )
 
+    return RequestApproveResponse(
+        message="Заявка успешно подтверждена",
+        contact_info=contacts[request_id]
+    )
+
 
 @router.post("/reject/{request_id}", response_model=RequestRejectResponse)
 async def reject_request(
     request_id: int,
-    current_user: Union[User, Mentor] = Depends(get_current_user_or_mentor),
+    current_user: TokenPrincipal = Depends(get_current_user_or_mentor),
 ):
     """
     Отклонить полученную заявку.
@@ -343,31 +666,11 @@ async def reject_request(
     Returns:
         RequestRejectResponse: Сообщение об успешном отклонении заявки
     """
-    # Определяем тип получателя
-    receiver_type = EntityType.USER if isinstance(current_user, User) else EntityType.MENTOR
-
-    async with session_scope() as session:
-        # Получаем заявку
-        query = select(Request).where(
-            and_(
-                Request.id == request_id, # type: ignore
-                Request.receiver_id == current_user.id, # type: ignore
-                Request.receiver_type == receiver_type, # type: ignore
-                Request.status == RequestStatus.PENDING # type: ignore
-            )
+    decided = await decide_requests(current_user, [request_id], RequestStatus.REJECTED)
+    if request_id not in decided:
+        raise HTTPException(
+            status_code=404,
+            detail="Заявка не найдена или уже обработана"
         )
-        result = await session.execute(query)
-        request = result.scalar_one_or_none()
 
-        if not request:
-            raise HTTPException(
-                status_code=404,
-                detail="Заявка не найдена или уже обработана"
-            )
-
-        # Обновляем статус заявки
-        request.status = RequestStatus.REJECTED
-        await session.commit()
-        
-        # Возвращаем ответ в соответствии со схемой RequestRejectResponse
-        return RequestRejectResponse(message="Заявка успешно отклонена")
\ No newline at end of file
+    return RequestRejectResponse(message="Заявка успешно отклонена")
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, status, Request, HTTPException
+from fastapi import APIRouter, Depends, status, Request, HTTPException, Response
 from urllib.parse import urljoin
 from typing import Optional, List
 
 from src.data.models import User, AdmissionType
 from src.schemas.schemas import (
+    RefreshTokenSchema,
     Token,
     UserCreationSchema,
     UserLoginSchema,
@@ -11,7 +12,9 @@ from src.schemas.schemas import (
     UserUpdateSchema,
     UserDisplay,
 )
-from src.security.auth import get_current_user
+from src.config import Roles
+from src.security.auth import get_current_user, oauth2_scheme, refresh_tokens, revoke_tokens
+from src.services.rate_limiter import enforce_auth_rate_limit
 from src.services.user_auth_service import authenticate_user, register_user, update_user_profile_service
 
 router = APIRouter(tags=["authentication"])
@@ -20,7 +23,8 @@ router = APIRouter(tags=["authentication"])
 @router.post(
     "/signup", response_model=Token, status_code=status.HTTP_201_CREATED
 )
-async def signup(user_data: UserCreationSchema):
+async def signup(request: Request, user_data: UserCreationSchema):
+    await enforce_auth_rate_limit(request, "users:signup")
     result = await register_user(user_data)
     if not result:
         raise HTTPException(
@@ -31,7 +35,9 @@ async def signup(user_data: UserCreationSchema):
 
 
 @router.post("/signin", response_model=Token)
-async def signin(user_data: UserLoginSchema):
+async def signin(request: Request, user_data: UserLoginSchema):
+    # Ограничение проверяется до bcrypt, иначе перебор паролей занимает CPU
+    await enforce_auth_rate_limit(request, "users:signin", user_data.login)
     result = await authenticate_user(user_data.login, user_data.password)
     if not result:
         raise HTTPException(
@@ -42,6 +48,19 @@ async def signin(user_data: UserLoginSchema):
     return result
 
 
+@router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshTokenSchema):
+    """Обмен refresh-токена на новую пару токенов без повторного ввода пароля"""
+    return await refresh_tokens(Roles.USER, data.refresh_token)
+
+
+@router.post("/signout", status_code=status.HTTP_204_NO_CONTENT)
+async def signout(data: RefreshTokenSchema, token: str = Depends(oauth2_scheme)):
+    """Отзыв текущего access-токена и refresh-токена"""
+    await revoke_tokens(token, data.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.get("/me", response_model=UserDisplay)
 async def get_current_user_info(
     request: Request,
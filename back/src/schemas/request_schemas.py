@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Optional, Union
-from pydantic import BaseModel
+from enum import Enum
+from typing import List, Optional, Union
+from pydantic import BaseModel, Field
 
+from src.config import REQUEST_BULK_MAX_SIZE
 from src.data.models import RequestStatus, EntityType
 from src.schemas.schemas import UserFeedResponse, MentorFeedResponse
 
@@ -99,3 +101,99 @@ class RequestRejectResponse(BaseModel):
         """Pydantic config."""
 
         json_schema_extra = {"example": {"message": "Заявка успешно отклонена"}}
+
+
+class RequestEventsTicket(BaseModel):
+    """Схема одноразового билета для подключения к потоку событий."""
+
+    ticket: str
+    expires_in: int
+
+
+class RequestCounts(BaseModel):
+    """Схема счетчиков заявок для бейджей."""
+
+    pending_received: int
+    pending_sent: int
+    accepted_unseen: int
+
+    class Config:
+        """Pydantic config."""
+
+        json_schema_extra = {
+            "example": {"pending_received": 3, "pending_sent": 1, "accepted_unseen": 2}
+        }
+
+
+# Схемы пакетных операций с заявками
+
+
+class BulkRequestOutcome(str, Enum):
+    """Результат пакетной операции для одной заявки."""
+
+    CREATED = "created"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+    DUPLICATE = "duplicate"
+    NOT_FOUND = "not_found"
+
+
+class BulkRequestCreate(BaseModel):
+    """Схема для отправки заявок нескольким получателям одного типа."""
+
+    receiver_ids: List[int] = Field(min_length=1, max_length=REQUEST_BULK_MAX_SIZE)
+    message: Optional[str] = None
+    receiver_type: EntityType
+
+
+class BulkRequestIds(BaseModel):
+    """Схема со списком заявок для пакетного подтверждения или отклонения."""
+
+    request_ids: List[int] = Field(min_length=1, max_length=REQUEST_BULK_MAX_SIZE)
+
+
+class BulkSendItem(BaseModel):
+    """Результат отправки заявки одному получателю."""
+
+    receiver_id: int
+    outcome: BulkRequestOutcome
+    request: Optional[RequestResponse] = None
+
+
+class BulkSendResponse(BaseModel):
+    """Схема для ответа при пакетной отправке заявок."""
+
+    results: List[BulkSendItem]
+
+
+class BulkDecisionItem(BaseModel):
+    """Результат подтверждения или отклонения одной заявки."""
+
+    request_id: int
+    outcome: BulkRequestOutcome
+    contact_info: Optional[ContactInfo] = None
+
+
+class BulkDecisionResponse(BaseModel):
+    """Схема для ответа при пакетном подтверждении или отклонении заявок."""
+
+    results: List[BulkDecisionItem]
+
+    class Config:
+        """Pydantic config."""
+
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {
+                        "request_id": 1,
+                        "outcome": "approved",
+                        "contact_info": {
+                            "email": "user@example.com",
+                            "telegram_link": "https://t.me/username",
+                        },
+                    },
+                    {"request_id": 2, "outcome": "not_found", "contact_info": None},
+                ]
+            }
+        }
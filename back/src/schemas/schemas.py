@@ -63,6 +63,13 @@ class Token(BaseModel):
 
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenSchema(BaseModel):
+    """Schema for token refresh and sign out."""
+
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -88,6 +95,7 @@ class UserResponse(BaseModel):
     target_universities: Optional[List[str]] = None
     description: Optional[str] = Field(None, min_length=10, max_length=300)
     admission_type: Optional[AdmissionType] = None
+    version: Optional[int] = None
     
     @validator('telegram_link')
     def validate_telegram_link(cls, v):
@@ -178,6 +186,7 @@ class UserDisplay(BaseModel):
     target_universities: Optional[List[str]] = None
     description: Optional[str] = Field(None, min_length=10, max_length=300)
     admission_type: Optional[AdmissionType] = None
+    version: Optional[int] = None
     
     @validator('telegram_link')
     def validate_telegram_link(cls, v):
@@ -213,6 +222,7 @@ class UserUpdateSchema(BaseModel):
     description: Optional[str] = Field(None, min_length=10, max_length=300)
     target_universities: Optional[List[str]] = None
     admission_type: Optional[AdmissionType] = None
+    version: Optional[int] = Field(None, description="Ожидаемая версия профиля; если профиль уже изменен, вернется 409")
     
     @validator('password')
     def password_complexity(cls, v):
@@ -262,6 +272,7 @@ class MentorDisplay(BaseModel):
     title: Optional[str] = None
     admission_type: Optional[AdmissionType] = None
     free_days: Optional[List[DayOfWeek]] = None
+    version: Optional[int] = None
     
     @validator('telegram_link')
     def validate_telegram_link(cls, v):
@@ -290,6 +301,7 @@ class MentorUpdateSchema(BaseModel):
     title: Optional[str] = None
     admission_type: Optional[AdmissionType] = None
     free_days: Optional[List[DayOfWeek]] = None
+    version: Optional[int] = Field(None, description="Ожидаемая версия профиля; если профиль уже изменен, вернется 409")
     
     @validator('password')
     def password_complexity(cls, v):
@@ -357,6 +369,7 @@ class FeedResponse(BaseModel):
     page: int
     size: int
     pages: int
+    next_cursor: Optional[str] = None
 
     class Config:
         """Pydantic config."""
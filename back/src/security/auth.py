@@ -1,17 +1,47 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, TypeVar, Union
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
-from src.config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY, Roles
-from src.data.models import Mentor, User
+from src.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    SECRET_KEY,
+    Roles,
+)
+from src.data.models import EntityType, Mentor, User
 from src.repository.mentor_repository import get_mentor_by_login
 from src.repository.user_repository import get_user_by_login
+from src.security.principal_cache import principal_cache
+from src.services.redis_service import redis_service
+from src.utils.metrics import password_hash_duration, password_hash_queue_depth
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Хеши с другой стоимостью needs_update считает устаревшими и они пересчитываются при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt отпускает GIL, поэтому хватает потоков; пул ограничен, чтобы всплеск входов не занял все ядра
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+# Refresh-токен отличается от access-токена claim type; у access-токенов type нет
+REFRESH_TOKEN_TYPE = "refresh"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/users/signin")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/users/signin", auto_error=False)
@@ -25,6 +55,36 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_password_operation(operation: str, fn: Callable[..., T], *args: Any) -> T:
+    """Выполняет операцию bcrypt в пуле потоков, не блокируя event loop"""
+    started = time.perf_counter()
+    password_hash_queue_depth.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        password_hash_queue_depth.dec()
+        password_hash_duration.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+async def hash_password(password: str) -> str:
+    """Асинхронный get_password_hash"""
+    return await _run_password_operation("hash", pwd_context.hash, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль и, если стоимость хеша устарела, считает новый хеш.
+
+    Returns:
+        Кортеж (пароль верный, новый хеш или None)
+    """
+    return await _run_password_operation(
+        "verify", pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def create_access_token(
     role: str, data: Dict[str, Any], expires_delta: Optional[timedelta] = None
 ) -> str:
@@ -35,12 +95,95 @@ def create_access_token(
     else:
         expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
-    to_encode.update({"exp": expire, "role": role})
+    # jti нужен, чтобы отозвать конкретный токен
+    to_encode.update({"exp": expire, "role": role, "jti": uuid.uuid4().hex})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def create_refresh_token(role: str, data: Dict[str, Any]) -> str:
+    to_encode = data.copy()
+    expire = datetime.now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({
+        "exp": expire,
+        "role": role,
+        "jti": uuid.uuid4().hex,
+        "type": REFRESH_TOKEN_TYPE,
+    })
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def issue_tokens(role: str, principal: Union[User, Mentor]) -> Dict[str, str]:
+    """
+    Выдает пару access и refresh токенов.
+
+    В токенах есть id аккаунта и версия учетных данных (tv), поэтому часть
+    эндпоинтов авторизует запрос без обращения к Postgres. Смена пароля или
+    деактивация увеличивают версию, и токены со старой версией перестают действовать.
+    """
+    data = {"sub": principal.login, "uid": principal.id, "tv": principal.token_version}
+    return {
+        "access_token": create_access_token(role, data),
+        "refresh_token": create_refresh_token(role, data),
+        "token_type": "bearer",
+    }
+
+
+def _token_version(payload: Dict[str, Any]) -> int:
+    """Версия учетных данных токена; токены, выпущенные до появления tv, считаются версией 1"""
+    return int(payload.get("tv", 1))
+
+
+def _is_current_version(payload: Dict[str, Any], principal: Union[User, Mentor]) -> bool:
+    """Токен выпущен с текущей версией учетных данных аккаунта"""
+    return _token_version(payload) == principal.token_version
+
+
+def _decode_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """Claims access-токена или None, если токен неверный, просрочен или это refresh-токен"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    if payload.get("type") == REFRESH_TOKEN_TYPE:
+        return None
+    return payload
+
+
+async def _is_token_revoked(payload: Dict[str, Any]) -> Optional[bool]:
+    """
+    Проверяет список отзыва в Redis.
+
+    Returns:
+        True или False; None, если Redis недоступен. Токены без id
+        выпущены до появления списка отзыва и проверяются только по базе.
+    """
+    account_id = payload.get("uid")
+    if account_id is None:
+        return False
+    return await redis_service.is_revoked(
+        payload.get("jti"), payload.get("role"), account_id, _token_version(payload)
+    )
+
+
+async def load_principal(role: str, login: str) -> Optional[Union[User, Mentor]]:
+    """Профиль владельца токена: сначала из кеша, затем из базы"""
+    principal = principal_cache.get(role, login)
+    if principal is not None:
+        return principal
+
+    generation = principal_cache.generation
+    if role == Roles.USER:
+        principal = await get_user_by_login(login)
+    else:
+        principal = await get_mentor_by_login(login)
+
+    if principal is not None:
+        principal_cache.set(role, login, principal, generation)
+    return principal
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,21 +191,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        login: str = payload.get("sub")
-        role = payload.get("role")
+    payload = _decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise credentials_exception
+    login: str = payload["sub"]
+    role = payload.get("role")
 
-        if login is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
+    if await _is_token_revoked(payload):
         raise credentials_exception
 
     if role != Roles.USER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Users only")
-    user = await get_user_by_login(login)
+    user = await load_principal(Roles.USER, login)
 
-    if user is None:
+    if user is None or not _is_current_version(payload, user):
         raise credentials_exception
 
     if not user.is_active:
@@ -80,23 +222,22 @@ async def get_current_mentor(token: str = Depends(oauth2_scheme)) -> Mentor:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        login: str = payload.get("sub")
-        role = payload.get("role")
+    payload = _decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise credentials_exception
+    login: str = payload["sub"]
+    role = payload.get("role")
 
-        if login is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
+    if await _is_token_revoked(payload):
         raise credentials_exception
 
     if role != Roles.MENTOR:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Mentors only"
         )
-    mentor = await get_mentor_by_login(login)
+    mentor = await load_principal(Roles.MENTOR, login)
 
-    if mentor is None:
+    if mentor is None or not _is_current_version(payload, mentor):
         raise credentials_exception
 
     if not mentor.is_active:
@@ -108,42 +249,150 @@ async def get_current_mentor(token: str = Depends(oauth2_scheme)) -> Mentor:
 
 
 async def get_optional_current_user(token: str = Depends(oauth2_scheme_optional)) -> Optional[User]:
+    principal = await get_optional_principal(token)
+    return principal if isinstance(principal, User) else None
+
+
+async def get_optional_current_mentor(token: str = Depends(oauth2_scheme_optional)) -> Optional[Mentor]:
+    principal = await get_optional_principal(token)
+    return principal if isinstance(principal, Mentor) else None
+
+
+async def get_optional_principal(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+) -> Optional[Union[User, Mentor]]:
+    """
+    Владелец токена - пользователь или ментор.
+
+    Токен декодируется один раз, по роли из токена загружается ровно один профиль.
+    Для отсутствующего или неверного токена, неизвестной роли и неактивного профиля возвращает None.
+    """
     if not token:
         return None
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        login: str = payload.get("sub")
-        role = payload.get("role")
-
-        if login is None or role != Roles.USER:
-            return None
-            
-        user = await get_user_by_login(login)
-        if user is None or not user.is_active:
-            return None
-            
-        return user
-    except (jwt.PyJWTError, HTTPException):
+
+    payload = _decode_access_token(token)
+    if payload is None:
         return None
 
+    login = payload.get("sub")
+    role = payload.get("role")
+    if login is None or role not in (Roles.USER, Roles.MENTOR):
+        return None
 
-async def get_optional_current_mentor(token: str = Depends(oauth2_scheme_optional)) -> Optional[Mentor]:
+    if await _is_token_revoked(payload):
+        return None
+
+    principal = await load_principal(role, login)
+    if principal is None or not principal.is_active or not _is_current_version(payload, principal):
+        return None
+
+    return principal
+
+
+class TokenPrincipal(NamedTuple):
+    """Владелец токена по claims, без загрузки профиля"""
+
+    role: str
+    id: int
+    login: str
+
+    @property
+    def entity_type(self) -> EntityType:
+        return EntityType.USER if self.role == Roles.USER else EntityType.MENTOR
+
+
+async def get_optional_token_principal(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+) -> Optional[TokenPrincipal]:
+    """
+    Владелец токена по claims: id и роль берутся из токена, отзыв и деактивация
+    и смена пароля проверяются по списку в Redis, Postgres не нужен.
+
+    Для старых токенов без id и при недоступном Redis профиль загружается из базы.
+    """
     if not token:
         return None
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        login: str = payload.get("sub")
-        role = payload.get("role")
-
-        if login is None or role != Roles.MENTOR:
-            return None
-            
-        mentor = await get_mentor_by_login(login)
-        if mentor is None or not mentor.is_active:
-            return None
-            
-        return mentor
-    except (jwt.PyJWTError, HTTPException):
+
+    payload = _decode_access_token(token)
+    if payload is None:
+        return None
+
+    login = payload.get("sub")
+    role = payload.get("role")
+    if login is None or role not in (Roles.USER, Roles.MENTOR):
+        return None
+
+    revoked = await _is_token_revoked(payload)
+    if revoked:
+        return None
+    if revoked is not None and payload.get("uid") is not None:
+        return TokenPrincipal(role, int(payload["uid"]), login)
+
+    principal = await load_principal(role, login)
+    if principal is None or not principal.is_active or not _is_current_version(payload, principal):
         return None
+    return TokenPrincipal(role, principal.id, principal.login)
+
+
+async def refresh_tokens(role: str, refresh_token: str) -> Dict[str, str]:
+    """
+    Выдает новую пару токенов по refresh-токену.
+
+    Refresh-токен одноразовый: его jti атомарно занимается в списке отзыва,
+    поэтому из двух одновременных обменов проходит один. Если Redis
+    недоступен, обмен отклоняется: без списка отзыва одноразовость не проверить.
+
+    Raises:
+        HTTPException: Если токен неверный, отозван, уже обменян, аккаунт
+            неактивен или состояние отзыва неизвестно
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise credentials_exception
+
+    if (
+        payload.get("type") != REFRESH_TOKEN_TYPE
+        or payload.get("role") != role
+        or payload.get("sub") is None
+    ):
+        raise credentials_exception
+
+    if payload.get("jti") is None or payload.get("uid") is None:
+        raise credentials_exception
+
+    # None - Redis недоступен, отзыв проверить нельзя
+    if await _is_token_revoked(payload) is not False:
+        raise credentials_exception
+
+    principal = await load_principal(role, payload["sub"])
+    if (
+        principal is None
+        or not principal.is_active
+        or principal.id != payload["uid"]
+        or not _is_current_version(payload, principal)
+    ):
+        raise credentials_exception
+
+    if not await redis_service.claim_token(payload["jti"], payload["exp"]):
+        raise credentials_exception
+    return issue_tokens(role, principal)
+
+
+async def revoke_tokens(*tokens: Optional[str]) -> None:
+    """Отзывает токены до окончания их срока действия; неверные токены пропускаются"""
+    for token in tokens:
+        if not token:
+            continue
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.PyJWTError:
+            continue
+        if payload.get("jti"):
+            await redis_service.revoke_token(payload["jti"], payload["exp"])
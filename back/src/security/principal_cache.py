@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from src.utils.metrics import (
+    principal_cache_hits,
+    principal_cache_misses,
+    principal_cache_size,
+)
+
+
+class PrincipalCache:
+    """
+    LRU-кеш авторизованных пользователей и менторов с ограниченным временем жизни.
+
+    Ключ - (роль, логин). Репозитории сбрасывают запись по (роль, id) при
+    изменении профиля. Кеш локален для воркера, поэтому изменения, сделанные
+    в другом воркере, видны не позже чем через ttl секунд.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._logins: Dict[Tuple[str, int], str] = {}
+        # Растет при каждом сбросе: не даем запросу, начатому до сброса, вернуть старый профиль в кеш
+        self.generation = 0
+        principal_cache_size.set_function(lambda: len(self._entries))
+
+    def get(self, role: str, login: str) -> Optional[Any]:
+        """Профиль из кеша или None, если его нет или он устарел"""
+        key = (role, login)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            principal_cache_hits.labels(role=role).inc()
+            return entry[1]
+        if entry is not None:
+            self._drop(key)
+        principal_cache_misses.labels(role=role).inc()
+        return None
+
+    def set(self, role: str, login: str, principal: Any, generation: int) -> None:
+        """
+        Кладет профиль в кеш.
+
+        Args:
+            role: Роль из токена
+            login: Логин из токена
+            principal: Пользователь или ментор
+            generation: Значение generation до чтения профиля из базы
+        """
+        if generation != self.generation:
+            return
+        key = (role, login)
+        self._entries[key] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(key)
+        self._logins[(role, principal.id)] = login
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, role: str, principal_id: int) -> None:
+        """Сбрасывает профиль после его изменения"""
+        self.generation += 1
+        login = self._logins.get((role, principal_id))
+        if login is not None:
+            self._drop((role, login))
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._logins.pop((key[0], entry[1].id), None)
+
+
+# Singleton instance
+principal_cache = PrincipalCache()
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Optional
+
+from src.config import BUSINESS_METRICS_REFRESH_INTERVAL
+from src.repository.mentor_repository import count_mentors
+from src.repository.user_repository import count_users
+from src.utils.metrics import business_metrics_refreshed, mentors_count, students_count
+
+
+class BusinessMetricsRefresher:
+    """
+    Пересчитывает бизнес-метрики в фоне раз в interval секунд.
+
+    /metrics отдает последние значения из реестра, поэтому стоимость
+    опроса Prometheus не зависит от размера таблиц.
+    """
+
+    def __init__(self, interval: float = BUSINESS_METRICS_REFRESH_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def startup(self) -> None:
+        """Запускает пересчет; первый - сразу после старта"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def shutdown(self) -> None:
+        """Останавливает пересчет"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> None:
+        """Пересчитывает метрики из базы"""
+        total_mentors, total_students = await asyncio.gather(count_mentors(), count_users())
+        mentors_count.set(total_mentors)
+        students_count.set(total_students)
+        business_metrics_refreshed.set_to_current_time()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Остаются прошлые значения; устаревание видно по business_metrics_refreshed_timestamp_seconds
+                print(f"Error refreshing business metrics: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+# Singleton instance
+business_metrics = BusinessMetricsRefresher()
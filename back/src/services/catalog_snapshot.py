@@ -0,0 +1,476 @@
+"""
+Колоночный снимок каталога менторов и пользователей в memory-mapped файле.
+
+Снимок пишет один воркер в фоне, остальные отображают тот же файл только на
+чтение. Обновление атомарное: новый файл пишется рядом и подменяется через
+os.replace, уже открытые отображения продолжают читать старую версию.
+
+Формат файла: b"CSNP", длина заголовка (uint32 LE), JSON-заголовок, затем
+выровненные по 8 байт массивы, описанные в заголовке.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    CATALOG_SNAPSHOT_DEBOUNCE,
+    CATALOG_SNAPSHOT_DIR,
+    CATALOG_SNAPSHOT_ENABLED,
+    CATALOG_SNAPSHOT_LOCK_TIMEOUT,
+    CATALOG_SNAPSHOT_LOCK_WAIT,
+    CATALOG_SNAPSHOT_MAX_AGE,
+)
+from src.data.models import AdmissionType
+from src.repository.mentor_repository import get_mentor_snapshot_rows
+from src.repository.user_repository import get_user_snapshot_rows
+from src.services.interest_rating import interest_service
+from src.services.redis_service import redis_service
+
+MAGIC = b"CSNP"
+TEXT_FIELDS = {
+    "mentors": ("name", "login", "title", "description", "avatar_uuid"),
+    "users": ("name", "login", "description", "avatar_uuid"),
+}
+ADMISSION_TYPES = list(AdmissionType)
+
+# Вектор описания для локального ранжирования: (индексы признаков, веса)
+Vectorize = Callable[[Optional[str]], Tuple[np.ndarray, np.ndarray]]
+
+
+class SnapshotRecord(NamedTuple):
+    """Профиль из снимка с теми же атрибутами, что читают prepare_mentor_data/prepare_user_data"""
+
+    id: int
+    name: Optional[str]
+    login: Optional[str]
+    title: Optional[str]
+    description: Optional[str]
+    university: Optional[str]
+    avatar_uuid: Optional[str]
+    target_universities: Optional[List[str]]
+    admission_type: Optional[AdmissionType]
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _admission_code(value: Any) -> int:
+    """Код типа поступления; принимает член перечисления, его имя, значение или str()"""
+    for code, member in enumerate(ADMISSION_TYPES):
+        if value is member or value in (member.name, member.value, str(member)):
+            return code
+    return -1
+
+
+def write_snapshot(
+    directory: str,
+    kind: str,
+    version: int,
+    rows: List[Dict[str, Any]],
+    vectorize: Optional[Vectorize] = None,
+) -> str:
+    """
+    Строит колоночный снимок каталога и атомарно подменяет файл.
+
+    Args:
+        directory: Каталог для файлов снимков
+        kind: mentors или users
+        version: Версия каталога, которой соответствует снимок
+        rows: Строки каталога, упорядоченные по id
+        vectorize: Если задан, векторы описаний считаются здесь и сохраняются
+            в снимке, чтобы ранжирование не разбирало тексты в запросе
+
+    Returns:
+        Путь к файлу снимка. Файл более новой версии не подменяется: если его
+        уже записал другой воркер, новый снимок отбрасывается.
+    """
+    count = len(rows)
+    universities = sorted({
+        university
+        for row in rows
+        for university in (row.get("target_universities") or [row.get("university")])
+        if university
+    })
+    university_index = {university: code for code, university in enumerate(universities)}
+
+    columns: Dict[str, np.ndarray] = {
+        "ids": np.array([row["id"] for row in rows], dtype=np.int64),
+        "active": np.array([row["is_active"] is True for row in rows], dtype=np.bool_),
+        "admission": np.array([_admission_code(row["admission_type"]) for row in rows], dtype=np.int16),
+    }
+
+    if kind == "mentors":
+        columns["university"] = np.array(
+            [university_index.get(row["university"], -1) for row in rows], dtype=np.int32
+        )
+    else:
+        lists = [row["target_universities"] or [] for row in rows]
+        columns["university_offsets"] = np.concatenate(
+            [[0], np.cumsum([len(items) for items in lists])]
+        ).astype(np.int64)
+        columns["university_codes"] = np.array(
+            [university_index[item] for items in lists for item in items], dtype=np.int32
+        )
+
+    # Таблица смещений строковых полей в общем UTF-8 буфере
+    fields = TEXT_FIELDS[kind]
+    text_offsets = np.zeros((len(fields), count + 1), dtype=np.int64)
+    text_null = np.zeros((len(fields), count), dtype=np.bool_)
+    chunks = []
+    position = 0
+    for f, field in enumerate(fields):
+        text_offsets[f, 0] = position
+        for i, row in enumerate(rows):
+            value = row[field]
+            if value is None:
+                text_null[f, i] = True
+            else:
+                encoded = str(value).encode()
+                chunks.append(encoded)
+                position += len(encoded)
+            text_offsets[f, i + 1] = position
+    columns["text_offsets"] = text_offsets
+    columns["text_null"] = text_null
+    columns["text"] = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+
+    if vectorize is not None:
+        vectors = [vectorize(row["description"]) for row in rows]
+        columns["vector_offsets"] = np.concatenate(
+            [[0], np.cumsum([len(indices) for indices, _ in vectors])]
+        ).astype(np.int64)
+        columns["vector_indices"] = np.concatenate(
+            [np.zeros(0, dtype=np.int32)] + [indices.astype(np.int32) for indices, _ in vectors]
+        )
+        columns["vector_weights"] = np.concatenate(
+            [np.zeros(0, dtype=np.float32)] + [weights.astype(np.float32) for _, weights in vectors]
+        )
+
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        "kind": kind,
+        "version": version,
+        "count": count,
+        "built_at": time.time(),
+        "universities": universities,
+        "columns": layout,
+    }).encode()
+    data_start = _align(8 + len(header))
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}.snapshot")
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{kind}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(MAGIC)
+            file.write(np.uint32(len(header)).tobytes())
+            file.write(header)
+            for name, array in columns.items():
+                file.seek(data_start + layout[name]["offset"])
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        existing = _read_version(path)
+        if existing is not None and existing > version:
+            os.remove(tmp_path)
+            return path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _read_version(path: str) -> Optional[int]:
+    """Версия снимка из заголовка файла или None, если файла нет или он поврежден"""
+    try:
+        with open(path, "rb") as file:
+            if file.read(4) != MAGIC:
+                return None
+            header_length = int(np.frombuffer(file.read(4), dtype="<u4")[0])
+            return int(json.loads(file.read(header_length))["version"])
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+
+
+class CatalogSnapshot:
+    """Отображенный только на чтение снимок каталога"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:4]) != MAGIC:
+            raise ValueError(f"Not a catalog snapshot: {path}")
+        header_length = int(self._mm[4:8].view("<u4")[0])
+        header = json.loads(bytes(self._mm[8:8 + header_length]))
+        data_start = _align(8 + header_length)
+
+        self.kind: str = header["kind"]
+        self.version: int = header["version"]
+        self.count: int = header["count"]
+        self.built_at: float = header["built_at"]
+        self.universities: List[str] = header["universities"]
+        self._university_index = {university: code for code, university in enumerate(self.universities)}
+        self._fields = {field: f for f, field in enumerate(TEXT_FIELDS[self.kind])}
+
+        self._columns: Dict[str, np.ndarray] = {}
+        for name, column in header["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            start = data_start + column["offset"]
+            size = int(np.prod(column["shape"])) * dtype.itemsize
+            self._columns[name] = self._mm[start:start + size].view(dtype).reshape(column["shape"])
+
+        self.ids = self._columns["ids"]
+
+    def _text(self, field: str, row: int) -> Optional[str]:
+        f = self._fields.get(field)
+        if f is None or self._columns["text_null"][f, row]:
+            return None
+        offsets = self._columns["text_offsets"][f]
+        return bytes(self._columns["text"][offsets[row]:offsets[row + 1]]).decode()
+
+    def _base_mask(self, admission_type: Optional[str]) -> np.ndarray:
+        mask = self._columns["active"].copy()
+        if admission_type:
+            mask &= self._columns["admission"] == _admission_code(admission_type)
+        return mask
+
+    def filter_mentors(
+        self,
+        target_universities: Optional[List[str]] = None,
+        admission_type: Optional[str] = None,
+    ) -> np.ndarray:
+        """Номера строк менторов, подходящих под фильтр ленты (как _mentor_filter_conditions)"""
+        mask = self._base_mask(admission_type)
+        if target_universities:
+            codes = [self._university_index[u] for u in target_universities if u in self._university_index]
+            mask &= np.isin(self._columns["university"], codes)
+        return np.flatnonzero(mask)
+
+    def filter_users(
+        self,
+        university: Optional[str] = None,
+        admission_type: Optional[str] = None,
+    ) -> np.ndarray:
+        """Номера строк пользователей, подходящих под фильтр ленты (как _user_filter_conditions)"""
+        mask = self._base_mask(admission_type)
+        if university:
+            code = self._university_index.get(university, -2)
+            offsets = self._columns["university_offsets"]
+            owners = np.repeat(np.arange(self.count), np.diff(offsets))
+            has_university = np.zeros(self.count, dtype=np.bool_)
+            has_university[owners[self._columns["university_codes"] == code]] = True
+            mask &= has_university
+        return np.flatnonzero(mask)
+
+    def rows_for_ids(self, ids: List[int]) -> np.ndarray:
+        """Номера строк для списка id с сохранением порядка; отсутствующие id пропускаются"""
+        if not ids or not self.count:
+            return np.array([], dtype=np.int64)
+        wanted = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, wanted)
+        clipped = np.minimum(positions, self.count - 1)
+        return positions[(positions < self.count) & (self.ids[clipped] == wanted)]
+
+    def page(
+        self,
+        rows: np.ndarray,
+        page: int,
+        size: int,
+        after_id: Optional[int] = None,
+    ) -> Tuple[List[SnapshotRecord], int, bool]:
+        """
+        Страница отфильтрованных строк: по курсору after_id или по номеру страницы.
+
+        Returns:
+            Кортеж (профили страницы, всего строк, есть ли строки после страницы)
+        """
+        total = len(rows)
+        if after_id is not None:
+            rows = rows[self.ids[rows] > after_id]
+        else:
+            rows = rows[(page - 1) * size:]
+        return self.records(rows[:size]), total, len(rows) > size
+
+    def candidates(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Кандидаты для ранжирования: id, description и, если он есть в снимке, vector"""
+        result = [
+            {"id": int(self.ids[row]), "description": self._text("description", row) or ""}
+            for row in rows
+        ]
+        if "vector_offsets" in self._columns:
+            offsets = self._columns["vector_offsets"]
+            indices = self._columns["vector_indices"]
+            weights = self._columns["vector_weights"]
+            for candidate, row in zip(result, rows):
+                start, end = offsets[row], offsets[row + 1]
+                candidate["vector"] = (indices[start:end], weights[start:end])
+        return result
+
+    def records(self, rows: np.ndarray) -> List[SnapshotRecord]:
+        """Профили для выдачи в ленте"""
+        result = []
+        for row in rows:
+            admission = int(self._columns["admission"][row])
+            if self.kind == "mentors":
+                university_code = int(self._columns["university"][row])
+                university = self.universities[university_code] if university_code >= 0 else None
+                target_universities = None
+            else:
+                offsets = self._columns["university_offsets"]
+                codes = self._columns["university_codes"][offsets[row]:offsets[row + 1]]
+                university = None
+                target_universities = [self.universities[code] for code in codes]
+            result.append(SnapshotRecord(
+                id=int(self.ids[row]),
+                name=self._text("name", row),
+                login=self._text("login", row),
+                title=self._text("title", row),
+                description=self._text("description", row),
+                university=university,
+                avatar_uuid=self._text("avatar_uuid", row),
+                target_universities=target_universities,
+                admission_type=ADMISSION_TYPES[admission] if admission >= 0 else None,
+            ))
+        return result
+
+
+class CatalogSnapshotStore:
+    """
+    Хранилище снимков каталога одного воркера.
+
+    Запрос никогда не ждет построения снимка: он получает последний удачный
+    снимок, а если тот отстал от версии каталога из Redis, в фоне
+    планируется перестроение. Перестроение откладывается на debounce секунд,
+    чтобы серия изменений профилей дала одно чтение каталога, и выполняется
+    одним воркером под блокировкой в Redis; остальные подхватывают
+    записанный файл по времени изменения.
+    """
+
+    def __init__(self, directory: str, max_age: float, debounce: float = CATALOG_SNAPSHOT_DEBOUNCE):
+        self.directory = directory
+        self.max_age = max_age
+        self.debounce = debounce
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        self._mtimes: Dict[str, int] = {}
+        # Наибольшая запрошенная версия и фоновая задача перестроения по каждому kind
+        self._wanted: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _path(self, kind: str) -> str:
+        return os.path.join(self.directory, f"{kind}.snapshot")
+
+    def _needs_rebuild(self, snapshot: Optional[CatalogSnapshot], version: int) -> bool:
+        # Снимок обновляется заранее, на половине max_age, чтобы не устареть совсем
+        return (
+            snapshot is None
+            or snapshot.version < version
+            or time.time() - snapshot.built_at > self.max_age / 2
+        )
+
+    def _open(self, kind: str) -> Optional[CatalogSnapshot]:
+        try:
+            return CatalogSnapshot(self._path(kind))
+        except (OSError, ValueError):
+            return None
+
+    def _current(self, kind: str) -> Optional[CatalogSnapshot]:
+        """Последний снимок: из памяти, а если файл подменили - заново отображенный файл"""
+        try:
+            mtime = os.stat(self._path(kind)).st_mtime_ns
+        except OSError:
+            return self._snapshots.get(kind)
+        if kind not in self._snapshots or self._mtimes.get(kind) != mtime:
+            snapshot = self._open(kind)
+            if snapshot is not None:
+                self._snapshots[kind] = snapshot
+                self._mtimes[kind] = mtime
+        return self._snapshots.get(kind)
+
+    async def get(self, kind: str, version: int) -> Optional[CatalogSnapshot]:
+        """
+        Последний удачный снимок каталога.
+
+        Снимок может отставать от version на время перестроения. Снимок
+        старше max_age не отдается (например, когда Redis недоступен и
+        перестроить его некому) - тогда лента читает из Postgres.
+
+        Returns:
+            Снимок или None, если снимки выключены или подходящего снимка нет
+        """
+        if not CATALOG_SNAPSHOT_ENABLED:
+            return None
+
+        snapshot = self._current(kind)
+        if self._needs_rebuild(snapshot, version):
+            self._schedule(kind, version)
+        if snapshot is None or time.time() - snapshot.built_at > self.max_age:
+            return None
+        return snapshot
+
+    def _schedule(self, kind: str, version: int) -> None:
+        self._wanted[kind] = max(self._wanted.get(kind, 0), version)
+        if kind not in self._tasks:
+            self._tasks[kind] = asyncio.create_task(self._rebuild_loop(kind))
+
+    async def shutdown(self) -> None:
+        """Останавливает фоновые перестроения"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _rebuild_loop(self, kind: str) -> None:
+        try:
+            # Запросы версий, пришедшие во время перестроения, дают еще один проход
+            while kind in self._wanted:
+                await asyncio.sleep(self.debounce)
+                target = self._wanted.pop(kind)
+                snapshot = await self._rebuild(kind, target)
+                if snapshot is not None:
+                    self._snapshots[kind] = snapshot
+                    self._mtimes[kind] = os.stat(snapshot.path).st_mtime_ns
+        except Exception as e:
+            print(f"Error building catalog snapshot: {str(e)}")
+        finally:
+            self._tasks.pop(kind, None)
+
+    async def _rebuild(self, kind: str, target: int) -> Optional[CatalogSnapshot]:
+        async with redis_service.lock(
+            f"catalog-snapshot:{kind}", CATALOG_SNAPSHOT_LOCK_TIMEOUT, CATALOG_SNAPSHOT_LOCK_WAIT
+        ) as acquired:
+            if not acquired:
+                # Снимок строит другой воркер (или Redis недоступен); его файл подхватит _current
+                return None
+
+            # Пока ждали блокировку, снимок мог записать другой воркер
+            snapshot = self._open(kind)
+            if not self._needs_rebuild(snapshot, target):
+                return snapshot
+
+            # Версия читается до строк, поэтому строки не старее нее
+            version = max(target, await redis_service.get_catalog_version(kind))
+            if kind == "mentors":
+                rows = await get_mentor_snapshot_rows()
+            else:
+                rows = await get_user_snapshot_rows()
+            # Векторы описаний нужны только локальному ранжированию
+            vectorize = getattr(interest_service, "vectorize", None)
+            path = await asyncio.to_thread(write_snapshot, self.directory, kind, version, rows, vectorize)
+            return CatalogSnapshot(path)
+
+
+# Singleton instance
+catalog_snapshots = CatalogSnapshotStore(CATALOG_SNAPSHOT_DIR, CATALOG_SNAPSHOT_MAX_AGE)
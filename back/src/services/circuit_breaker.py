@@ -0,0 +1,49 @@
+import time
+from typing import Optional
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для вызовов внешнего сервиса.
+
+    После failure_threshold ошибок подряд цепь размыкается и вызовы сразу
+    отклоняются. Через reset_timeout секунд пропускается один пробный вызов:
+    успех замыкает цепь, ошибка снова размыкает ее.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас обращаться к сервису"""
+        if self.opened_at is None:
+            return True
+        if self._trial_in_progress:
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def abandon(self) -> None:
+        """Вызов прерван без результата (отмена): цепь остается как была, но следующий пробный вызов разрешен"""
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
@@ -1,16 +1,250 @@
-import os
+import asyncio
 import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 import httpx
-from typing import List, Dict, Any
+
+from src.config import (
+    GEMINI_API_KEY,
+    RANKING_API_URL,
+    RANKING_BACKEND,
+    RANKING_BREAKER_RESET,
+    RANKING_BREAKER_THRESHOLD,
+    RANKING_CHUNK_SIZE,
+    RANKING_CONNECT_TIMEOUT,
+    RANKING_HTTP2,
+    RANKING_MAX_CONCURRENCY,
+    RANKING_MAX_CONNECTIONS,
+    RANKING_MAX_KEEPALIVE,
+    RANKING_MODEL,
+    RANKING_READ_TIMEOUT,
+)
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.vector_ranking import VectorRankingService
+from src.utils.metrics import ranking_upstream_duration, ranking_upstream_failures
+
 
 class InterestRatingService:
     """Сервис для ранжирования менторов и пользователей по интересности на основе их описаний."""
     
     def __init__(self):
-        # Получаем API ключ из переменной окружения или используем значение по умолчанию
-        self.api_key = os.getenv("GEMINI_API_KEY", "sk-9c33e1ecb15640c8b060fe63eeaea71c")
-        self.api_url = "https://chat.batsura.ru/api/chat/completions"
-        
+        self.api_key = GEMINI_API_KEY
+        self.api_url = RANKING_API_URL
+        self.model = RANKING_MODEL
+        # Общий пул соединений создается в lifespan приложения
+        self.client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(RANKING_BREAKER_THRESHOLD, RANKING_BREAKER_RESET)
+        # Большие наборы кандидатов ранжируются частями, не больше N частей одновременно
+        self.chunk_size = RANKING_CHUNK_SIZE
+        self.semaphore = asyncio.Semaphore(RANKING_MAX_CONCURRENCY)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=RANKING_HTTP2,
+            timeout=httpx.Timeout(
+                RANKING_READ_TIMEOUT,
+                connect=RANKING_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=RANKING_MAX_CONNECTIONS,
+                max_keepalive_connections=RANKING_MAX_KEEPALIVE,
+            ),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key}"
+            },
+        )
+
+    async def startup(self) -> None:
+        """Создает общий HTTP-клиент с keep-alive соединениями"""
+        if self.client is None:
+            self.client = self._create_client()
+
+    async def shutdown(self) -> None:
+        """Закрывает общий HTTP-клиент"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @staticmethod
+    def _parse_ranked_ids(result_text: str) -> Optional[List[Any]]:
+        """Извлекает список id из ответа модели"""
+        result_text = result_text.replace("```json", "").replace("```", "")
+        try:
+            ranked_ids = json.loads(result_text)
+            # Проверяем, что результат - список
+            if isinstance(ranked_ids, list):
+                return ranked_ids
+        except (json.JSONDecodeError, ValueError):
+            # Если не удалось распарсить JSON, ищем что-то похожее на список ID в тексте
+            matches = re.findall(r'\[(.*?)\]', result_text)
+            if matches:
+                # Берем первое совпадение и разбиваем по запятой
+                items = matches[0].split(',')
+                # Очищаем элементы от лишних символов
+                cleaned_ids = [item.strip(' "\'\t\n') for item in items]
+                # Возвращаем только непустые элементы
+                return [item for item in cleaned_ids if item]
+        return None
+
+    async def _request_ranking(self, system_prompt: str, prompt: str) -> Optional[List[Any]]:
+        """
+        Отправляет промпт в сервис ранжирования.
+
+        Returns:
+            Список id из ответа или None, если ранжирование не удалось
+            или цепь разомкнута после серии ошибок
+        """
+        if not self.breaker.allow_request():
+            ranking_upstream_failures.labels(reason="breaker_open").inc()
+            return None
+
+        # Пробный вызов полуоткрытой цепи должен завершиться успехом или ошибкой,
+        # иначе (отмена запроса, wait_for) цепь навсегда осталась бы разомкнутой
+        try:
+            ranked_ids = await self._call_ranking(system_prompt, prompt)
+        except BaseException:
+            self.breaker.abandon()
+            raise
+
+        if ranked_ids is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return ranked_ids
+
+    async def _call_ranking(self, system_prompt: str, prompt: str) -> Optional[List[Any]]:
+        """Запрос к сервису ранжирования и разбор ответа; None при любой ошибке"""
+        if self.client is None:
+            await self.startup()
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(
+                self.api_url,
+                json={
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": 0.7
+                }
+            )
+            # Проверяем успешность запроса
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            ranking_upstream_failures.labels(reason="http").inc()
+            print(f"Error requesting ranking: {str(e)}")
+            return None
+        finally:
+            ranking_upstream_duration.observe(time.perf_counter() - started)
+
+        try:
+            # Извлекаем результат
+            ranked_ids = self._parse_ranked_ids(data["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"Error parsing ranking: {str(e)}")
+            ranked_ids = None
+        # Ответ, из которого не достать ранжирование, для цепи такая же ошибка, как сбой HTTP
+        if ranked_ids is None:
+            ranking_upstream_failures.labels(reason="parse").inc()
+        return ranked_ids
+
+    async def _rank_chunk(
+        self,
+        chunk: List[Dict[str, Any]],
+        system_prompt: str,
+        build_prompt: Callable[[str], str],
+    ) -> Tuple[List[Any], bool]:
+        """
+        Ранжирует одну часть кандидатов.
+
+        Returns:
+            Кортеж (все id части: сначала в порядке модели, затем пропущенные
+            моделью в исходном порядке; удалось ли ранжирование)
+        """
+        descriptions = "\n".join([
+            f"ID: {item['id']}, Описание: {item['description'] or 'Нет описания'}"
+            for item in chunk
+        ])
+        async with self.semaphore:
+            ranked_ids = await self._request_ranking(system_prompt, build_prompt(descriptions))
+
+        # Модель может вернуть id строками, сопоставляем по строковому представлению
+        ids_by_key = {str(item["id"]): item["id"] for item in chunk}
+        ordered = []
+        seen = set()
+        for ranked_id in ranked_ids or []:
+            key = str(ranked_id).strip()
+            if key in ids_by_key and key not in seen:
+                seen.add(key)
+                ordered.append(ids_by_key[key])
+        ordered.extend(item["id"] for item in chunk if str(item["id"]) not in seen)
+        return ordered, ranked_ids is not None
+
+    @staticmethod
+    def _interleave(rankings: List[List[Any]]) -> List[Any]:
+        """
+        Чередует ранжирования частей: первые места всех частей, затем вторые и т.д.
+
+        Между частями кандидаты не сравниваются - это чередование, а не слияние
+        по оценке. Позиция нормируется на размер части, чтобы короткая
+        последняя часть не собралась в начале.
+        """
+        scored = [
+            (position / len(ranking), chunk_index, item_id)
+            for chunk_index, ranking in enumerate(rankings)
+            for position, item_id in enumerate(ranking)
+        ]
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [item_id for _, _, item_id in scored]
+
+    async def _rank_in_chunks(
+        self,
+        candidates: List[Dict[str, Any]],
+        system_prompt: str,
+        build_prompt: Callable[[str], str],
+    ) -> List[Any]:
+        """
+        Делит кандидатов на части, ранжирует их параллельно и сливает результат.
+
+        Лучшие кандидаты каждой ранжированной части (вместе не больше одной части)
+        ранжируются еще раз общим запросом - так начало ленты сравнивается между
+        частями. Остальные идут чередованием частей, неранжированные части - в конце.
+
+        Время не постоянно: ceil(частей / RANKING_MAX_CONCURRENCY) волн запросов
+        плюс финальный запрос; 1000 кандидатов по 50 при 4 одновременных - 5 волн и 1 запрос.
+        """
+        chunks = [
+            candidates[i:i + self.chunk_size]
+            for i in range(0, len(candidates), self.chunk_size)
+        ]
+        results = await asyncio.gather(*[
+            self._rank_chunk(chunk, system_prompt, build_prompt) for chunk in chunks
+        ])
+        if len(results) == 1:
+            return results[0][0]
+
+        ranked = [ordered for ordered, ok in results if ok]
+        failed = [item_id for ordered, ok in results if not ok for item_id in ordered]
+        if len(ranked) < 2:
+            return [item_id for ordered in ranked for item_id in ordered] + failed
+
+        top_k = max(1, self.chunk_size // len(ranked))
+        heads = [ordered[:top_k] for ordered in ranked]
+        tails = [ordered[top_k:] for ordered in ranked]
+
+        by_id = {item["id"]: item for item in candidates}
+        final_candidates = [by_id[item_id] for item_id in self._interleave(heads)]
+        final, final_ok = await self._rank_chunk(final_candidates, system_prompt, build_prompt)
+        if not final_ok:
+            return self._interleave(ranked) + failed
+        return final + self._interleave([tail for tail in tails if tail]) + failed
+
     async def get_ranked_mentors(self, mentors: List[Dict[str, Any]], user_description: str) -> List[str]:
         """
         Сортирует менторов по убыванию их интересности для пользователя.
@@ -25,14 +259,9 @@ class InterestRatingService:
         if not mentors or not user_description:
             return [mentor["id"] for mentor in mentors]  # Возвращаем оригинальный порядок, если нет данных
             
-        # Формируем описания менторов для промпта
-        mentors_descriptions = "\n".join([
-            f"ID: {mentor['id']}, Описание: {mentor['description'] or 'Нет описания'}" 
-            for mentor in mentors
-        ])
-        
-        # Формируем промпт
-        prompt = f"""
+        # Формируем промпт для каждой части менторов
+        def build_prompt(mentors_descriptions: str) -> str:
+            return f"""
 Ответь в формате массива json, содержашего только id. Отсортируй менторов по убыванию их интересности для пользователя. 
 
 Описание пользователя:
@@ -41,60 +270,13 @@ class InterestRatingService:
 Описания менторов:
 {mentors_descriptions}
 """
-        
-        try:
-            # Отправляем запрос к API
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": "qodo/gemini-2.0-flash",
-                        "messages": [
-                            {"role": "system", "content": "Ты помогаешь сортировать менторов по их интересности для пользователя на основе описаний."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7
-                    }
-                )
-                
-                # Проверяем успешность запроса
-                response.raise_for_status()
-                data = response.json()
-                
-                # Извлекаем результат
-                result_text = data["choices"][0]["message"]["content"]
-                
-                # Пытаемся распарсить JSON
-                result_text = result_text.replace("```json", "").replace("```", "")
-                try:
-                    ranked_ids = json.loads(result_text)
-                    # Проверяем, что результат - список
-                    if isinstance(ranked_ids, list):
-                        return ranked_ids
-                except (json.JSONDecodeError, ValueError):
-                    # Если не удалось распарсить JSON, пытаемся извлечь ID другими способами
-                    import re
-                    # Ищем что-то похожее на список ID в тексте
-                    matches = re.findall(r'\[(.*?)\]', result_text)
-                    if matches:
-                        # Берем первое совпадение и разбиваем по запятой
-                        items = matches[0].split(',')
-                        # Очищаем элементы от лишних символов
-                        cleaned_ids = [item.strip(' "\'\t\n') for item in items]
-                        # Возвращаем только непустые элементы
-                        return [item for item in cleaned_ids if item]
-            
-            # Если не удалось получить ранжированный список, возвращаем исходный порядок
-            return [mentor["id"] for mentor in mentors]
-                
-        except Exception as e:
-            # В случае ошибки логируем ее и возвращаем исходный порядок
-            print(f"Error ranking mentors: {str(e)}")
-            return [mentor["id"] for mentor in mentors]
+
+        # Часть, которую не удалось ранжировать, идет в конец в исходном порядке
+        return await self._rank_in_chunks(
+            mentors,
+            "Ты помогаешь сортировать менторов по их интересности для пользователя на основе описаний.",
+            build_prompt,
+        )
             
     async def get_ranked_users(self, users: List[Dict[str, Any]], mentor_description: str) -> List[str]:
         """
@@ -111,12 +293,8 @@ class InterestRatingService:
         if not users or not mentor_description:
             return [user["id"] for user in users]
             
-        users_descriptions = "\n".join([
-            f"ID: {user['id']}, Описание: {user['description'] or 'Нет описания'}" 
-            for user in users
-        ])
-        
-        prompt = f"""
+        def build_prompt(users_descriptions: str) -> str:
+            return f"""
 Ответь в формате массива json, содержашего только id. Отсортируй пользователей по убыванию их интересности для ментора. 
 
 Описание ментора:
@@ -125,44 +303,29 @@ class InterestRatingService:
 Описания пользователей:
 {users_descriptions}
 """
-        
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    },
-                    json={
-                        "model": "qodo/gemini-2.0-flash",
-                        "messages": [
-                            {"role": "system", "content": "Ты помогаешь сортировать пользователей по их интересности для ментора на основе описаний."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7
-                    }
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                result_text = data["choices"][0]["message"]["content"]
-                result_text = result_text.replace("```json", "").replace("```", "")
-
-                try:
-                    ranked_ids = json.loads(result_text)
-                    if isinstance(ranked_ids, list):
-                        return ranked_ids
-                except (json.JSONDecodeError, ValueError):
-                    import re
-                    matches = re.findall(r'\[(.*?)\]', result_text)
-                    if matches:
-                        items = matches[0].split(',')
-                        cleaned_ids = [item.strip(' "\'\t\n') for item in items]
-                        return [item for item in cleaned_ids if item]
-            
-            return [user["id"] for user in users]
-                
-        except Exception as e:
-            print(f"Error ranking users: {str(e)}")
-            return [user["id"] for user in users] 
\ No newline at end of file
+
+        return await self._rank_in_chunks(
+            users,
+            "Ты помогаешь сортировать пользователей по их интересности для ментора на основе описаний.",
+            build_prompt,
+        )
+
+
+def create_interest_service():
+    """
+    Создает сервис ранжирования согласно RANKING_BACKEND из конфига.
+
+    Returns:
+        Экземпляр сервиса с методами get_ranked_mentors и get_ranked_users
+    """
+    backends = {
+        "llm": InterestRatingService,
+        "local": VectorRankingService,
+    }
+    if RANKING_BACKEND not in backends:
+        raise ValueError(f"Unknown ranking backend: {RANKING_BACKEND}")
+    return backends[RANKING_BACKEND]()
+
+
+# Singleton instance
+interest_service = create_interest_service()
@@ -1,4 +1,3 @@
-from datetime import timedelta
 import re
 from transliterate import translit
 
@@ -10,18 +9,20 @@ from src.data.models import Mentor
 import src.repository.mentor_repository as mentor_repo
 from src.schemas.schemas import MentorCreationSchema, MentorUpdateSchema
 from src.security.auth import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    create_access_token,
-    get_password_hash,
-    verify_password,
+    hash_password,
+    issue_tokens,
+    verify_and_update_password,
 )
 
+# Сколько раз пробуем занять логин при одновременных регистрациях с одним именем
+LOGIN_ALLOCATION_ATTEMPTS = 5
+
 
 async def generate_unique_login(name: str) -> str:
     """
     Генерирует уникальный логин на основе имени.
     Если имя на русском, транслитерирует его.
-    Если логин не уникален, добавляет число в конец.
+    Если логин не уникален, добавляет число в конец (наибольший занятый суффикс + 1).
 
     Args:
         name: Имя пользователя
@@ -38,69 +39,61 @@ async def generate_unique_login(name: str) -> str:
     # Делаем логин в нижнем регистре и заменяем пробелы на подчеркивания
     login = login.lower().replace(" ", "_")
 
-    # Проверяем, существует ли такой логин
-    existing_mentor = await mentor_repo.get_mentor_by_login(login)
-
-    if not existing_mentor:
+    # Одним запросом находим наибольший занятый суффикс
+    max_suffix = await mentor_repo.get_max_login_suffix(login)
+    if max_suffix is None:
         return login
-
-    # Если логин существует, добавляем число
-    counter = 1
-    while True:
-        new_login = f"{login}{counter}"
-        existing_mentor = await mentor_repo.get_mentor_by_login(new_login)
-        if not existing_mentor:
-            return new_login
-        counter += 1
+    return f"{login}{max_suffix + 1}"
 
 
 async def register_mentor(user_data: MentorCreationSchema):
-    # Генерируем уникальный логин
-    login = await generate_unique_login(user_data.name)
-
     # Создаем хеш пароля
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
+
+    # Логин занимаем вставкой: если его успела занять параллельная регистрация,
+    # уникальный индекс вернет IntegrityError и мы берем следующий суффикс
+    for _ in range(LOGIN_ALLOCATION_ATTEMPTS):
+        login = await generate_unique_login(user_data.name)
+
+        # Создаем нового ментора
+        new_mentor = Mentor(
+            name=user_data.name,  # type: ignore
+            login=login,  # type: ignore
+            password_hash=hashed_password,  # type: ignore
+        )
 
-    # Создаем нового ментора
-    new_mentor = Mentor(
-        name=user_data.name,  # type: ignore
-        login=login,  # type: ignore
-        password_hash=hashed_password,  # type: ignore
-    )
+        try:
+            created_mentor = await mentor_repo.create_mentor(new_mentor)
+        except IntegrityError:
+            continue
 
-    try:
-        await mentor_repo.create_mentor(new_mentor)
-        
-        # Генерируем JWT токен
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            role=Roles.MENTOR, data={"sub": login}, expires_delta=access_token_expires
-        )
-        
-        return {"access_token": access_token, "token_type": "bearer"}
-    except IntegrityError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Registration failed"
-        )
+        # Генерируем JWT токены
+        return issue_tokens(Roles.MENTOR, created_mentor)
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Registration failed"
+    )
 
 
-async def authenticate_mentor(login: str, password: str) -> tuple[Mentor, str]:
+async def authenticate_mentor(login: str, password: str) -> tuple[Mentor, dict]:
     entity = await mentor_repo.get_mentor_by_login(login)
     # Verify user exists and password is correct
-    if not entity or not verify_password(password, entity.password_hash):
+    verified, new_hash = (False, None)
+    if entity:
+        verified, new_hash = await verify_and_update_password(password, entity.password_hash)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect login or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        Roles.MENTOR, data={"sub": entity.login}, expires_delta=access_token_expires
-    )
+    # Стоимость bcrypt изменилась - сохраняем хеш с новой стоимостью
+    if new_hash:
+        await mentor_repo.update_mentor_password_hash(entity.id, new_hash)
 
-    return entity, access_token
+    # Create access and refresh tokens
+    return entity, issue_tokens(Roles.MENTOR, entity)
 
 
 async def update_mentor_profile_service(
@@ -124,15 +117,25 @@ async def update_mentor_profile_service(
 
     # Если передан пароль, хэшируем его
     if "password" in update_dict:
-        update_dict["password_hash"] = get_password_hash(update_dict.pop("password"))
+        update_dict["password_hash"] = await hash_password(update_dict.pop("password"))
     
     # Убеждаемся, что поле login не может быть изменено
     if "login" in update_dict:
         # Убираем логин из обновляемых данных
         update_dict.pop("login")
 
+    # Версия - условие оптимистичной блокировки, а не обновляемое поле
+    expected_version = update_dict.pop("version", None)
+
     # Обновляем профиль
-    updated_mentor = await mentor_repo.update_mentor_profile(mentor_id, update_dict)
+    updated_mentor = await mentor_repo.update_mentor_profile(mentor_id, update_dict, expected_version)
+
+    # Пустой результат с версией - конфликт, только если профиль еще существует
+    if not updated_mentor and expected_version is not None and await mentor_repo.get_mentor_by_id(mentor_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Профиль уже изменен, обновите данные и повторите",
+        )
 
     if not updated_mentor:
         raise HTTPException(
@@ -0,0 +1,201 @@
+import asyncio
+import ipaddress
+import math
+import socket
+from typing import FrozenSet, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from src.config import (
+    AUTH_RATE_LIMIT_IP_CAPACITY,
+    AUTH_RATE_LIMIT_IP_RATE,
+    AUTH_RATE_LIMIT_LOGIN_CAPACITY,
+    AUTH_RATE_LIMIT_LOGIN_RATE,
+    TRUSTED_PROXIES,
+    TRUSTED_PROXIES_RESOLVE_INTERVAL,
+)
+from src.services.redis_service import redis_service
+from src.utils.metrics import auth_rate_limited
+
+# Несколько token bucket проверяются и списываются атомарно: токен снимается
+# со всех корзин, только если в каждой он есть. Время берется у Redis, чтобы
+# расхождение часов между воркерами не влияло на пополнение.
+# ARGV: емкость и скорость пополнения для каждого ключа по порядку.
+# Возвращает {1 или 0, секунд до следующей попытки}.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = {}
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local current = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    current = math.min(capacity, current + math.max(0, now - ts) * rate)
+    tokens[i] = current
+    if current < 1 then
+        retry_after = math.max(retry_after, (1 - current) / rate)
+    end
+end
+local allowed = retry_after == 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local current = tokens[i]
+    if allowed then
+        current = current - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(current), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return {allowed and 1 or 0, tostring(retry_after)}
+"""
+
+
+class RateLimiter:
+    """Ограничение частоты запросов на token bucket в Redis"""
+
+    def __init__(self):
+        self._script = redis_service.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, buckets: List[Tuple[str, float, float]]) -> Tuple[bool, float]:
+        """
+        Снимает по токену со всех корзин.
+
+        Args:
+            buckets: Список (ключ, емкость, пополнение в секунду)
+
+        Returns:
+            Кортеж (разрешено, секунд до следующей попытки). Если Redis
+            недоступен, запрос разрешается: вход не должен зависеть от Redis.
+        """
+        keys = [f"ratelimit:{key}" for key, _, _ in buckets]
+        args = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+        try:
+            allowed, retry_after = await self._script(keys=keys, args=args)
+        except Exception:
+            return True, 0.0
+        return bool(int(allowed)), float(retry_after)
+
+
+class TrustedProxies:
+    """
+    Прокси, которым доверяем X-Real-IP: адреса, подсети и имена хостов.
+
+    IP контейнера (например, nginx) меняется при пересоздании, поэтому имена
+    хостов резолвятся в фоне раз в TRUSTED_PROXIES_RESOLVE_INTERVAL секунд,
+    а запрос только сверяется с готовым набором адресов.
+    """
+
+    def __init__(self, entries: List[str] = TRUSTED_PROXIES, interval: float = TRUSTED_PROXIES_RESOLVE_INTERVAL):
+        self.interval = interval
+        self._networks = []
+        self._hostnames: List[str] = []
+        for entry in entries:
+            try:
+                self._networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self._hostnames.append(entry)
+        self._resolved: FrozenSet[str] = frozenset()
+        self._task: Optional[asyncio.Task] = None
+
+    async def startup(self) -> None:
+        """Резолвит имена хостов и запускает их периодическое обновление"""
+        if self._hostnames and self._task is None:
+            await self.resolve()
+            self._task = asyncio.create_task(self._resolve_loop())
+
+    async def shutdown(self) -> None:
+        """Останавливает обновление адресов"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def resolve(self) -> None:
+        """
+        Обновляет адреса имен хостов без блокировки event loop.
+
+        Имя, которое не удалось разрешить, сохраняет прежние адреса.
+        """
+        loop = asyncio.get_running_loop()
+        resolved = set()
+        for hostname in self._hostnames:
+            try:
+                infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+            except OSError:
+                resolved.update(self._resolved)
+                continue
+            resolved.update(info[4][0] for info in infos)
+        self._resolved = frozenset(resolved)
+
+    def is_trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        if any(address in network for network in self._networks):
+            return True
+        return host in self._resolved
+
+    async def _resolve_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.resolve()
+            except Exception:
+                pass
+
+
+# Singleton instance
+trusted_proxies = TrustedProxies()
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    IP клиента.
+
+    X-Real-IP учитывается только от доверенного прокси из TRUSTED_PROXIES:
+    бэкенд доступен и напрямую, и иначе любой клиент мог бы подставить
+    заголовок и обойти ограничение по IP.
+    """
+    peer = request.client.host if request.client else None
+    if peer is None:
+        return "unknown"
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip and trusted_proxies.is_trusted(peer):
+        return real_ip.strip()
+    return peer
+
+
+async def enforce_auth_rate_limit(request: Request, route: str, login: Optional[str] = None) -> None:
+    """
+    Ограничивает частоту входа и регистрации до проверки пароля.
+
+    Корзина по IP ограничивает одного клиента, корзина по логину - перебор
+    пароля одного аккаунта с разных адресов.
+
+    Raises:
+        HTTPException: 429 с заголовком Retry-After
+    """
+    buckets = [(f"{route}:ip:{get_client_ip(request)}", AUTH_RATE_LIMIT_IP_CAPACITY, AUTH_RATE_LIMIT_IP_RATE)]
+    if login:
+        buckets.append((f"{route}:login:{login.lower()}", AUTH_RATE_LIMIT_LOGIN_CAPACITY, AUTH_RATE_LIMIT_LOGIN_RATE))
+
+    allowed, retry_after = await rate_limiter.acquire(buckets)
+    if not allowed:
+        auth_rate_limited.labels(route=route).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток, повторите позже",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
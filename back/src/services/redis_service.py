@@ -1,11 +1,36 @@
 import json
-import hashlib
-from typing import Any, Optional, List, Dict
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional, List, Tuple
 
 import redis.asyncio as redis
 from fastapi import Depends
 
-from src.config import REDIS_HOST, REDIS_PORT, REDIS_CACHE_TTL
+from src.config import REDIS_HOST, REDIS_PORT, REDIS_CACHE_TTL, REFRESH_TOKEN_EXPIRE_DAYS
+from src.utils.metrics import redis_lookups, redis_operation_duration
+
+
+# Отозванные токены и аккаунты
+REVOKED_KEY = "auth:revoked"
+
+
+@contextmanager
+def _timed(operation: str) -> Iterator[None]:
+    """Время операции для redis_operation_duration_seconds, в том числе неудачной"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        redis_operation_duration.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+def _record_lookup(operation: str, result: str) -> None:
+    redis_lookups.labels(operation=operation, result=result).inc()
+
+
+def _empty_ranking_key(key: str) -> str:
+    """Метка сохраненного пустого ранжирования"""
+    return f"{key}:empty"
 
 
 class RedisService:
@@ -20,38 +45,232 @@ class RedisService:
     async def get_cache(self, key: str) -> Optional[dict]:
         """Получить данные из кеша"""
         try:
-            data = await self.redis_client.get(key)
-            return json.loads(data) if data else None
+            with _timed("get_cache"):
+                data = await self.redis_client.get(key)
         except Exception:
+            _record_lookup("get_cache", "error")
             return None
+        _record_lookup("get_cache", "hit" if data else "miss")
+        return json.loads(data) if data else None
 
     async def set_cache(self, key: str, value: Any) -> bool:
         """Сохранить данные в кеш"""
         try:
-            await self.redis_client.setex(
-                key,
-                self.ttl,
-                json.dumps(value)
-            )
+            with _timed("set_cache"):
+                await self.redis_client.setex(
+                    key,
+                    self.ttl,
+                    json.dumps(value)
+                )
             return True
         except Exception:
             return False
 
-    def _generate_content_hash(self, items: List[Dict]) -> str:
-        """Генерация хеша от списка пользователей/менторов и их описаний"""
-        # Сортируем элементы по id для обеспечения стабильного хеша
-        sorted_items = sorted(items, key=lambda x: x.get('id', ''))
-        
-        # Создаем строку из всех описаний и данных
-        content_str = json.dumps(sorted_items, sort_keys=True)
-        
-        # Генерируем хеш
-        return hashlib.sha256(content_str.encode()).hexdigest()
-
-    def generate_feed_cache_key(self, description: str, items: List[Dict], filtered: bool, page: int, size: int) -> str:
-        """Генерация ключа для кеша фида с учетом хеша контента"""
-        content_hash = self._generate_content_hash(items)
-        return f"feed:{hash(description)}:{content_hash}:{filtered}:{page}:{size}"
+    async def get_catalog_version(self, kind: str) -> int:
+        """Получить текущую версию каталога (mentors или users)"""
+        try:
+            with _timed("get_catalog_version"):
+                version = await self.redis_client.get(f"catalog:version:{kind}")
+            return int(version) if version else 0
+        except Exception:
+            return 0
+
+    async def bump_catalog_version(self, kind: str) -> None:
+        """Увеличить версию каталога после изменения профилей"""
+        try:
+            await self.redis_client.incr(f"catalog:version:{kind}")
+        except Exception:
+            pass
+
+    def generate_feed_ranking_key(
+        self,
+        kind: str,
+        viewer_id: int,
+        viewer_version: int,
+        catalog_version: int,
+        filtered: bool,
+    ) -> str:
+        """Генерация ключа ранжирования ленты за O(1) (общий для всех страниц)"""
+        return f"feed:ranking:{kind}:{viewer_id}:{viewer_version}:{catalog_version}:{filtered}"
+
+    async def get_ranking_page(self, key: str, start: int, stop: int) -> Optional[Tuple[List[int], int]]:
+        """
+        Получить страницу ранжирования из sorted set
+
+        Args:
+            key: Ключ ранжирования
+            start: Индекс первого элемента страницы
+            stop: Индекс последнего элемента страницы (включительно)
+
+        Returns:
+            Кортеж (id кандидатов страницы, общее количество) или None, если ранжирования нет.
+            Сохраненное пустое ранжирование возвращается как ([], 0)
+        """
+        try:
+            with _timed("get_ranking_page"):
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.zrange(key, start, stop)
+                    pipe.zcard(key)
+                    pipe.exists(_empty_ranking_key(key))
+                    ids, total, empty = await pipe.execute()
+        except Exception:
+            _record_lookup("get_ranking_page", "error")
+            return None
+        _record_lookup("get_ranking_page", "hit" if total or empty else "miss")
+        if not total:
+            return ([], 0) if empty else None
+        return [int(item_id) for item_id in ids], total
+
+    async def get_ranking(self, key: str) -> Optional[List[int]]:
+        """Получить ранжирование целиком или None, если его нет (пустое ранжирование - [])"""
+        try:
+            with _timed("get_ranking"):
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.zrange(key, 0, -1)
+                    pipe.exists(_empty_ranking_key(key))
+                    ids, empty = await pipe.execute()
+        except Exception:
+            _record_lookup("get_ranking", "error")
+            return None
+        _record_lookup("get_ranking", "hit" if ids or empty else "miss")
+        if not ids:
+            return [] if empty else None
+        return [int(item_id) for item_id in ids]
+
+    async def set_ranking(self, key: str, ranked_ids: List[int]) -> bool:
+        """
+        Сохранить ранжирование в sorted set (score = позиция в ленте).
+
+        Пустой sorted set в Redis не хранится, поэтому пустое ранжирование
+        сохраняется отдельным ключом-меткой: зритель, под фильтры которого
+        никто не подходит, не перестраивает ранжирование на каждый запрос.
+        """
+        try:
+            with _timed("set_ranking"):
+                async with self.redis_client.pipeline(transaction=True) as pipe:
+                    pipe.delete(key)
+                    if ranked_ids:
+                        pipe.zadd(key, {str(item_id): position for position, item_id in enumerate(ranked_ids)})
+                        pipe.expire(key, self.ttl)
+                    else:
+                        pipe.set(_empty_ranking_key(key), 1, ex=self.ttl)
+                    await pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    async def revoke_token(self, jti: str, expires_at: float) -> bool:
+        """
+        Отзывает токен до окончания его срока действия.
+
+        Отозванные токены и аккаунты лежат в одном sorted set, score - время,
+        до которого запись действует; просроченные записи удаляются при добавлении.
+        """
+        return await self._revoke(f"token:{jti}", expires_at)
+
+    async def claim_token(self, jti: str, expires_at: float) -> Optional[bool]:
+        """
+        Атомарно отзывает одноразовый токен (ZADD NX).
+
+        Returns:
+            True, если токен отозван этим вызовом; False, если он уже был
+            отозван; None, если Redis недоступен
+        """
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(REVOKED_KEY, {f"token:{jti}": expires_at}, nx=True)
+                pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+                added, _ = await pipe.execute()
+        except Exception:
+            return None
+        return bool(added)
+
+    async def revoke_account(self, role: str, account_id: int) -> bool:
+        """Отзывает все токены деактивированного аккаунта"""
+        return await self._revoke(f"account:{role}:{account_id}", float("inf"))
+
+    async def revoke_token_version(self, role: str, account_id: int, token_version: int) -> bool:
+        """
+        Отзывает токены аккаунта, выданные с данной версией учетных данных.
+
+        Запись живет, пока не истекут refresh-токены этой версии.
+        """
+        expires_at = time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+        return await self._revoke(f"tokens:{role}:{account_id}:{token_version}", expires_at)
+
+    async def restore_account(self, role: str, account_id: int) -> bool:
+        """Снимает отзыв токенов с аккаунта после повторной активации"""
+        try:
+            await self.redis_client.zrem(REVOKED_KEY, f"account:{role}:{account_id}")
+            return True
+        except Exception:
+            return False
+
+    async def _revoke(self, member: str, expires_at: float) -> bool:
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(REVOKED_KEY, {member: expires_at})
+                pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    async def is_revoked(
+        self, jti: Optional[str], role: str, account_id: int, token_version: Optional[int] = None
+    ) -> Optional[bool]:
+        """
+        Проверяет одним запросом, отозван ли токен, его версия учетных данных или весь аккаунт.
+
+        Returns:
+            True или False; None, если Redis недоступен
+        """
+        members = [f"account:{role}:{account_id}"]
+        if token_version is not None:
+            members.append(f"tokens:{role}:{account_id}:{token_version}")
+        if jti:
+            members.append(f"token:{jti}")
+        try:
+            with _timed("is_revoked"):
+                scores = await self.redis_client.zmscore(REVOKED_KEY, members)
+        except Exception:
+            return None
+        now = time.time()
+        return any(score is not None and score > now for score in scores)
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float, blocking_timeout: float) -> AsyncIterator[bool]:
+        """
+        Распределенная блокировка между воркерами.
+
+        Отдает True, если блокировка получена. Если Redis недоступен или
+        время ожидания истекло, отдает False и ничего не блокирует.
+        """
+        lock = self.redis_client.lock(f"lock:{name}", timeout=timeout, blocking_timeout=blocking_timeout)
+        try:
+            acquired = bool(await lock.acquire())
+        except Exception:
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except Exception:
+                    pass
+
+    async def claim_period(self, name: str, period: float) -> bool:
+        """
+        Отдает True только одному воркеру за период.
+
+        Периодическая задача, запущенная в каждом воркере, так выполняется
+        один раз на все воркеры. Если Redis недоступен, отдает False.
+        """
+        try:
+            return bool(await self.redis_client.set(f"lock:{name}", "1", nx=True, px=int(period * 1000)))
+        except Exception:
+            return False
 
 
 # Singleton instance
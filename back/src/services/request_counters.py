@@ -0,0 +1,216 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src.config import REQUEST_COUNTS_RECONCILE_INTERVAL
+from src.data.models import EntityType, RequestStatus
+from src.repository.request_repository import count_request_badges
+from src.services.redis_service import redis_service
+
+# Hash счетчиков участника: requests:counts:<тип>:<id>
+KEY_PREFIX = "requests:counts"
+
+PENDING_RECEIVED = "pending_received"
+PENDING_SENT = "pending_sent"
+ACCEPTED_UNSEEN = "accepted_unseen"
+# Момент последнего просмотра исходящих заявок, от него считается ACCEPTED_UNSEEN
+SEEN_AT = "seen_at"
+
+COUNTERS = (PENDING_RECEIVED, PENDING_SENT, ACCEPTED_UNSEEN)
+
+# Изменения применяются атомарно и только к полным hash: счетчик, которого
+# нет, не должен появиться с частичным значением - его целиком посчитает get.
+# ARGV: поле и приращение для каждого ключа по порядку, ключи могут повторяться.
+INCREMENT_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local counters = redis.call('HMGET', key, 'pending_received', 'pending_sent', 'accepted_unseen')
+    if counters[1] and counters[2] and counters[3] then
+        redis.call('HINCRBY', key, ARGV[i * 2 - 1], ARGV[i * 2])
+    end
+end
+return 0
+"""
+
+# Просмотр исходящих: сбрасывает accepted_unseen только в полном hash. Иначе
+# сохраняется лишь seen_at, от которого get посчитает счетчики целиком.
+# ARGV[1]: момент просмотра.
+MARK_SEEN_SCRIPT = """
+local counters = redis.call('HMGET', KEYS[1], 'pending_received', 'pending_sent', 'accepted_unseen')
+if counters[1] and counters[2] and counters[3] then
+    redis.call('HSET', KEYS[1], 'accepted_unseen', 0, 'seen_at', ARGV[1])
+else
+    redis.call('HSET', KEYS[1], 'seen_at', ARGV[1])
+end
+return 0
+"""
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def counters_key(entity_type: EntityType, entity_id: int) -> str:
+    return f"{KEY_PREFIX}:{entity_type.value}:{entity_id}"
+
+
+class RequestCounters:
+    """
+    Счетчики заявок участника в Redis для бейджей: ожидающие входящие,
+    ожидающие исходящие и исходящие, подтвержденные после последнего просмотра.
+
+    Отправка, подтверждение и отклонение меняют счетчики после коммита.
+    Отсутствующий hash считается из Postgres при первом чтении, а
+    периодическая сверка исправляет расхождения после ошибок Redis и гонок.
+    """
+
+    def __init__(self, reconcile_interval: float = REQUEST_COUNTS_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self._script = redis_service.redis_client.register_script(INCREMENT_SCRIPT)
+        self._mark_seen_script = redis_service.redis_client.register_script(MARK_SEEN_SCRIPT)
+        self._task: Optional[asyncio.Task] = None
+
+    async def startup(self) -> None:
+        """Запускает периодическую сверку"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def shutdown(self) -> None:
+        """Останавливает периодическую сверку"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def record_created(self, requests: List[Mapping[str, Any]]) -> None:
+        """Учитывает новые заявки"""
+        updates = []
+        for request in requests:
+            updates.append((_receiver_key(request), PENDING_RECEIVED, 1))
+            updates.append((_sender_key(request), PENDING_SENT, 1))
+        await self._apply(updates)
+
+    async def record_decided(self, requests: List[Mapping[str, Any]], new_status: RequestStatus) -> None:
+        """Учитывает подтвержденные или отклоненные ожидающие заявки"""
+        updates = []
+        for request in requests:
+            updates.append((_receiver_key(request), PENDING_RECEIVED, -1))
+            updates.append((_sender_key(request), PENDING_SENT, -1))
+            if new_status == RequestStatus.ACCEPTED:
+                updates.append((_sender_key(request), ACCEPTED_UNSEEN, 1))
+        await self._apply(updates)
+
+    async def get(self, entity_type: EntityType, entity_id: int) -> Dict[str, int]:
+        """
+        Счетчики участника: одно чтение hash, а если его нет - подсчет в Postgres.
+
+        Если Redis недоступен, счетчики считаются в Postgres без сохранения.
+        """
+        key = counters_key(entity_type, entity_id)
+        try:
+            stored = await redis_service.redis_client.hgetall(key)
+        except Exception:
+            counts, _ = await _count(entity_type, entity_id, None)
+            return counts
+
+        if all(field in stored for field in COUNTERS):
+            return {field: max(0, int(stored[field])) for field in COUNTERS}
+
+        counts, seen_at = await _count(entity_type, entity_id, stored.get(SEEN_AT))
+        try:
+            await redis_service.redis_client.hset(key, mapping={**counts, SEEN_AT: seen_at})
+        except Exception:
+            pass
+        return counts
+
+    async def mark_accepted_seen(self, entity_type: EntityType, entity_id: int) -> None:
+        """Сбрасывает счетчик подтвержденных исходящих после просмотра списка"""
+        try:
+            await self._mark_seen_script(
+                keys=[counters_key(entity_type, entity_id)], args=[datetime.now().isoformat()]
+            )
+        except Exception:
+            pass
+
+    async def reconcile(self) -> None:
+        """
+        Пересчитывает все существующие hash по Postgres пачками.
+
+        Значения записываются поверх, поэтому изменение, попавшее между
+        подсчетом и записью, может потеряться до следующей сверки.
+        """
+        batch: List[str] = []
+        async for key in redis_service.redis_client.scan_iter(match=f"{KEY_PREFIX}:*", count=RECONCILE_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                await self._reconcile_batch(batch)
+                batch = []
+        if batch:
+            await self._reconcile_batch(batch)
+
+    async def _reconcile_batch(self, keys: List[str]) -> None:
+        async with redis_service.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(key, SEEN_AT)
+            seen_values = await pipe.execute()
+
+        entities: List[Tuple[EntityType, int, Optional[datetime]]] = []
+        for key, seen_at in zip(keys, seen_values):
+            entity_type, entity_id = key[len(KEY_PREFIX) + 1:].split(":")
+            entities.append((EntityType(entity_type), int(entity_id), _parse_seen_at(seen_at)))
+        counts = await count_request_badges(entities)
+
+        async with redis_service.redis_client.pipeline(transaction=False) as pipe:
+            for (entity_type, entity_id), values in counts.items():
+                pipe.hset(counters_key(entity_type, entity_id), mapping=dict(zip(COUNTERS, values)))
+            await pipe.execute()
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            if not await redis_service.claim_period("requests:counts:reconcile", self.reconcile_interval):
+                continue
+            try:
+                await self.reconcile()
+            except Exception:
+                pass
+
+    async def _apply(self, updates: List[Tuple[str, str, int]]) -> None:
+        if not updates:
+            return
+        keys = [key for key, _, _ in updates]
+        args = [value for _, field, delta in updates for value in (field, delta)]
+        try:
+            await self._script(keys=keys, args=args)
+        except Exception:
+            # Расхождение исправит сверка
+            pass
+
+
+def _receiver_key(request: Mapping[str, Any]) -> str:
+    return counters_key(EntityType(request["receiver_type"]), request["receiver_id"])
+
+
+def _sender_key(request: Mapping[str, Any]) -> str:
+    return counters_key(EntityType(request["sender_type"]), request["sender_id"])
+
+
+def _parse_seen_at(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _count(
+    entity_type: EntityType, entity_id: int, seen_at: Optional[str]
+) -> Tuple[Dict[str, int], str]:
+    """Счетчики одного участника из Postgres и момент просмотра для сохранения"""
+    seen = _parse_seen_at(seen_at) or datetime.now()
+    counts = await count_request_badges([(entity_type, entity_id, seen)])
+    values = counts.get((entity_type, entity_id), (0, 0, 0))
+    return dict(zip(COUNTERS, values)), seen.isoformat()
+
+
+# Singleton instance
+request_counters = RequestCounters()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import secrets
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Set
+
+from src.config import REQUEST_EVENTS_QUEUE_SIZE, REQUEST_EVENTS_TICKET_TTL
+from src.data.models import EntityType
+from src.services.redis_service import redis_service
+
+# Канал участника заявки: requests:events:<тип>:<id>
+CHANNEL_PREFIX = "requests:events"
+# Одноразовый билет EventSource: requests:events-ticket:<билет> -> access-токен
+TICKET_PREFIX = "requests:events-ticket"
+
+REQUEST_CREATED = "request.created"
+REQUEST_STATUS_CHANGED = "request.status_changed"
+
+
+def events_channel(entity_type: EntityType, entity_id: int) -> str:
+    """Канал событий заявок пользователя или ментора"""
+    return f"{CHANNEL_PREFIX}:{entity_type.value}:{entity_id}"
+
+
+def request_event(event_type: str, request: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Событие по строке заявки.
+
+    В событии нет карточек участников: клиент дозагружает изменения
+    через /requests/got и /requests/sent с updated_since.
+    """
+    updated_at = request["updated_at"]
+    return {
+        "type": event_type,
+        "request": {
+            "id": request["id"],
+            "sender_id": request["sender_id"],
+            "sender_type": EntityType(request["sender_type"]).value,
+            "receiver_id": request["receiver_id"],
+            "receiver_type": EntityType(request["receiver_type"]).value,
+            "status": request["status"].value,
+            "updated_at": updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at,
+        },
+    }
+
+
+class RequestEventHub:
+    """
+    Доставка событий заявок через Redis pub/sub.
+
+    Любой воркер публикует событие в каналы отправителя и получателя. Каждый
+    воркер держит одну подписку по шаблону на все каналы и раздает события
+    своим открытым потокам, поэтому число соединений с Redis не растет
+    вместе с числом клиентов.
+    """
+
+    def __init__(self, queue_size: int = REQUEST_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def startup(self) -> None:
+        """Запускает чтение подписки"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def shutdown(self) -> None:
+        """Останавливает чтение подписки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Публикует события одним pipeline.
+
+        Ошибки Redis не пробрасываются: заявка уже сохранена, а клиент
+        без событий увидит ее при следующей загрузке списка.
+        """
+        if not events:
+            return
+        try:
+            async with redis_service.redis_client.pipeline(transaction=False) as pipe:
+                for event in events:
+                    data = json.dumps(event)
+                    request = event["request"]
+                    pipe.publish(events_channel(EntityType(request["sender_type"]), request["sender_id"]), data)
+                    pipe.publish(events_channel(EntityType(request["receiver_type"]), request["receiver_id"]), data)
+                await pipe.execute()
+        except Exception:
+            pass
+
+    async def issue_ticket(self, token: str, ttl: int = REQUEST_EVENTS_TICKET_TTL) -> Optional[str]:
+        """
+        Одноразовый билет для EventSource, который не умеет передавать заголовок Authorization.
+
+        Билет живет ttl секунд и заменяет access-токен в адресе потока, поэтому
+        сам токен не попадает в URL и журналы прокси.
+
+        Returns:
+            Билет или None, если Redis недоступен
+        """
+        ticket = secrets.token_urlsafe(32)
+        try:
+            await redis_service.redis_client.set(f"{TICKET_PREFIX}:{ticket}", token, ex=ttl)
+        except Exception:
+            return None
+        return ticket
+
+    async def redeem_ticket(self, ticket: str) -> Optional[str]:
+        """Access-токен по билету; билет удаляется при первом использовании"""
+        try:
+            return await redis_service.redis_client.getdel(f"{TICKET_PREFIX}:{ticket}")
+        except Exception:
+            return None
+
+    @asynccontextmanager
+    async def subscribe(self, entity_type: EntityType, entity_id: int) -> AsyncIterator[asyncio.Queue]:
+        """Очередь событий участника на время открытого потока"""
+        channel = events_channel(entity_type, entity_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(channel)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[channel]
+
+    def _deliver(self, channel: str, data: str) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Клиент не успевает читать; пропущенное он догонит через updated_since
+                pass
+
+    async def _listen(self) -> None:
+        """Читает подписку и переподключается после ошибок Redis"""
+        while True:
+            pubsub = redis_service.redis_client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}:*")
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._deliver(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+# Singleton instance
+request_events = RequestEventHub()
@@ -1,4 +1,3 @@
-from datetime import timedelta
 import re
 from transliterate import translit
 
@@ -10,18 +9,20 @@ from src.data.models import User
 import src.repository.user_repository as user_repo
 from src.schemas.schemas import UserCreationSchema, UserUpdateSchema
 from src.security.auth import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    create_access_token,
-    get_password_hash,
-    verify_password,
+    hash_password,
+    issue_tokens,
+    verify_and_update_password,
 )
 
+# Сколько раз пробуем занять логин при одновременных регистрациях с одним именем
+LOGIN_ALLOCATION_ATTEMPTS = 5
+
 
 async def generate_unique_login(name: str) -> str:
     """
     Генерирует уникальный логин на основе имени.
     Если имя на русском, транслитерирует его.
-    Если логин не уникален, добавляет число в конец.
+    Если логин не уникален, добавляет число в конец (наибольший занятый суффикс + 1).
     
     Args:
         name: Имя пользователя
@@ -38,51 +39,41 @@ async def generate_unique_login(name: str) -> str:
     # Делаем логин в нижнем регистре и заменяем пробелы на подчеркивания
     login = login.lower().replace(' ', '_')
     
-    # Проверяем, существует ли такой логин
-    existing_user = await user_repo.get_user_by_login(login)
-    
-    if not existing_user:
+    # Одним запросом находим наибольший занятый суффикс
+    max_suffix = await user_repo.get_max_login_suffix(login)
+    if max_suffix is None:
         return login
-    
-    # Если логин существует, добавляем число
-    counter = 1
-    while True:
-        new_login = f"{login}{counter}"
-        existing_user = await user_repo.get_user_by_login(new_login)
-        if not existing_user:
-            return new_login
-        counter += 1
+    return f"{login}{max_suffix + 1}"
 
 
 async def register_user(user_data: UserCreationSchema):
-    # Генерируем уникальный логин
-    login = await generate_unique_login(user_data.name)
-    
     # Создаем хеш пароля
-    hashed_password = get_password_hash(user_data.password)
-    
-    # Создаем нового пользователя
-    new_user = User(
-        name=user_data.name,
-        login=login,
-        password_hash=hashed_password
-    )
+    hashed_password = await hash_password(user_data.password)
 
-    try:
-        await user_repo.create_user(new_user)
-        created_user = await user_repo.get_user_by_login(login)
-        
-        # Генерируем JWT токен
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            role=Roles.USER, data={"sub": login}, expires_delta=access_token_expires
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
-    except IntegrityError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Registration failed"
+    # Логин занимаем вставкой: если его успела занять параллельная регистрация,
+    # уникальный индекс вернет IntegrityError и мы берем следующий суффикс
+    for _ in range(LOGIN_ALLOCATION_ATTEMPTS):
+        login = await generate_unique_login(user_data.name)
+
+        # Создаем нового пользователя
+        new_user = User(
+            name=user_data.name,
+            login=login,
+            password_hash=hashed_password
         )
 
+        try:
+            created_user = await user_repo.create_user(new_user)
+        except IntegrityError:
+            continue
+
+        # Генерируем JWT токены
+        return issue_tokens(Roles.USER, created_user)
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Registration failed"
+    )
+
 
 async def authenticate_user(login: str, password: str):
     user = await user_repo.get_user_by_login(login)
@@ -90,15 +81,16 @@ async def authenticate_user(login: str, password: str):
     if not user:
         return False
 
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = await verify_and_update_password(password, user.password_hash)
+    if not verified:
         return False
 
-    # Generate JWT token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        role=Roles.USER, data={"sub": user.login}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Стоимость bcrypt изменилась - сохраняем хеш с новой стоимостью
+    if new_hash:
+        await user_repo.update_user_password_hash(user.id, new_hash)
+
+    # Generate JWT tokens
+    return issue_tokens(Roles.USER, user)
 
 
 async def update_user_profile_service(user_id: int, update_data: UserUpdateSchema) -> User:
@@ -120,16 +112,26 @@ async def update_user_profile_service(user_id: int, update_data: UserUpdateSchem
     
     # Если передан пароль, хэшируем его
     if "password" in update_dict:
-        update_dict["password_hash"] = get_password_hash(update_dict.pop("password"))
+        update_dict["password_hash"] = await hash_password(update_dict.pop("password"))
     
     # Убеждаемся, что поле login не может быть изменено
     if "login" in update_dict:
         # Убираем логин из обновляемых данных
         update_dict.pop("login")
     
+    # Версия - условие оптимистичной блокировки, а не обновляемое поле
+    expected_version = update_dict.pop("version", None)
+
     # Обновляем профиль
-    updated_user = await user_repo.update_user_profile(user_id, update_dict)
+    updated_user = await user_repo.update_user_profile(user_id, update_dict, expected_version)
     
+    # Пустой результат с версией - конфликт, только если профиль еще существует
+    if not updated_user and expected_version is not None and await user_repo.get_user_by_id(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Профиль уже изменен, обновите данные и повторите",
+        )
+
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
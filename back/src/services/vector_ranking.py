@@ -0,0 +1,161 @@
+import asyncio
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    RANKING_VECTOR_CACHE_SIZE,
+    RANKING_VECTOR_DIM,
+    RANKING_VECTOR_NGRAM,
+)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class VectorRankingService:
+    """
+    Локальный сервис ранжирования по косинусной близости описаний.
+
+    Описания превращаются в хешированные TF-векторы (слова и символьные
+    n-граммы слов), IDF считается по текущему набору кандидатов.
+    Векторы каталога считаются заранее при построении снимка и приходят
+    в кандидатах готовыми; оценка выполняется в потоке, не блокируя event loop.
+    """
+
+    def __init__(
+        self,
+        dim: int = RANKING_VECTOR_DIM,
+        ngram: int = RANKING_VECTOR_NGRAM,
+        cache_size: int = RANKING_VECTOR_CACHE_SIZE,
+    ):
+        self.dim = dim
+        self.ngram = ngram
+        self.cache_size = cache_size
+        # Кеш векторов: описание -> (индексы признаков, частоты)
+        self._vectors: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        # rank выполняется в потоках, кеш общий
+        self._lock = threading.Lock()
+
+    async def startup(self) -> None:
+        """Локальному ранжированию ресурсы не нужны"""
+
+    async def shutdown(self) -> None:
+        """Локальному ранжированию ресурсы не нужны"""
+
+    def _features(self, text: str) -> List[str]:
+        """Разбивает текст на слова и символьные n-граммы слов"""
+        features = []
+        for word in TOKEN_RE.findall(text.lower()):
+            features.append(word)
+            padded = f" {word} "
+            for i in range(len(padded) - self.ngram + 1):
+                features.append(padded[i:i + self.ngram])
+        return features
+
+    def vectorize(self, text: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Возвращает разреженный TF-вектор описания.
+
+        Args:
+            text: Описание профиля
+
+        Returns:
+            Кортеж (индексы признаков, логарифмические частоты)
+        """
+        text = text or ""
+        with self._lock:
+            cached = self._vectors.get(text)
+            if cached is not None:
+                self._vectors.move_to_end(text)
+                return cached
+
+        # crc32 стабилен между процессами, в отличие от встроенного hash()
+        hashed = np.fromiter(
+            (zlib.crc32(f.encode()) % self.dim for f in self._features(text)),
+            dtype=np.int64,
+        )
+        indices, counts = np.unique(hashed, return_counts=True)
+        vector = (indices, 1.0 + np.log(counts.astype(np.float32)))
+
+        with self._lock:
+            self._vectors[text] = vector
+            if len(self._vectors) > self.cache_size:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def rank(self, candidates: List[Dict[str, Any]], description: str) -> List[Any]:
+        """
+        Сортирует кандидатов по убыванию косинусной близости к описанию.
+
+        Args:
+            candidates: Список словарей с ключами id и description; если есть ключ
+                vector с заранее посчитанным вектором, описание не разбирается
+            description: Описание того, для кого строится лента
+
+        Returns:
+            Список id кандидатов; при равных оценках сохраняется исходный порядок
+        """
+        if not candidates or not description:
+            return [candidate["id"] for candidate in candidates]
+
+        vectors = [
+            candidate.get("vector") or self.vectorize(candidate["description"])
+            for candidate in candidates
+        ]
+        lengths = np.fromiter((len(v[0]) for v in vectors), dtype=np.int64, count=len(vectors))
+        if not lengths.sum():
+            return [candidate["id"] for candidate in candidates]
+
+        # Плоское CSR-представление матрицы кандидатов
+        indices = np.concatenate([v[0] for v in vectors])
+        weights = np.concatenate([v[1] for v in vectors])
+        rows = np.repeat(np.arange(len(candidates)), lengths)
+
+        # Сглаженный IDF по текущему набору кандидатов
+        df = np.bincount(indices, minlength=self.dim)
+        idf = (np.log((1 + len(candidates)) / (1 + df)) + 1.0).astype(np.float32)
+
+        weights = weights * idf[indices]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(candidates)))
+
+        query_indices, query_weights = self.vectorize(description)
+        query = np.zeros(self.dim, dtype=np.float32)
+        query[query_indices] = query_weights * idf[query_indices]
+        query_norm = np.linalg.norm(query)
+
+        dots = np.bincount(rows, weights=weights * query[indices], minlength=len(candidates))
+        denominator = norms * query_norm
+        scores = np.divide(dots, denominator, out=np.zeros_like(dots), where=denominator > 0)
+
+        order = np.argsort(-scores, kind="stable")
+        return [candidates[i]["id"] for i in order]
+
+    async def get_ranked_mentors(self, mentors: List[Dict[str, Any]], user_description: str) -> List[Any]:
+        """
+        Сортирует менторов по убыванию их интересности для пользователя.
+
+        Args:
+            mentors: Список словарей с информацией о менторах, каждый словарь содержит id и description
+            user_description: Описание пользователя
+
+        Returns:
+            Список id менторов, отсортированный по убыванию интересности
+        """
+        return await asyncio.to_thread(self.rank, mentors, user_description)
+
+    async def get_ranked_users(self, users: List[Dict[str, Any]], mentor_description: str) -> List[Any]:
+        """
+        Сортирует пользователей по убыванию их интересности для ментора.
+
+        Args:
+            users: Список словарей с информацией о пользователях, каждый словарь содержит id и description
+            mentor_description: Описание ментора
+
+        Returns:
+            Список id пользователей, отсортированный по убыванию интересности
+        """
+        return await asyncio.to_thread(self.rank, users, mentor_description)
@@ -0,0 +1,117 @@
+"""
+Технические метрики приложения в реестре prometheus_client.
+
+Отдаются вместе с бизнес-метриками через /metrics.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+principal_cache_hits = Counter(
+    "principal_cache_hits_total",
+    "Попадания в кеш авторизованных пользователей",
+    ["role"],
+)
+principal_cache_misses = Counter(
+    "principal_cache_misses_total",
+    "Промахи кеша авторизованных пользователей",
+    ["role"],
+)
+principal_cache_size = Gauge(
+    "principal_cache_size",
+    "Количество профилей в кеше авторизованных пользователей",
+)
+password_hash_queue_depth = Gauge(
+    "password_hash_queue_depth",
+    "Операции bcrypt в очереди и в работе",
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "Время операции bcrypt вместе с ожиданием в очереди",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+auth_rate_limited = Counter(
+    "auth_rate_limited_total",
+    "Попытки входа и регистрации, отклоненные ограничением частоты",
+    ["route"],
+)
+
+# HTTP: метка route - шаблон пути, а не сам путь, чтобы число рядов не зависело от id в URL
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP-запросы по маршруту и коду ответа",
+    ["method", "route", "status"],
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress",
+    "HTTP-запросы в обработке",
+    ["method"],
+)
+# Потоковые ответы (SSE) живут минутами и часами: их время и число считаются
+# отдельно, чтобы не искажать задержки и конкурентность обычных запросов
+http_streams_open = Gauge(
+    "http_streams_open",
+    "Открытые потоковые ответы",
+    ["route"],
+)
+http_stream_duration = Histogram(
+    "http_stream_duration_seconds",
+    "Время жизни потокового ответа",
+    ["route"],
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0),
+)
+http_request_db_statements = Histogram(
+    "http_request_db_statements",
+    "SQL-запросов за один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+http_request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Суммарное время SQL-запросов за один HTTP-запрос",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+# Redis
+redis_operation_duration = Histogram(
+    "redis_operation_duration_seconds",
+    "Время операции RedisService",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+redis_lookups = Counter(
+    "redis_lookups_total",
+    "Чтения из Redis: hit, miss или error",
+    ["operation", "result"],
+)
+
+# Сервис ранжирования
+ranking_upstream_duration = Histogram(
+    "ranking_upstream_duration_seconds",
+    "Время запроса к сервису ранжирования",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0),
+)
+ranking_upstream_failures = Counter(
+    "ranking_upstream_failures_total",
+    "Неудачные ранжирования: breaker_open, http или parse",
+    ["reason"],
+)
+
+# Бизнес-метрики: значения обновляет BusinessMetricsRefresher, а не запрос /metrics
+mentors_count = Gauge("mentors_count", "Количество менторов в системе")
+students_count = Gauge("students_count", "Количество школьников в системе")
+active_mentors = Gauge("active_mentors", "Количество активных менторов")
+active_students = Gauge("active_students", "Количество активных учеников")
+avg_students_per_mentor = Gauge("avg_students_per_mentor", "Среднее количество учеников на ментора")
+successful_matches = Gauge("successful_matches", "Количество успешных пар ментор-ученик")
+business_metrics_refreshed = Gauge(
+    "business_metrics_refreshed_timestamp_seconds",
+    "Время последнего успешного пересчета бизнес-метрик",
+)
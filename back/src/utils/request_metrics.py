@@ -0,0 +1,132 @@
+"""
+Метрики HTTP-запросов: ASGI-middleware и учет SQL-запросов за запрос.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.utils.metrics import (
+    http_request_db_duration,
+    http_request_db_statements,
+    http_request_duration,
+    http_requests,
+    http_requests_in_progress,
+    http_stream_duration,
+    http_streams_open,
+)
+
+# Маршрут для путей, которые не совпали ни с одним роутом (404, сканеры)
+UNMATCHED_ROUTE = "unmatched"
+
+# Content-Type потоковых ответов, которые учитываются отдельно от обычных запросов
+STREAMING_CONTENT_TYPES = (b"text/event-stream",)
+
+
+class SqlStats:
+    """Количество и суммарное время SQL-запросов одного HTTP-запроса"""
+
+    __slots__ = ("statements", "duration")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+
+
+# Объект изменяемый: задачи из asyncio.gather получают копию контекста, но пишут в тот же объект
+current_sql_stats: ContextVar[Optional[SqlStats]] = ContextVar("current_sql_stats", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Подписывается на выполнение запросов движка и относит их к текущему HTTP-запросу.
+
+    Для AsyncEngine передается engine.sync_engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_sql_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.duration += time.perf_counter() - context._metrics_started
+
+
+def _is_streaming(message) -> bool:
+    for name, value in message.get("headers", ()):
+        if name.lower() == b"content-type":
+            return value.split(b";")[0].strip().lower() in STREAMING_CONTENT_TYPES
+    return False
+
+
+def _route_label(scope, root_path: str) -> str:
+    """Шаблон пути совпавшего роута, путь монтирования для статики или UNMATCHED_ROUTE"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("root_path", "") != root_path:
+        return scope["root_path"]
+    return UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """
+    ASGI-middleware: время, коды ответов, запросы в обработке и SQL за запрос.
+
+    Написано без BaseHTTPMiddleware, чтобы не буферизовать ответ и не
+    ломать потоковые ответы вроде /requests/events. Потоковый ответ с
+    момента начала считается в http_streams_open и http_stream_duration_seconds,
+    а не в http_requests_in_progress и http_request_duration_seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        root_path = scope.get("root_path", "")
+        status_code = 500
+        stats = SqlStats()
+        token = current_sql_stats.set(stats)
+        in_progress = http_requests_in_progress.labels(method=method)
+        stream_started: Optional[float] = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, stream_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if _is_streaming(message):
+                    stream_started = time.perf_counter()
+                    in_progress.dec()
+                    http_streams_open.labels(route=_route_label(scope, root_path)).inc()
+            await send(message)
+
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            current_sql_stats.reset(token)
+
+            route = _route_label(scope, root_path)
+            http_requests.labels(method=method, route=route, status=str(status_code)).inc()
+            if stream_started is None:
+                in_progress.dec()
+                http_request_duration.labels(method=method, route=route).observe(finished - started)
+            else:
+                http_streams_open.labels(route=route).dec()
+                http_stream_duration.labels(route=route).observe(finished - stream_started)
+            http_request_db_statements.labels(route=route).observe(stats.statements)
+            http_request_db_duration.labels(route=route).observe(stats.duration)
@@ -0,0 +1,19 @@
+import fakeredis
+import pytest
+
+from src.services.redis_service import redis_service
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Redis в памяти вместо сервера; server.connected = False имитирует недоступный Redis"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis_service, "redis_client", fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    )
+    return server
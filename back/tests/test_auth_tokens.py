@@ -0,0 +1,106 @@
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from src.config import ALGORITHM, SECRET_KEY, Roles
+from src.data.models import User
+from src.security import auth
+from src.security.principal_cache import PrincipalCache
+from src.services.redis_service import redis_service
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def user(monkeypatch, redis_server):
+    """Активный пользователь, которого load_principal находит без базы"""
+    account = User(id=7, login="ivan", name="Ivan", is_active=True, token_version=1)
+
+    async def get_user_by_login(login):
+        return account if login == account.login else None
+
+    monkeypatch.setattr(auth, "get_user_by_login", get_user_by_login)
+    monkeypatch.setattr(auth, "principal_cache", PrincipalCache())
+    return account
+
+
+def _claims(token):
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+async def test_refresh_issues_new_pair(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+
+    refreshed = await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
+
+    assert _claims(refreshed["access_token"])["uid"] == user.id
+    assert _claims(refreshed["refresh_token"])["jti"] != _claims(tokens["refresh_token"])["jti"]
+
+
+async def test_refresh_token_is_single_use(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+    await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
+
+    with pytest.raises(HTTPException) as error:
+        await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
+    assert error.value.status_code == 401
+
+
+async def test_refresh_fails_closed_without_redis(user, redis_server):
+    tokens = auth.issue_tokens(Roles.USER, user)
+    redis_server.connected = False
+
+    with pytest.raises(HTTPException):
+        await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
+
+
+async def test_access_token_rejected_as_refresh(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+
+    with pytest.raises(HTTPException):
+        await auth.refresh_tokens(Roles.USER, tokens["access_token"])
+
+
+async def test_revoked_access_token(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+    assert await auth.get_optional_token_principal(tokens["access_token"]) is not None
+
+    await auth.revoke_tokens(tokens["access_token"])
+
+    assert await auth.get_optional_token_principal(tokens["access_token"]) is None
+
+
+async def test_password_change_invalidates_issued_tokens(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+
+    # Так репозиторий отражает смену пароля: версия растет, старая отзывается в Redis
+    user.token_version = 2
+    await redis_service.revoke_token_version(Roles.USER, user.id, 1)
+
+    assert await auth.get_optional_token_principal(tokens["access_token"]) is None
+    assert await auth.get_optional_principal(tokens["access_token"]) is None
+    with pytest.raises(HTTPException):
+        await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
+
+    fresh = auth.issue_tokens(Roles.USER, user)
+    assert await auth.get_optional_token_principal(fresh["access_token"]) is not None
+
+
+async def test_old_version_rejected_by_profile_without_redis(user, redis_server):
+    tokens = auth.issue_tokens(Roles.USER, user)
+    user.token_version = 2
+    redis_server.connected = False
+
+    assert await auth.get_optional_token_principal(tokens["access_token"]) is None
+    with pytest.raises(HTTPException):
+        await auth.get_current_user(tokens["access_token"])
+
+
+async def test_deactivated_account(user):
+    tokens = auth.issue_tokens(Roles.USER, user)
+
+    await redis_service.revoke_account(Roles.USER, user.id)
+
+    assert await auth.get_optional_token_principal(tokens["access_token"]) is None
+    with pytest.raises(HTTPException):
+        await auth.refresh_tokens(Roles.USER, tokens["refresh_token"])
@@ -0,0 +1,109 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.data.models import AdmissionType
+from src.services import catalog_snapshot
+from src.services.catalog_snapshot import CatalogSnapshot, CatalogSnapshotStore, write_snapshot
+
+MENTORS = [
+    {"id": 1, "is_active": True, "admission_type": AdmissionType.EGE, "university": "МГУ",
+     "name": "Анна", "login": "anna", "title": "PhD", "description": "физика", "avatar_uuid": None},
+    {"id": 4, "is_active": False, "admission_type": AdmissionType.EGE, "university": "МГУ",
+     "name": "Борис", "login": "boris", "title": None, "description": None, "avatar_uuid": None},
+    {"id": 9, "is_active": True, "admission_type": "олимпиады", "university": "СПбГУ",
+     "name": None, "login": "vera", "title": None, "description": "математика", "avatar_uuid": "a-b"},
+]
+
+USERS = [
+    {"id": 2, "is_active": True, "admission_type": None, "target_universities": ["МГУ", "СПбГУ"],
+     "name": "Петр", "login": "petr", "description": "люблю физику", "avatar_uuid": None},
+    {"id": 3, "is_active": True, "admission_type": "ЕГЭ", "target_universities": [],
+     "name": "Ольга", "login": "olga", "description": None, "avatar_uuid": None},
+]
+
+
+def _vectorize(text):
+    length = len(text or "")
+    return np.array([length], dtype=np.int64), np.array([1.0], dtype=np.float64)
+
+
+def test_mentors_roundtrip(tmp_path):
+    snapshot = CatalogSnapshot(write_snapshot(str(tmp_path), "mentors", 3, MENTORS))
+
+    assert (snapshot.kind, snapshot.version, snapshot.count) == ("mentors", 3, 3)
+    records = snapshot.records(np.arange(snapshot.count))
+    assert [record.id for record in records] == [1, 4, 9]
+    assert records[0].name == "Анна" and records[0].university == "МГУ"
+    assert records[0].admission_type == AdmissionType.EGE
+    assert records[2].name is None and records[2].avatar_uuid == "a-b"
+    assert records[2].admission_type == AdmissionType.OLYMPIADS
+
+
+def test_mentor_filters_match_feed_conditions(tmp_path):
+    snapshot = CatalogSnapshot(write_snapshot(str(tmp_path), "mentors", 1, MENTORS))
+
+    def ids(rows):
+        return [int(snapshot.ids[row]) for row in rows]
+
+    assert ids(snapshot.filter_mentors()) == [1, 9]
+    assert ids(snapshot.filter_mentors(["МГУ"])) == [1]
+    assert ids(snapshot.filter_mentors(["МФТИ"])) == []
+    assert ids(snapshot.filter_mentors(None, str(AdmissionType.OLYMPIADS))) == [9]
+
+
+def test_users_roundtrip_and_filters(tmp_path):
+    snapshot = CatalogSnapshot(write_snapshot(str(tmp_path), "users", 1, USERS))
+
+    records = snapshot.records(np.arange(snapshot.count))
+    assert records[0].target_universities == ["МГУ", "СПбГУ"]
+    assert records[1].target_universities == []
+    assert [int(snapshot.ids[row]) for row in snapshot.filter_users("СПбГУ")] == [2]
+    assert [int(snapshot.ids[row]) for row in snapshot.filter_users(None, "ЕГЭ")] == [3]
+
+
+def test_rows_for_ids_keeps_order_and_skips_missing(tmp_path):
+    snapshot = CatalogSnapshot(write_snapshot(str(tmp_path), "mentors", 1, MENTORS))
+
+    rows = snapshot.rows_for_ids([9, 5, 1, 100])
+    assert [int(snapshot.ids[row]) for row in rows] == [9, 1]
+
+
+def test_candidates_carry_vectors(tmp_path):
+    snapshot = CatalogSnapshot(write_snapshot(str(tmp_path), "mentors", 1, MENTORS, _vectorize))
+
+    candidates = snapshot.candidates(snapshot.filter_mentors())
+    assert [candidate["description"] for candidate in candidates] == ["физика", "математика"]
+    indices, weights = candidates[1]["vector"]
+    assert list(indices) == [len("математика")] and list(weights) == [1.0]
+
+
+def test_older_version_does_not_replace_newer(tmp_path):
+    write_snapshot(str(tmp_path), "mentors", 5, MENTORS)
+    path = write_snapshot(str(tmp_path), "mentors", 4, MENTORS[:1])
+
+    snapshot = CatalogSnapshot(path)
+    assert (snapshot.version, snapshot.count) == (5, 3)
+    assert not [name for name in tmp_path.iterdir() if name.name.startswith(".")]
+
+
+@pytest.mark.anyio
+async def test_store_rebuilds_in_background(tmp_path, monkeypatch, redis_server):
+    async def get_mentor_snapshot_rows():
+        return MENTORS
+
+    monkeypatch.setattr(catalog_snapshot, "CATALOG_SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(catalog_snapshot, "get_mentor_snapshot_rows", get_mentor_snapshot_rows)
+    store = CatalogSnapshotStore(str(tmp_path), max_age=60, debounce=0)
+
+    # Первый запрос не ждет построения
+    assert await store.get("mentors", 1) is None
+    for _ in range(100):
+        if "mentors" not in store._tasks:
+            break
+        await asyncio.sleep(0.01)
+
+    snapshot = await store.get("mentors", 1)
+    assert snapshot is not None and snapshot.version >= 1 and snapshot.count == 3
+    await store.shutdown()
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import HTTPException
+
+from src.routers.feed_router import read_cursor
+from src.services.catalog_snapshot import CatalogSnapshot, write_snapshot
+from src.utils.pagination import encode_cursor
+
+
+def _user_row(user_id):
+    return {
+        "id": user_id,
+        "is_active": True,
+        "admission_type": None,
+        "target_universities": [],
+        "name": f"user {user_id}",
+        "login": f"user{user_id}",
+        "description": None,
+        "avatar_uuid": None,
+    }
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = write_snapshot(str(tmp_path), "users", 1, [_user_row(user_id) for user_id in range(1, 7)])
+    return CatalogSnapshot(path)
+
+
+def _walk(snapshot, size):
+    """Листает снимок по курсорам, как клиент ленты; возвращает размеры страниц"""
+    rows = snapshot.filter_users()
+    items, total, has_more = snapshot.page(rows, 1, size)
+    pages = [len(items)]
+    while has_more:
+        items, total, has_more = snapshot.page(rows, 1, size, after_id=items[-1].id)
+        pages.append(len(items))
+    return pages, total
+
+
+def test_last_full_page_has_no_next_cursor(snapshot):
+    assert _walk(snapshot, 3) == ([3, 3], 6)
+
+
+def test_partial_last_page(snapshot):
+    assert _walk(snapshot, 4) == ([4, 2], 6)
+
+
+def test_single_page(snapshot):
+    assert _walk(snapshot, 6) == ([6], 6)
+    assert _walk(snapshot, 10) == ([6], 6)
+
+
+def test_page_number_beyond_end(snapshot):
+    items, total, has_more = snapshot.page(snapshot.filter_users(), 3, 3)
+    assert (items, total, has_more) == ([], 6, False)
+
+
+def test_read_cursor_fields():
+    cursor = encode_cursor({"id": 5, "total": 12})
+    assert read_cursor(cursor, "id") == 5
+    assert read_cursor(cursor, "total", required=False) == 12
+    assert read_cursor(encode_cursor({"id": 5}), "total", required=False) is None
+    assert read_cursor(None, "rank") is None
+
+
+@pytest.mark.parametrize("cursor, field", [
+    (encode_cursor({"rank": -1}), "rank"),
+    (encode_cursor({"id": -5}), "id"),
+    (encode_cursor({"id": "x"}), "id"),
+    (encode_cursor({"other": 1}), "id"),
+    ("not a cursor", "id"),
+])
+def test_read_cursor_rejects_invalid(cursor, field):
+    with pytest.raises(HTTPException) as error:
+        read_cursor(cursor, field)
+    assert error.value.status_code == 400
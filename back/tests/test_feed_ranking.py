@@ -0,0 +1,46 @@
+import pytest
+
+from src.routers.feed_router import build_ranking, merge_ranking
+from src.services.redis_service import redis_service
+
+pytestmark = pytest.mark.anyio
+
+
+def _builder(candidates):
+    calls = {"load": 0}
+
+    async def load_candidates():
+        calls["load"] += 1
+        return candidates
+
+    async def rank(items):
+        return [item["id"] for item in reversed(items)]
+
+    return calls, load_candidates, rank
+
+
+async def test_ranking_is_built_once_and_paged(redis_server):
+    calls, load_candidates, rank = _builder([{"id": 1}, {"id": 2}, {"id": 3}])
+
+    assert await build_ranking(redis_service, "feed:test", load_candidates, rank) == [3, 2, 1]
+    assert await build_ranking(redis_service, "feed:test", load_candidates, rank) == [3, 2, 1]
+    assert calls["load"] == 1
+    assert await redis_service.get_ranking_page("feed:test", 1, 2) == ([2, 1], 3)
+
+
+async def test_empty_ranking_is_cached(redis_server):
+    calls, load_candidates, rank = _builder([])
+
+    assert await build_ranking(redis_service, "feed:empty", load_candidates, rank) == []
+    assert await redis_service.get_ranking_page("feed:empty", 0, 9) == ([], 0)
+    assert await build_ranking(redis_service, "feed:empty", load_candidates, rank) == []
+    assert calls["load"] == 1
+
+
+async def test_missing_ranking_is_a_miss(redis_server):
+    assert await redis_service.get_ranking_page("feed:missing", 0, 9) is None
+    assert await redis_service.get_ranking("feed:missing") is None
+
+
+def test_merge_ranking_drops_unknown_and_appends_missing():
+    assert merge_ranking(["3", 9, 3, "x"], [1, 2, 3]) == [3, 1, 2]
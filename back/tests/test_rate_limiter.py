@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import rate_limiter
+from src.services.rate_limiter import TrustedProxies, get_client_ip
+
+pytestmark = pytest.mark.anyio
+
+
+def _request(peer, real_ip=None):
+    headers = {"x-real-ip": real_ip} if real_ip else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+@pytest.fixture
+def proxies(monkeypatch):
+    trusted = TrustedProxies(["10.0.0.0/8", "localhost"], interval=60)
+    monkeypatch.setattr(rate_limiter, "trusted_proxies", trusted)
+    return trusted
+
+
+async def test_real_ip_ignored_from_untrusted_peer(proxies):
+    assert get_client_ip(_request("203.0.113.5", "198.51.100.1")) == "203.0.113.5"
+
+
+async def test_real_ip_from_trusted_network(proxies):
+    assert get_client_ip(_request("10.1.2.3", "198.51.100.1")) == "198.51.100.1"
+
+
+async def test_hostname_trusted_only_after_resolution(proxies):
+    assert get_client_ip(_request("127.0.0.1", "198.51.100.1")) == "127.0.0.1"
+
+    await proxies.resolve()
+
+    assert get_client_ip(_request("127.0.0.1", "198.51.100.1")) == "198.51.100.1"
+
+
+async def test_failed_resolution_keeps_previous_addresses(proxies, monkeypatch):
+    await proxies.resolve()
+
+    async def getaddrinfo(*args, **kwargs):
+        raise OSError("resolver unavailable")
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    await proxies.resolve()
+
+    assert proxies.is_trusted("127.0.0.1")
+
+
+async def test_startup_resolves_and_shutdown_stops(proxies):
+    await proxies.startup()
+    try:
+        assert proxies.is_trusted("127.0.0.1")
+    finally:
+        await proxies.shutdown()
@@ -0,0 +1,89 @@
+import pytest
+
+from src.data.models import EntityType, RequestStatus
+from src.services import request_counters as counters_module
+from src.services.redis_service import redis_service
+from src.services.request_counters import RequestCounters, counters_key
+
+pytestmark = pytest.mark.anyio
+
+USER = EntityType.USER
+MENTOR = EntityType.MENTOR
+
+
+@pytest.fixture
+def badges(monkeypatch):
+    """Счетчики, которые вернул бы Postgres, и записанные вызовы подсчета"""
+    state = {"counts": {}, "calls": []}
+
+    async def count_request_badges(entities):
+        state["calls"].append(entities)
+        return {(entity_type, entity_id): state["counts"].get((entity_type, entity_id), (0, 0, 0))
+                for entity_type, entity_id, _ in entities}
+
+    monkeypatch.setattr(counters_module, "count_request_badges", count_request_badges)
+    return state
+
+
+@pytest.fixture
+def counters(redis_server, badges):
+    return RequestCounters()
+
+
+def _request(sender_id=1, receiver_id=2):
+    return {"sender_type": "user", "sender_id": sender_id, "receiver_type": "mentor", "receiver_id": receiver_id}
+
+
+async def test_missing_hash_is_counted_once(counters, badges):
+    badges["counts"][(USER, 1)] = (2, 3, 1)
+
+    assert await counters.get(USER, 1) == {"pending_received": 2, "pending_sent": 3, "accepted_unseen": 1}
+    assert await counters.get(USER, 1) == {"pending_received": 2, "pending_sent": 3, "accepted_unseen": 1}
+    assert len(badges["calls"]) == 1
+
+
+async def test_events_update_existing_hashes(counters):
+    await counters.get(USER, 1)
+    await counters.get(MENTOR, 2)
+
+    await counters.record_created([_request()])
+    await counters.record_decided([_request()], RequestStatus.ACCEPTED)
+
+    assert await counters.get(USER, 1) == {"pending_received": 0, "pending_sent": 0, "accepted_unseen": 1}
+    assert await counters.get(MENTOR, 2) == {"pending_received": 0, "pending_sent": 0, "accepted_unseen": 0}
+
+
+async def test_events_do_not_create_hashes(counters):
+    await counters.record_created([_request()])
+
+    assert not await redis_service.redis_client.exists(counters_key(USER, 1))
+
+
+async def test_mark_seen_on_missing_hash_keeps_it_incomplete(counters, badges):
+    await counters.mark_accepted_seen(USER, 1)
+    await counters.record_created([_request()])
+
+    stored = await redis_service.redis_client.hgetall(counters_key(USER, 1))
+    assert "pending_sent" not in stored and "accepted_unseen" not in stored
+
+    badges["counts"][(USER, 1)] = (0, 4, 0)
+    assert await counters.get(USER, 1) == {"pending_received": 0, "pending_sent": 4, "accepted_unseen": 0}
+    assert badges["calls"][-1][0][2].isoformat() == stored["seen_at"]
+
+
+async def test_mark_seen_resets_complete_hash(counters, badges):
+    badges["counts"][(USER, 1)] = (1, 1, 3)
+    await counters.get(USER, 1)
+
+    await counters.mark_accepted_seen(USER, 1)
+
+    assert await counters.get(USER, 1) == {"pending_received": 1, "pending_sent": 1, "accepted_unseen": 0}
+
+
+async def test_redis_down_counts_in_postgres(counters, badges, redis_server):
+    badges["counts"][(USER, 1)] = (5, 0, 0)
+    redis_server.connected = False
+
+    assert (await counters.get(USER, 1))["pending_received"] == 5
+    await counters.mark_accepted_seen(USER, 1)
+    await counters.record_created([_request()])
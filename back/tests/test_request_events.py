@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+
+from src.config import Roles
+from src.data.models import User
+from src.routers import request_router
+from src.security.auth import issue_tokens, revoke_tokens
+from src.services.request_events import request_events
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def access_token(redis_server):
+    user = User(id=7, login="ivan", name="Ivan", is_active=True, token_version=1)
+    return issue_tokens(Roles.USER, user)["access_token"]
+
+
+@pytest.fixture(autouse=True)
+def fast_checks(monkeypatch):
+    monkeypatch.setattr(request_router, "REQUEST_EVENTS_AUTH_CHECK_INTERVAL", 0.05)
+    monkeypatch.setattr(request_router, "REQUEST_EVENTS_KEEPALIVE", 0.05)
+
+
+async def test_stream_requires_token(redis_server):
+    with pytest.raises(HTTPException) as error:
+        await request_router.request_events_stream(token=None, ticket=None)
+    assert error.value.status_code == 401
+
+
+async def test_ticket_is_single_use(access_token):
+    ticket = await request_events.issue_ticket(access_token)
+
+    response = await request_router.request_events_stream(token=None, ticket=ticket)
+    await response.body_iterator.aclose()
+
+    with pytest.raises(HTTPException):
+        await request_router.request_events_stream(token=None, ticket=ticket)
+
+
+async def test_stream_closes_after_revocation(access_token):
+    response = await request_router.request_events_stream(token=access_token, ticket=None)
+    chunks = response.body_iterator
+
+    assert await chunks.__anext__() == "retry: 3000\n\n"
+    assert await chunks.__anext__() == ": keepalive\n\n"
+
+    await revoke_tokens(access_token)
+
+    remaining = [chunk async for chunk in chunks]
+    assert remaining[-1].startswith("event: session.expired")
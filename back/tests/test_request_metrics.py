@@ -0,0 +1,53 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from src.utils.request_metrics import PrometheusMiddleware
+
+app = FastAPI()
+app.add_middleware(PrometheusMiddleware)
+
+
+@app.get("/metrics-test/plain")
+async def plain():
+    return {"ok": True}
+
+
+@app.get("/metrics-test/events")
+async def events():
+    async def stream():
+        yield "data: 1\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_plain_request_is_timed(client):
+    before = _sample("http_request_duration_seconds_count", method="GET", route="/metrics-test/plain")
+
+    client.get("/metrics-test/plain")
+
+    assert _sample("http_request_duration_seconds_count", method="GET", route="/metrics-test/plain") == before + 1
+    assert _sample("http_requests_in_progress", method="GET") == 0
+
+
+def test_stream_is_counted_separately(client):
+    before = _sample("http_stream_duration_seconds_count", route="/metrics-test/events")
+
+    client.get("/metrics-test/events")
+
+    assert _sample("http_stream_duration_seconds_count", route="/metrics-test/events") == before + 1
+    assert _sample("http_request_duration_seconds_count", method="GET", route="/metrics-test/events") == 0
+    assert _sample("http_streams_open", route="/metrics-test/events") == 0
+    assert _sample("http_requests_in_progress", method="GET") == 0
+    assert _sample("http_requests_total", method="GET", route="/metrics-test/events", status="200") >= 1
@@ -0,0 +1,74 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.data.models import Request
+from src.routers import request_router
+
+pytestmark = pytest.mark.anyio
+
+
+class _Result:
+    def scalars(self):
+        return self
+
+    def all(self):
+        return []
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return _Result()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    recording = _RecordingSession()
+
+    @asynccontextmanager
+    async def session_scope():
+        yield recording
+
+    monkeypatch.setattr(request_router, "session_scope", session_scope)
+    return recording
+
+
+def _datetime_params(statement):
+    params = statement.compile(dialect=postgresql.dialect()).params
+    return [value for value in params.values() if isinstance(value, datetime)]
+
+
+def test_as_local_naive_keeps_naive_values():
+    value = datetime(2026, 1, 1, 12, 0)
+    assert request_router.as_local_naive(value) is value
+
+
+def test_as_local_naive_converts_to_local_time():
+    value = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    converted = request_router.as_local_naive(value)
+    assert converted.tzinfo is None
+    assert converted == value.astimezone().replace(tzinfo=None)
+
+
+async def test_updated_since_with_timezone_is_compared_naive(session):
+    updated_since = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    await request_router.load_requests_page([Request.receiver_id == 1], None, updated_since, None, 10)
+
+    params = _datetime_params(session.statements[0])
+    assert params and all(value.tzinfo is None for value in params)
+
+
+async def test_cursor_with_timezone_is_compared_naive(session):
+    cursor = request_router.encode_cursor({"created_at": "2026-01-01T00:00:00+00:00", "id": 5})
+
+    await request_router.load_requests_page([Request.receiver_id == 1], None, None, cursor, 10)
+
+    params = _datetime_params(session.statements[0])
+    assert params and all(value.tzinfo is None for value in params)